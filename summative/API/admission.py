@@ -0,0 +1,226 @@
+"""
+Admission control for CPU-bound inference.
+
+Prediction work runs on a dedicated, bounded thread pool instead of the
+event loop's shared default pool, so health and metadata endpoints keep
+answering when the inference endpoints are overloaded. At most
+`concurrency` jobs run at once and at most `queue_depth` more wait; beyond
+that a request is rejected straight away and the client is told when to
+retry. Every job may carry a deadline (the time after which its client
+has given up): a job still queued at its deadline is dropped without
+running, and its caller gets the rejection instead of a late result.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from metrics import LATENCY_BUCKETS, Counter, Histogram
+
+# Reasons a request is turned away, as reported in stats() and /metrics
+REJECT_QUEUE_FULL = "queue_full"
+REJECT_DEADLINE = "deadline"
+
+
+class AdmissionError(RuntimeError):
+    """Raised when inference can't be admitted or can't finish before its deadline."""
+
+    def __init__(self, message: str, reason: str, retry_after: int):
+        """
+        Args:
+            message: Human-readable explanation
+            reason: REJECT_QUEUE_FULL or REJECT_DEADLINE
+            retry_after: Seconds the client should wait before retrying
+        """
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """Bounded thread pool with fast rejection and per-job deadlines."""
+
+    def __init__(self, concurrency: int, queue_depth: int, timeout_ms: float = 0,
+                 retry_after: int = 1):
+        """
+        Initialize the executor; worker threads start on first use.
+
+        Args:
+            concurrency: Maximum number of jobs running at once
+            queue_depth: Maximum number of admitted jobs waiting for a thread
+            timeout_ms: Default deadline for a job, from submission (0 disables it)
+            retry_after: Retry-After seconds sent with rejections
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if queue_depth < 0:
+            raise ValueError("queue_depth must not be negative")
+
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.timeout = timeout_ms / 1000.0
+        self.retry_after = retry_after
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self.rejected = {REJECT_QUEUE_FULL: Counter(), REJECT_DEADLINE: Counter()}
+
+        self._admitted = 0
+        self._running = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+        # Threads don't survive fork(); a pre-forked worker starts its own pool
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def deadline(self, timeout_ms: Optional[float] = None) -> Optional[float]:
+        """
+        Compute a job deadline on the time.monotonic() clock.
+
+        Args:
+            timeout_ms: The client's own timeout, if it sent one; the shorter
+                of it and the default timeout applies
+
+        Returns:
+            float: Deadline, or None when neither timeout is set
+        """
+        timeouts = [t for t in (self.timeout, (timeout_ms or 0) / 1000.0) if t > 0]
+        return time.monotonic() + min(timeouts) if timeouts else None
+
+    async def run(self, fn, *args, deadline: Optional[float] = None, admit: bool = True):
+        """
+        Run `fn(*args)` on the pool and wait for its result.
+
+        The call runs in a copy of the caller's context, so context variables
+        such as the pinned model version and the request's timing marks
+        follow it onto the worker thread.
+
+        Args:
+            fn: Function to call
+            *args: Its positional arguments
+            deadline: time.monotonic() value after which the result is not wanted
+            admit: Apply the queue limit (False for follow-up work of a request
+                that was already admitted, such as later chunks of a stream)
+
+        Returns:
+            Whatever `fn` returns
+
+        Raises:
+            AdmissionError: If the queue is full or the deadline passes first
+        """
+        self._admit(admit)
+        future = self._get_pool().submit(
+            self._execute, contextvars.copy_context(), fn, args, time.monotonic(), deadline
+        )
+        future.add_done_callback(self._release)
+
+        if deadline is None:
+            return await asyncio.wrap_future(future)
+
+        try:
+            # On timeout the wrapped future is cancelled, which withdraws a job
+            # that hasn't started; a running one finishes and is discarded
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline - time.monotonic())
+        except (asyncio.TimeoutError, AdmissionError):
+            raise self._reject(REJECT_DEADLINE, "Request deadline passed before the prediction finished")
+
+    def check_capacity(self):
+        """
+        Reject now if the queue is full, without admitting anything.
+
+        For long-running work (e.g. a stream) that must be turned away before
+        its response starts, and whose steps are then run with admit=False.
+
+        Raises:
+            AdmissionError: If the queue is full
+        """
+        with self._lock:
+            full = self._admitted >= self.concurrency + self.queue_depth
+        if full:
+            raise self._reject(REJECT_QUEUE_FULL, "Inference queue is full")
+
+    def stats(self) -> dict:
+        """Return limits, current load, rejection counts and queue-wait histogram."""
+        with self._lock:
+            admitted, running = self._admitted, self._running
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "timeout_ms": self.timeout * 1000.0,
+            "running": running,
+            "queued": admitted - running,
+            "rejected": {reason: counter.value for reason, counter in self.rejected.items()},
+            "queue_wait": self.queue_wait.snapshot(),
+        }
+
+    def reset_stats(self):
+        """Zero the queue-wait histogram and rejection counters."""
+        self.queue_wait.reset()
+        for counter in self.rejected.values():
+            counter.reset()
+
+    def shutdown(self):
+        """Stop the worker threads after the jobs already submitted finish."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _admit(self, admit: bool):
+        """Count a new job in, or reject it if the queue is full."""
+        with self._lock:
+            if admit and self._admitted >= self.concurrency + self.queue_depth:
+                full = True
+            else:
+                full = False
+                self._admitted += 1
+        if full:
+            raise self._reject(REJECT_QUEUE_FULL, "Inference queue is full")
+
+    def _release(self, future):
+        """Count a job out once it has finished or been withdrawn."""
+        with self._lock:
+            self._admitted -= 1
+
+    def _reject(self, reason: str, message: str) -> AdmissionError:
+        """Count a rejection and build the error to raise."""
+        self.rejected[reason].inc()
+        return AdmissionError(message, reason, self.retry_after)
+
+    def _execute(self, context, fn, args, queued_at: float, deadline: Optional[float]):
+        """Worker-thread body: drop the job if its client gave up, otherwise run it."""
+        started = time.monotonic()
+        self.queue_wait.observe(started - queued_at)
+        if deadline is not None and started >= deadline:
+            # Counted by run(), which turns this into its own rejection
+            raise AdmissionError("Request deadline passed while queued", REJECT_DEADLINE, self.retry_after)
+
+        with self._lock:
+            self._running += 1
+        try:
+            return context.run(fn, *args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Return the thread pool, creating it on first use."""
+        pool = self._pool
+        if pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.concurrency, thread_name_prefix="inference"
+                    )
+                pool = self._pool
+        return pool
+
+    def _reset_after_fork(self):
+        """Forget the parent's threads and counts in a freshly forked child."""
+        self._lock = threading.Lock()
+        self._pool = None
+        self._admitted = 0
+        self._running = 0
@@ -0,0 +1,197 @@
+"""
+Adaptive micro-batching for single-row predictions.
+
+Concurrent /predict requests each block on a future while a collector
+thread groups them into one matrix, scores it with a single call and
+hands every caller its own row of the result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+from metrics import Histogram, exponential_buckets
+
+
+class BatcherClosedError(RuntimeError):
+    """Raised for rows submitted to, or still queued in, a closed batcher."""
+
+
+class MicroBatcher:
+    """Collects concurrent single-row predictions into small batches."""
+
+    def __init__(self, score_fn, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 result_timeout: float = 30.0):
+        """
+        Initialize the batcher and start its collector thread.
+
+        Args:
+            score_fn: Callable taking an (n, n_features) array and returning n results
+            max_batch_size: Maximum number of rows scored together
+            max_wait_ms: Maximum time a batch waits for more rows once it has started
+            result_timeout: Maximum time a caller waits for its row to be scored
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self.batch_sizes = Histogram(exponential_buckets(1, 2, max(1, max_batch_size.bit_length())))
+        self.queue_depths = Histogram(exponential_buckets(1, 2, 12))
+
+        self._queue = queue.SimpleQueue()
+        self._last_batch_size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, values):
+        """
+        Queue one row for scoring and wait for its result.
+
+        Args:
+            values: Feature values for one row in training order
+
+        Returns:
+            The score_fn result for this row
+
+        Raises:
+            BatcherClosedError: If the batcher is (or gets) closed before the row is scored
+            TimeoutError: If the row is not picked up within result_timeout
+        """
+        future = Future()
+
+        # Check and enqueue atomically so nothing can land behind close()'s sentinel
+        with self._lock:
+            if self._closed:
+                raise BatcherClosedError("Micro-batcher is closed")
+            self._queue.put((values, future))
+
+        try:
+            return future.result(timeout=self.result_timeout)
+        except TimeoutError:
+            # Withdraw the row unless a batch has already started scoring it
+            if future.cancel():
+                raise
+            return future.result()
+
+    def close(self):
+        """Stop the collector thread and fail every row that has not started scoring."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+        # Nothing can be enqueued after the sentinel, but fail leftovers defensively
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._fail([item])
+
+    def stats(self) -> dict:
+        """Return batch-size and queue-depth histograms."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_depth": self.queue_depths.snapshot(),
+        }
+
+    def reset_stats(self):
+        """Zero the batch-size and queue-depth histograms."""
+        self.batch_sizes.reset()
+        self.queue_depths.reset()
+
+    def _collect(self, first) -> list:
+        """Gather a batch starting with `first`."""
+        batch = [first]
+
+        # Take everything that is already waiting, without blocking
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                return batch
+
+        # Only wait for stragglers when there is concurrency to exploit; a lone
+        # request at low load is dispatched immediately so its latency is unchanged
+        if len(batch) == 1 and self._last_batch_size <= 1:
+            return batch
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                break
+
+        return batch
+
+    def _run(self):
+        """Collector loop: build batches and score them."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+
+            if batch and self._closed:
+                # Closing: rows that have not started scoring are failed, not scored
+                self._fail(batch)
+            elif batch:
+                self.queue_depths.observe(len(batch) + self._queue.qsize())
+                self.batch_sizes.observe(len(batch))
+                self._last_batch_size = len(batch)
+                self._dispatch(batch)
+
+            if stop:
+                return
+
+    def _fail(self, batch: list):
+        """Fail every still-pending future in `batch` because the batcher closed."""
+        for _, future in batch:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(BatcherClosedError("Micro-batcher is closed"))
+
+    def _dispatch(self, batch: list):
+        """Score one batch and resolve every waiting future."""
+        # Drop rows whose callers timed out; the rest can no longer be cancelled
+        batch = [(values, future) for values, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self.score_fn(np.array([values for values, _ in batch], dtype=np.float64))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,528 @@
+"""
+Load-testing and latency benchmark for the Endometriosis Prediction API.
+
+Drives /predict and /predict_batch over real HTTP connections at a set of
+concurrency levels and batch sizes, and reports throughput and
+p50/p95/p99/p99.9 latency. Results are written as JSON (tagged with the git
+commit) so runs can be compared across commits. Everything runs offline:
+the API is either started in-process on a local port, started as a
+`serve.py` pre-fork server, or reached at an existing `--url`.
+
+Two load models are supported:
+
+- closed loop: each connection sends its next request as soon as the
+  previous response arrives, which measures peak throughput.
+- open loop: requests are scheduled at a fixed `--rate`, and latency is
+  measured from the time a request was *scheduled*, not from when it was
+  actually sent. A stalled server therefore shows up in the latency
+  percentiles instead of silently lowering the send rate (the
+  "coordinated omission" correction). The plain service time is reported
+  next to it.
+
+Usage:
+    python benchmark.py --endpoint predict --concurrency 1 4 16 --duration 10
+    python benchmark.py --endpoint predict_batch --batch-size 1 100 1000 --output run.json
+    python benchmark.py --mode open --rate 500 --concurrency 32
+    python benchmark.py --server-workers 4 --output workers4.json
+    python benchmark.py --url http://127.0.0.1:8000 --compare baseline.json
+    python benchmark.py --serialization 10000
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+def make_payloads(count: int, batch_size: int, endpoint: str, seed: int = 0) -> list:
+    """
+    Build deterministic request bodies with random but valid patients.
+
+    Args:
+        count: Number of distinct bodies
+        batch_size: Patients per /predict_batch body (ignored for /predict)
+        endpoint: "predict" or "predict_batch"
+        seed: Random seed
+
+    Returns:
+        list: Encoded JSON bodies
+    """
+    rng = np.random.default_rng(seed)
+    rows = 1 if endpoint == "predict" else batch_size
+
+    def patient():
+        return {
+            "age": int(rng.integers(18, 101)),
+            "menstrual_irregularity": int(rng.integers(0, 2)),
+            "chronic_pain_level": float(np.round(rng.uniform(0, 10), 1)),
+            "hormone_level_abnormality": int(rng.integers(0, 2)),
+            "infertility": int(rng.integers(0, 2)),
+            "bmi": float(np.round(rng.uniform(10, 60), 1)),
+        }
+
+    bodies = []
+    for _ in range(count):
+        if endpoint == "predict":
+            body = patient()
+        else:
+            body = {"patients": [patient() for _ in range(rows)]}
+        bodies.append(json.dumps(body).encode("utf-8"))
+    return bodies
+
+
+def percentile_summary(latencies) -> dict:
+    """
+    Summarize latencies (seconds) as milliseconds.
+
+    Uses the nearest-rank percentile, so every reported value is a latency
+    that was actually observed.
+
+    Args:
+        latencies: Latency samples in seconds
+
+    Returns:
+        dict: mean, p50, p95, p99, p999 and max in milliseconds (None if empty)
+    """
+    samples = np.sort(np.asarray(latencies, dtype=float))
+    if len(samples) == 0:
+        return {name: None for name in ("mean", *PERCENTILES, "max")}
+
+    summary = {"mean": round(float(samples.mean()) * 1000, 4)}
+    for name, q in PERCENTILES.items():
+        # Round first so e.g. 99.9% of 1000 samples is rank 999, not 1000
+        rank = max(int(np.ceil(round(q / 100 * len(samples), 9))), 1)
+        summary[name] = round(float(samples[rank - 1]) * 1000, 4)
+    summary["max"] = round(float(samples[-1]) * 1000, 4)
+    return summary
+
+
+class Target:
+    """Host and port of the API under test, plus how to stop it."""
+
+    def __init__(self, url: str, stop=None, description: str = "external"):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.description = description
+        self._stop = stop
+
+    def connect(self) -> http.client.HTTPConnection:
+        """Open a keep-alive connection to the API."""
+        return http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def stop(self):
+        """Stop a server started by the benchmark (no-op for --url)."""
+        if self._stop is not None:
+            self._stop()
+            self._stop = None
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(target: Target, timeout: float = 60.0):
+    """Poll /health until the API answers."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = target.connect()
+            connection.request("GET", "/health")
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"API at {target.url} did not become healthy within {timeout}s")
+        time.sleep(0.1)
+
+
+def start_in_process(log_level: str = "warning") -> Target:
+    """
+    Serve the app with uvicorn on a background thread of this process.
+
+    The load generator shares the interpreter (and the GIL) with the server,
+    so absolute numbers are lower than with a separate server process; this
+    mode is meant for quick, dependency-free comparisons.
+    """
+    import uvicorn
+    from main import app
+
+    port = free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level=log_level, access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    target = Target(f"http://127.0.0.1:{port}", stop, "in-process uvicorn")
+    wait_until_healthy(target)
+    return target
+
+
+def start_prefork(workers: int, log_level: str = "warning") -> Target:
+    """Start `serve.py` with the given number of workers as a child process."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", log_level],
+        cwd=API_DIR
+    )
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    target = Target(f"http://127.0.0.1:{port}", stop, f"serve.py --workers {workers}")
+    try:
+        wait_until_healthy(target, timeout=120)
+    except Exception:
+        stop()
+        raise
+    return target
+
+
+def run_load(target: Target, path: str, bodies: list, concurrency: int, duration: float,
+             mode: str = "closed", rate: float = None, warmup: float = 1.0) -> dict:
+    """
+    Drive one endpoint with `concurrency` keep-alive connections.
+
+    Args:
+        target: API under test
+        path: Request path
+        bodies: JSON bodies, sent round-robin
+        concurrency: Number of connections (threads)
+        duration: Measured seconds (after warmup)
+        mode: "closed" or "open"
+        rate: Requests per second to schedule in open-loop mode
+        warmup: Seconds of unmeasured load before measuring
+
+    Returns:
+        dict: Request counts, throughput and latency summaries
+    """
+    if mode == "open" and not rate:
+        raise ValueError("open-loop mode needs a --rate")
+
+    headers = {"Content-Type": "application/json"}
+    slots = itertools.count()
+    slots_lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    timing = {}
+
+    # One result list per thread; merged after the run
+    results = [{"latency": [], "service": [], "errors": 0, "statuses": {}} for _ in range(concurrency)]
+
+    def worker(index: int):
+        result = results[index]
+        connection = target.connect()
+        body_index = index
+        start_barrier.wait()
+        measure_from, stop_at = timing["measure_from"], timing["stop_at"]
+
+        while True:
+            if mode == "open":
+                with slots_lock:
+                    slot = next(slots)
+                intended = timing["t0"] + slot / rate
+                if intended >= stop_at:
+                    break
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                intended = time.perf_counter()
+                if intended >= stop_at:
+                    break
+
+            body = bodies[body_index % len(bodies)]
+            body_index += concurrency
+            sent = time.perf_counter()
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = target.connect()
+                status = None
+            done = time.perf_counter()
+
+            if intended < measure_from:
+                continue
+            if status != 200:
+                result["errors"] += 1
+            result["statuses"][str(status)] = result["statuses"].get(str(status), 0) + 1
+            result["latency"].append(done - intended)
+            result["service"].append(done - sent)
+
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    t0 = time.perf_counter()
+    timing.update(t0=t0, measure_from=t0 + warmup, stop_at=t0 + warmup + duration)
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    latency = [value for result in results for value in result["latency"]]
+    service = [value for result in results for value in result["service"]]
+    statuses = {}
+    for result in results:
+        for status, count in result["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    requests = len(latency)
+    return {
+        "requests": requests,
+        "errors": sum(result["errors"] for result in results),
+        "statuses": statuses,
+        "throughput_rps": round(requests / duration, 2),
+        "latency_ms": percentile_summary(latency),
+        "service_time_ms": percentile_summary(service),
+    }
+
+
+def git_commit() -> dict:
+    """Return the current commit and whether the working tree has local changes."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=API_DIR, capture_output=True,
+                                  text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def environment() -> dict:
+    """Describe the machine the benchmark ran on."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "usable_cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+    }
+
+
+def run_benchmark(target: Target, endpoints: list, concurrencies: list, batch_sizes: list,
+                  duration: float, mode: str = "closed", rate: float = None, warmup: float = 1.0,
+                  seed: int = 0, verbose: bool = True) -> list:
+    """
+    Run every (endpoint, batch size, concurrency) scenario against a target.
+
+    Returns:
+        list: One result dict per scenario
+    """
+    scenarios = []
+    for endpoint in endpoints:
+        sizes = [1] if endpoint == "predict" else batch_sizes
+        for batch_size in sizes:
+            bodies = make_payloads(64, batch_size, endpoint, seed=seed)
+            for concurrency in concurrencies:
+                stats = run_load(target, f"/{endpoint}", bodies, concurrency, duration,
+                                 mode=mode, rate=rate, warmup=warmup)
+                rows = 1 if endpoint == "predict" else batch_size
+                scenario = {
+                    "name": f"{mode}/{endpoint}/batch={rows}/concurrency={concurrency}",
+                    "endpoint": f"/{endpoint}",
+                    "batch_size": rows,
+                    "concurrency": concurrency,
+                    "mode": mode,
+                    "rate": rate,
+                    **stats,
+                    "rows_per_sec": round(stats["throughput_rps"] * rows, 2),
+                }
+                scenarios.append(scenario)
+                if verbose:
+                    latency = scenario["latency_ms"]
+                    print(f"  {scenario['name']:<52} {scenario['throughput_rps']:>10.1f} req/s  "
+                          f"p50 {latency['p50']}ms  p99 {latency['p99']}ms  p999 {latency['p999']}ms  "
+                          f"errors {scenario['errors']}")
+    return scenarios
+
+
+def measure_serialization(rows: int = 10_000, rounds: int = 5, seed: int = 0) -> dict:
+    """
+    Time response serialization of /predict_batch with and without FAST_JSON_RESPONSES.
+
+    Sends a `rows`-patient batch through the app in-process and reads the
+    "serialize" stage histogram of /metrics: the time from the endpoint's
+    result being ready to the response starting, i.e. response model
+    validation plus JSON encoding (or just encoding on the fast path).
+
+    Args:
+        rows: Patients per request
+        rounds: Requests per mode (after one unmeasured request)
+        seed: Random seed for the payload
+
+    Returns:
+        dict: Mean serialization milliseconds per `rows` predictions for each mode
+    """
+    import main
+    from fast_json import encoder_name
+    from serve import asgi_request
+
+    body = make_payloads(1, rows, "predict_batch", seed=seed)[0]
+    histogram = main.METRICS.stage_seconds["/predict_batch"]["serialize"]
+    saved = main.FAST_JSON_RESPONSES
+    results = {}
+    try:
+        for label, fast in (("validated", False), (f"fast ({encoder_name()})", True)):
+            main.FAST_JSON_RESPONSES = fast
+            asgi_request(main.app, "POST", "/predict_batch", body)
+            before = histogram.snapshot()
+            for _ in range(rounds):
+                status = asgi_request(main.app, "POST", "/predict_batch", body)
+                if status != 200:
+                    raise RuntimeError(f"/predict_batch returned {status}")
+            after = histogram.snapshot()
+            seconds = (after["sum"] - before["sum"]) / (after["count"] - before["count"])
+            results[label] = round(seconds * 1000, 3)
+    finally:
+        main.FAST_JSON_RESPONSES = saved
+    return {"rows": rows, "rounds": rounds, "serialize_ms": results}
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """
+    Compare two benchmark result files scenario by scenario.
+
+    Returns:
+        list: (name, throughput change %, p50 change %, p99 change %) for shared scenarios
+    """
+    def change(old, new):
+        if not old or new is None:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    old_scenarios = {s["name"]: s for s in baseline["scenarios"]}
+    rows = []
+    for scenario in current["scenarios"]:
+        old = old_scenarios.get(scenario["name"])
+        if old is None:
+            continue
+        rows.append((
+            scenario["name"],
+            change(old["throughput_rps"], scenario["throughput_rps"]),
+            change(old["latency_ms"]["p50"], scenario["latency_ms"]["p50"]),
+            change(old["latency_ms"]["p99"], scenario["latency_ms"]["p99"]),
+        ))
+    return rows
+
+
+def main(argv=None):
+    """Parse arguments, run the benchmark and write the JSON report."""
+    parser = argparse.ArgumentParser(description="Benchmark the Endometriosis Prediction API")
+    parser.add_argument("--url", help="Benchmark a running API instead of starting one")
+    parser.add_argument("--server-workers", type=int, default=None,
+                        help="Start serve.py with this many workers instead of an in-process server")
+    parser.add_argument("--endpoint", nargs="+", choices=["predict", "predict_batch"],
+                        default=["predict", "predict_batch"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[100],
+                        help="Patients per /predict_batch request")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--rate", type=float, default=None, help="Requests/sec in open-loop mode")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Print the change against an earlier JSON result")
+    parser.add_argument("--serialization", type=int, metavar="ROWS", default=None,
+                        help="Only time /predict_batch response serialization for ROWS predictions, "
+                             "with and without FAST_JSON_RESPONSES")
+    args = parser.parse_args(argv)
+
+    if args.serialization:
+        result = measure_serialization(args.serialization, seed=args.seed)
+        for label, ms in result["serialize_ms"].items():
+            print(f"  {label:<20} {ms:>9.3f} ms per {result['rows']} predictions")
+        return result
+
+    if args.mode == "open" and not args.rate:
+        parser.error("--mode open needs --rate")
+
+    if args.url:
+        target = Target(args.url)
+        wait_until_healthy(target)
+    elif args.server_workers:
+        target = start_prefork(args.server_workers)
+    else:
+        target = start_in_process()
+
+    print(f"Benchmarking {target.description} at {target.url} ({args.mode} loop)")
+    try:
+        scenarios = run_benchmark(
+            target, args.endpoint, args.concurrency, args.batch_size, args.duration,
+            mode=args.mode, rate=args.rate, warmup=args.warmup, seed=args.seed
+        )
+    finally:
+        target.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_commit(),
+        "environment": environment(),
+        "server": target.description,
+        "config": {
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mode": args.mode,
+            "rate": args.rate,
+            "seed": args.seed,
+            "server_workers": args.server_workers,
+        },
+        "scenarios": scenarios,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Change against {args.compare} (commit {(baseline['git']['commit'] or '?')[:10]}):")
+        for name, *changes in compare(baseline, report):
+            throughput, p50, p99 = ("n/a" if c is None else f"{c:+}%" for c in changes)
+            print(f"  {name:<52} throughput {throughput}  p50 {p50}  p99 {p99}")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Single-file, memory-mappable model bundle for the Endometriosis Prediction API.
+
+The four joblib pickles (best_model.pkl, scaler.pkl, features.pkl,
+label_encoders.pkl) need sklearn and pandas just to be unpickled. A bundle
+holds the same model as raw numeric arrays plus a JSON manifest in one .npy
+file, so loading it is a single np.load(mmap_mode='r'): no sklearn import,
+no copies, and every worker process maps the same page-cache pages.
+
+File layout (the payload of a 1-D uint8 .npy array):
+
+    [8-byte little-endian manifest length][manifest JSON][pad to 64]
+    [array 0][pad to 64][array 1]...
+
+Linear models are stored as coefficients plus the fused kernel weights;
+trees and forests as the flat node arrays of TreeEnsembleKernel.
+
+The manifest records the format version, feature order, label encoder
+classes, each array's offset/dtype/shape, the model version, the SHA-256
+of every source pickle (so a stale bundle is detected) and a SHA-256 over
+the manifest and array bytes.
+
+Convert existing pickles with:
+
+    python bundle.py models
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from kernels import FUSABLE_LINEAR_MODELS, TREE_ENSEMBLE_MODELS, LinearKernel, TreeEnsembleKernel
+
+BUNDLE_FILE = 'model_bundle.npy'
+BUNDLE_FORMAT = 'endometriosis-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+
+ARTIFACT_FILES = ['best_model.pkl', 'scaler.pkl', 'features.pkl', 'label_encoders.pkl']
+
+# Every array starts on a 64-byte boundary (cache line / SIMD friendly)
+ALIGNMENT = 64
+HEADER_BYTES = 8
+
+
+class BundleError(Exception):
+    """Raised when a bundle can't be built or read."""
+
+
+class BundleLinearModel:
+    """Linear model read from a bundle; predict() matches sklearn's linear models."""
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, model_type: str):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.model_type = model_type
+
+    def predict(self, X) -> np.ndarray:
+        """Predict from already-scaled features."""
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_[0]
+
+
+class BundleTreeModel:
+    """Tree or forest read from a bundle; predict() matches sklearn's tree regressors."""
+
+    def __init__(self, kernel: TreeEnsembleKernel, model_type: str):
+        self.kernel = kernel
+        self.model_type = model_type
+
+    def predict(self, X) -> np.ndarray:
+        """Predict from already-scaled features."""
+        return self.kernel.predict_scaled(np.asarray(X, dtype=np.float64))
+
+
+class BundleStandardScaler:
+    """StandardScaler read from a bundle; transform() matches sklearn."""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, features: list):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = len(features)
+
+    def transform(self, X) -> np.ndarray:
+        """Standardize raw features (a DataFrame or array in feature order)."""
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class BundleLabelEncoder:
+    """LabelEncoder read from a bundle; transform() matches sklearn."""
+
+    def __init__(self, classes: list):
+        self.classes_ = np.array(classes)
+
+    def transform(self, y) -> np.ndarray:
+        """Map labels to their class index, rejecting unseen labels like sklearn."""
+        y = np.asarray(y)
+        unseen = ~np.isin(y, self.classes_)
+        if unseen.any():
+            raise ValueError(f"y contains previously unseen labels: {y[unseen][:5].tolist()}")
+        return np.searchsorted(self.classes_, y)
+
+
+class ModelBundle:
+    """A loaded bundle: manifest, zero-copy array views and ready-to-use model objects."""
+
+    def __init__(self, path: str, manifest: dict, arrays: dict, blob: np.ndarray):
+        """
+        Args:
+            path: Bundle file path
+            manifest: Parsed manifest
+            arrays: Read-only array views into the mapped file
+            blob: The whole mapped file (kept for verification)
+        """
+        self.path = path
+        self.manifest = manifest
+        self.arrays = arrays
+        self._blob = blob
+
+        self.features = list(manifest['features'])
+        self.model_version = manifest['model_version']
+        self.model_type = manifest['model_type']
+        self.label_encoders = {
+            column: BundleLabelEncoder(classes)
+            for column, classes in manifest['label_encoders'].items()
+        }
+        self.scaler = BundleStandardScaler(arrays['scaler.mean'], arrays['scaler.scale'], self.features)
+
+        # Bundles written before tree support carry no kernel_type and are linear
+        if manifest.get('kernel_type', 'linear') == 'tree':
+            self.kernel = TreeEnsembleKernel(
+                arrays['kernel.feature'], arrays['kernel.threshold'], arrays['kernel.left'],
+                arrays['kernel.value'], arrays['kernel.roots'], manifest['tree_depth'],
+                arrays['scaler.mean'], arrays['scaler.scale']
+            )
+            self.model = BundleTreeModel(self.kernel, self.model_type)
+        else:
+            self.model = BundleLinearModel(arrays['model.coef'], arrays['model.intercept'], self.model_type)
+            self.kernel = LinearKernel(arrays['kernel.weights'], float(arrays['kernel.bias'][0]))
+
+    def verify(self):
+        """Recompute the content hash; raise BundleError if the file was altered."""
+        manifest_bytes, data = _split(self._blob)
+        if _content_hash(json.loads(manifest_bytes), data) != self.manifest['content_hash']:
+            raise BundleError(f"Content hash mismatch in {self.path}")
+
+    def is_current(self, model_dir: str) -> bool:
+        """
+        Check the bundle against any source pickles present in model_dir.
+
+        Args:
+            model_dir: Directory that may still contain the original pickles
+
+        Returns:
+            bool: False if a source pickle exists and differs from the one converted
+        """
+        for filename, expected in self.manifest['source_hashes'].items():
+            path = os.path.join(model_dir, filename)
+            if os.path.exists(path) and file_sha256(path) != expected:
+                return False
+        return True
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def artifact_hash(model_dir: str) -> str:
+    """
+    Compute a short content hash of the model artifacts in a directory.
+
+    Args:
+        model_dir: Directory containing the model artifacts
+
+    Returns:
+        str: First 12 hex characters of the SHA-256 over all artifact files
+    """
+    digest = hashlib.sha256()
+    for filename in ARTIFACT_FILES:
+        with open(os.path.join(model_dir, filename), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next ALIGNMENT boundary."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _content_hash(manifest: dict, data) -> str:
+    """SHA-256 over the manifest (minus the hash itself) and the array bytes."""
+    digest = hashlib.sha256()
+    fields = {key: value for key, value in manifest.items() if key != 'content_hash'}
+    digest.update(json.dumps(fields, sort_keys=True).encode('utf-8'))
+    digest.update(memoryview(data))
+    return digest.hexdigest()
+
+
+def _split(blob: np.ndarray) -> tuple:
+    """Split a bundle blob into (manifest bytes, data region)."""
+    if blob.dtype != np.uint8 or blob.ndim != 1 or len(blob) < HEADER_BYTES:
+        raise BundleError("Not a model bundle (expected a 1-D uint8 array)")
+    manifest_length = int(np.frombuffer(bytes(blob[:HEADER_BYTES]), dtype='<u8')[0])
+    if HEADER_BYTES + manifest_length > len(blob):
+        raise BundleError("Truncated model bundle")
+    manifest_bytes = bytes(blob[HEADER_BYTES:HEADER_BYTES + manifest_length])
+    return manifest_bytes, blob[_align(HEADER_BYTES + manifest_length):]
+
+
+def write_bundle(path: str, arrays: dict, manifest: dict):
+    """
+    Write arrays and a manifest to a bundle file atomically.
+
+    Args:
+        path: Output .npy path
+        arrays: Mapping of array name to NumPy array
+        manifest: Manifest fields (array table and content hash are added here)
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset = _align(offset + array.nbytes)
+
+    data = bytearray(offset)
+    for name, array in arrays.items():
+        raw = np.ascontiguousarray(array).tobytes()
+        start = layout[name]['offset']
+        data[start:start + len(raw)] = raw
+
+    manifest = dict(manifest, format=BUNDLE_FORMAT, format_version=BUNDLE_FORMAT_VERSION, arrays=layout)
+    manifest['content_hash'] = _content_hash(manifest, data)
+    manifest_bytes = json.dumps(manifest, sort_keys=True).encode('utf-8')
+
+    header = np.array([len(manifest_bytes)], dtype='<u8').tobytes() + manifest_bytes
+    header += b'\0' * (_align(len(header)) - len(header))
+    blob = np.frombuffer(header + bytes(data), dtype=np.uint8)
+
+    # Write next to the target and rename, so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, blob)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(path: str, verify: bool = False) -> ModelBundle:
+    """
+    Memory-map a bundle file.
+
+    Args:
+        path: Bundle .npy path
+        verify: Recompute the content hash (reads every page of the file)
+
+    Returns:
+        ModelBundle: The loaded bundle
+    """
+    try:
+        blob = np.load(path, mmap_mode='r', allow_pickle=False)
+    except (ValueError, OSError) as e:
+        raise BundleError(f"Could not read {path}: {e}")
+
+    manifest_bytes, data = _split(blob)
+    try:
+        manifest = json.loads(manifest_bytes)
+    except ValueError as e:
+        raise BundleError(f"Corrupt bundle manifest in {path}: {e}")
+
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise BundleError(f"{path} is not a model bundle")
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleError(
+            f"Unsupported bundle format version {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION})"
+        )
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = spec['offset']
+        end = start + count * dtype.itemsize
+        if end > len(data):
+            raise BundleError(f"Truncated model bundle: array {name} runs past the end of {path}")
+        arrays[name] = data[start:end].view(dtype=dtype, type=np.ndarray).reshape(spec['shape'])
+
+    bundle = ModelBundle(path, manifest, arrays, blob)
+    if verify:
+        bundle.verify()
+    return bundle
+
+
+def open_bundle(model_dir: str):
+    """
+    Load the bundle in model_dir if there is one and it matches the pickles.
+
+    A missing, stale or unreadable bundle is reported and skipped so the
+    caller can fall back to the pickles.
+
+    Args:
+        model_dir: Directory containing the model artifacts
+
+    Returns:
+        ModelBundle or None: The bundle, or None to use the pickles
+    """
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        bundle = load_bundle(path)
+    except BundleError as e:
+        print(f"⚠ Warning: Ignoring model bundle: {e}")
+        return None
+
+    if not bundle.is_current(model_dir):
+        print(f"⚠ Warning: Ignoring stale model bundle {path} (pickles changed since conversion)")
+        return None
+    return bundle
+
+
+def convert(model_dir: str, output_path: str = None) -> str:
+    """
+    Convert the joblib pickles in model_dir into a bundle.
+
+    The bundle is read back and checked against the sklearn objects before
+    the function returns.
+
+    Args:
+        model_dir: Directory containing the four pickles
+        output_path: Bundle path (default: model_dir/model_bundle.npy)
+
+    Returns:
+        str: Path of the written bundle
+    """
+    import joblib
+
+    from kernels import compile_kernel, kernel_matches_sklearn
+
+    output_path = output_path or os.path.join(model_dir, BUNDLE_FILE)
+
+    model = joblib.load(os.path.join(model_dir, 'best_model.pkl'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    features = list(joblib.load(os.path.join(model_dir, 'features.pkl')))
+    label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+
+    model_type = type(model).__name__
+    if model_type not in FUSABLE_LINEAR_MODELS | TREE_ENSEMBLE_MODELS:
+        raise BundleError(f"Bundles don't support {model_type} models yet")
+    kernel = compile_kernel(model, scaler)
+    if kernel is None:
+        raise BundleError(f"Could not compile a verified kernel for {model_type}")
+
+    n_features = len(features)
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    arrays = {
+        'scaler.mean': np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        'scaler.scale': np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+    }
+    if isinstance(kernel, TreeEnsembleKernel):
+        kernel_fields = {'kernel_type': 'tree', 'tree_depth': kernel.depth}
+        arrays.update({
+            'kernel.feature': kernel.feature,
+            'kernel.threshold': kernel.threshold,
+            'kernel.left': kernel.left,
+            'kernel.value': kernel.value,
+            'kernel.roots': kernel.roots,
+        })
+    else:
+        kernel_fields = {'kernel_type': 'linear'}
+        arrays.update({
+            'model.coef': np.asarray(model.coef_, dtype=np.float64).ravel(),
+            'model.intercept': np.ravel(model.intercept_).astype(np.float64),
+            'kernel.weights': kernel.weights,
+            'kernel.bias': np.array([kernel.bias]),
+        })
+    manifest = {
+        **kernel_fields,
+        'model_type': model_type,
+        'scaler_type': type(scaler).__name__,
+        'features': features,
+        'label_encoders': {
+            column: encoder.classes_.tolist() for column, encoder in label_encoders.items()
+        },
+        'model_version': artifact_hash(model_dir),
+        'source_hashes': {
+            filename: file_sha256(os.path.join(model_dir, filename)) for filename in ARTIFACT_FILES
+        },
+    }
+    write_bundle(output_path, arrays, manifest)
+
+    # Read it back the way the API will and compare against sklearn
+    bundle = load_bundle(output_path, verify=True)
+    if not kernel_matches_sklearn(bundle.kernel, model, scaler):
+        os.remove(output_path)
+        raise BundleError("Bundle kernel does not reproduce the sklearn predictions")
+    return output_path
+
+
+if __name__ == '__main__':
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else 'models'
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    try:
+        path = convert(model_dir, output)
+    except (BundleError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"✓ Model bundle written to: {path} ({os.path.getsize(path)} bytes)")
@@ -0,0 +1,83 @@
+"""
+In-process prediction cache for the Endometriosis Prediction API.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe, size-bounded LRU cache for prediction results."""
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of entries kept before evicting the least recently used
+        """
+        if max_size <= 0:
+            raise ValueError("Cache size must be a positive integer")
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look up a cached value and mark it as recently used.
+
+        Args:
+            key: Hashable cache key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if full.
+
+        Args:
+            key: Hashable cache key
+            value: Value to cache (must not be None)
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return a snapshot of cache size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,324 @@
+"""
+Binary columnar batch input/output for the Endometriosis Prediction API.
+
+Batches can be sent to /predict_batch as NumPy (.npy/.npz) or Apache Arrow
+IPC payloads instead of JSON. Columns are decoded straight into one
+(n_rows, n_features) float64 matrix in model feature order, validated
+column-wise against the PatientData bounds, and the results are returned
+as columnar arrays: the prediction and an integer confidence code.
+
+JSON batches can use the same column-wise validation: `json_rows_to_columns`
+turns the decoded list of patient dicts into that matrix and flags the rows
+whose values aren't plain numbers, so only those (and rows outside the
+bounds) need per-row model validation.
+"""
+
+import io
+
+import numpy as np
+
+NPY_CONTENT_TYPE = "application/x-npy"
+NPZ_CONTENT_TYPE = "application/x-npz"
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+
+NUMPY_CONTENT_TYPES = {NPY_CONTENT_TYPE, NPZ_CONTENT_TYPE}
+ARROW_CONTENT_TYPES = {ARROW_STREAM_CONTENT_TYPE, ARROW_FILE_CONTENT_TYPE}
+
+# Confidence code reported for rows that failed validation
+INVALID_CODE = -1
+
+# JSON value types the column-wise checks handle; anything else (bool, str,
+# None, lists, missing fields) is left to per-row model validation
+NUMBER_TYPES = {int, float}
+
+
+class ColumnarFormatError(Exception):
+    """Raised when a columnar payload can't be decoded into the feature matrix."""
+
+
+class ColumnarDependencyError(ColumnarFormatError):
+    """Raised when a columnar format needs an optional package that isn't installed."""
+
+
+class ColumnSpec:
+    """Validation rules for one input column."""
+
+    def __init__(self, feature: str, field: str, ge: float, le: float, is_int: bool):
+        """
+        Args:
+            feature: Model feature name (e.g. 'Age')
+            field: Matching PatientData field name (e.g. 'age')
+            ge: Inclusive lower bound
+            le: Inclusive upper bound
+            is_int: Whether values must be whole numbers
+        """
+        self.feature = feature
+        self.field = field
+        self.ge = ge
+        self.le = le
+        self.is_int = is_int
+
+
+def column_specs(model_cls, feature_fields: dict) -> list:
+    """
+    Build column specs from a Pydantic model's Field(ge=..., le=...) constraints.
+
+    Args:
+        model_cls: Pydantic model holding the per-field constraints (PatientData)
+        feature_fields: Mapping of model feature name to Pydantic field name, in feature order
+
+    Returns:
+        list[ColumnSpec]: One spec per feature
+    """
+    specs = []
+    for feature, field in feature_fields.items():
+        info = model_cls.model_fields[field]
+        ge = next(m.ge for m in info.metadata if hasattr(m, 'ge'))
+        le = next(m.le for m in info.metadata if hasattr(m, 'le'))
+        specs.append(ColumnSpec(feature, field, ge, le, info.annotation is int))
+    return specs
+
+
+def media_type(content_type: str) -> str:
+    """Strip parameters (e.g. '; charset=utf-8') and normalize a Content-Type."""
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def is_columnar(content_type: str) -> bool:
+    """Return True if the Content-Type is one of the binary columnar formats."""
+    return media_type(content_type) in NUMPY_CONTENT_TYPES | ARROW_CONTENT_TYPES
+
+
+def decode_columns(body: bytes, content_type: str, specs: list, features: list) -> np.ndarray:
+    """
+    Decode a columnar payload into a raw feature matrix.
+
+    Columns may be named by model feature ('Age') or PatientData field
+    ('age'). A plain 2-D .npy array is taken to be in model feature order.
+
+    Args:
+        body: Request body
+        content_type: Request Content-Type
+        specs: Column specs (as built by column_specs)
+        features: Model feature order
+
+    Returns:
+        np.ndarray: Float64 matrix of shape (n_rows, n_features)
+    """
+    kind = media_type(content_type)
+    try:
+        if kind == NPY_CONTENT_TYPE:
+            array = np.load(io.BytesIO(body), allow_pickle=False)
+            if array.dtype.names is None:
+                if array.ndim != 2 or array.shape[1] != len(features):
+                    raise ColumnarFormatError(
+                        f"Expected a 2-D array with {len(features)} columns in order {features}, "
+                        f"got shape {array.shape}"
+                    )
+                return np.ascontiguousarray(array, dtype=np.float64)
+            columns = {name: array[name] for name in array.dtype.names}
+        elif kind == NPZ_CONTENT_TYPE:
+            with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+                columns = {name: archive[name] for name in archive.files}
+        elif kind in ARROW_CONTENT_TYPES:
+            columns = _read_arrow(body, kind)
+        else:
+            raise ColumnarFormatError(f"Unsupported content type: {content_type}")
+    except ColumnarFormatError:
+        raise
+    except (ValueError, OSError, EOFError) as e:
+        raise ColumnarFormatError(f"Could not decode {kind} payload: {e}")
+
+    return _stack_columns(columns, specs, features)
+
+
+def _read_arrow(body: bytes, kind: str) -> dict:
+    """Read an Arrow IPC stream or file into a dict of NumPy columns."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ColumnarDependencyError("Arrow payloads require the optional 'pyarrow' package")
+
+    reader = pa.ipc.open_stream(body) if kind == ARROW_STREAM_CONTENT_TYPE else pa.ipc.open_file(body)
+    table = reader.read_all()
+    return {
+        name: table.column(name).to_numpy(zero_copy_only=False)
+        for name in table.column_names
+    }
+
+
+def _stack_columns(columns: dict, specs: list, features: list) -> np.ndarray:
+    """Arrange named columns into a float64 matrix in feature order."""
+    by_feature = {spec.feature: spec for spec in specs}
+    ordered = []
+    for feature in features:
+        spec = by_feature[feature]
+        column = columns.get(feature, columns.get(spec.field))
+        if column is None:
+            raise ColumnarFormatError(f"Missing required column: {spec.field} ({feature})")
+        if column.ndim != 1:
+            raise ColumnarFormatError(f"Column {spec.field} must be 1-D, got shape {column.shape}")
+        if not (np.issubdtype(column.dtype, np.number) or column.dtype == np.bool_):
+            raise ColumnarFormatError(f"Column {spec.field} must be numeric, got {column.dtype}")
+        ordered.append(column)
+
+    lengths = {len(column) for column in ordered}
+    if len(lengths) > 1:
+        raise ColumnarFormatError(f"All columns must have the same length, got {sorted(lengths)}")
+
+    raw = np.empty((lengths.pop() if lengths else 0, len(features)), dtype=np.float64)
+    for col, column in enumerate(ordered):
+        raw[:, col] = column
+    return raw
+
+
+def validate_columns(raw: np.ndarray, specs: list, features: list) -> tuple:
+    """
+    Check every column against its bounds and integrality at once.
+
+    Args:
+        raw: Float64 matrix of shape (n_rows, n_features) in feature order
+        specs: Column specs (as built by column_specs)
+        features: Model feature order
+
+    Returns:
+        tuple: (valid_mask, errors) where valid_mask is a boolean array and
+        errors maps each invalid row index to its error message
+    """
+    by_feature = {spec.feature: spec for spec in specs}
+    valid = np.ones(len(raw), dtype=bool)
+    problems = []
+
+    for col, feature in enumerate(features):
+        spec = by_feature[feature]
+        values = raw[:, col]
+
+        not_finite = ~np.isfinite(values)
+        fractional = ~not_finite & (values != np.floor(values)) if spec.is_int else np.zeros_like(not_finite)
+        checked = ~(not_finite | fractional)
+        too_low = checked & (values < spec.ge)
+        too_high = checked & (values > spec.le)
+
+        for mask, message in (
+            (not_finite, "Input should be a finite number"),
+            (fractional, "Input should be a valid integer, got a number with a fractional part"),
+            (too_low, f"Input should be greater than or equal to {spec.ge}"),
+            (too_high, f"Input should be less than or equal to {spec.le}"),
+        ):
+            if mask.any():
+                valid &= ~mask
+                problems.append((mask, f"{spec.field}: {message}"))
+
+    # Only rows that failed get a message built in Python
+    errors = {}
+    for mask, message in problems:
+        for row in np.flatnonzero(mask).tolist():
+            errors[row] = f"{errors[row]}; {message}" if row in errors else message
+
+    return valid, errors
+
+
+def json_rows_to_columns(rows: list, specs: list, features: list) -> tuple:
+    """
+    Build the raw feature matrix from decoded JSON patient objects.
+
+    Each column is gathered with one list comprehension and converted in a
+    single NumPy call when it only holds ints and floats. Values that are
+    not plain numbers become NaN and their rows are flagged.
+
+    Args:
+        rows: Decoded JSON array of patient objects
+        specs: Column specs (as built by column_specs)
+        features: Model feature order
+
+    Returns:
+        tuple: (raw, irregular) where raw is the float64 (n_rows, n_features)
+        matrix and irregular marks rows that need per-row validation
+    """
+    by_feature = {spec.feature: spec for spec in specs}
+    raw = np.empty((len(rows), len(features)), dtype=np.float64)
+    irregular = np.zeros(len(rows), dtype=bool)
+
+    if not all(type(row) is dict for row in rows):
+        irregular[:] = [type(row) is not dict for row in rows]
+        rows = [row if type(row) is dict else {} for row in rows]
+
+    for col, feature in enumerate(features):
+        field = by_feature[feature].field
+        values = [row.get(field) for row in rows]
+        if set(map(type, values)) <= NUMBER_TYPES:
+            try:
+                raw[:, col] = values
+                continue
+            except OverflowError:
+                pass
+
+        # Slow path for this column only: convert value by value
+        for row, value in enumerate(values):
+            try:
+                if type(value) not in NUMBER_TYPES:
+                    raise TypeError
+                raw[row, col] = value
+            except (TypeError, OverflowError):
+                raw[row, col] = np.nan
+                irregular[row] = True
+
+    return raw, irregular
+
+
+def encode_results(predictions: np.ndarray, codes: np.ndarray, errors: dict,
+                   content_type: str, levels: list) -> tuple:
+    """
+    Encode batch results in the columnar format matching the request.
+
+    NumPy requests get an .npz archive with `prediction` (float64, NaN for
+    invalid rows), `confidence` (int8 code, -1 for invalid rows),
+    `confidence_levels`, `error_rows` and `error_messages`. Arrow requests get
+    an Arrow IPC stream with nullable `prediction`, `confidence` and `error`
+    columns and the confidence levels in the schema metadata.
+
+    Args:
+        predictions: Prediction per row
+        codes: Confidence code per row (index into levels, or -1)
+        errors: Mapping of invalid row index to error message
+        content_type: Request Content-Type
+        levels: Confidence level names indexed by code
+
+    Returns:
+        tuple: (body bytes, response media type)
+    """
+    kind = media_type(content_type)
+    error_rows = np.array(sorted(errors), dtype=np.int64)
+
+    if kind in ARROW_CONTENT_TYPES:
+        import pyarrow as pa
+
+        invalid = codes == INVALID_CODE
+        error_column = [None] * len(codes)
+        for row, message in errors.items():
+            error_column[row] = message
+
+        table = pa.table(
+            {
+                "prediction": pa.array(predictions, mask=invalid),
+                "confidence": pa.array(codes, mask=invalid),
+                "error": pa.array(error_column, type=pa.string()),
+            }
+        ).replace_schema_metadata({"confidence_levels": ",".join(levels)})
+
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue(), ARROW_STREAM_CONTENT_TYPE
+
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        prediction=predictions,
+        confidence=codes,
+        confidence_levels=np.array(levels),
+        error_rows=error_rows,
+        error_messages=np.array([errors[row] for row in error_rows.tolist()], dtype=str),
+    )
+    return buffer.getvalue(), NPZ_CONTENT_TYPE
@@ -0,0 +1,106 @@
+"""
+In-batch deduplication of identical feature rows.
+
+Population extracts repeat the same patient profile many times: three
+binary flags plus age, pain level and BMI at coarse precision leave few
+distinct rows. Scoring each distinct row once and scattering the results
+back to every copy cuts the model work by the duplication ratio.
+
+Rows are grouped by a 64-bit hash of their bytes (one sort of the hashes
+instead of a row-wise lexicographic sort), and every group is checked
+against its first row so a hash collision can never merge two different
+rows; if one ever does, the batch falls back to np.unique on a void view.
+Finding the groups costs ~0.2 us per row, far more than a fused linear
+kernel (~0.01 us per row) but far less than walking a forest, so only
+models that are expensive per row are deduplicated by default.
+"""
+
+import numpy as np
+
+from kernels import FUSABLE_LINEAR_MODELS
+
+# Batches smaller than this are scored as they are
+DEDUP_MIN_ROWS = 64
+
+# Multipliers of the splitmix64 finalizer, which spreads every input bit over the whole hash
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def unique_rows(X: np.ndarray) -> tuple:
+    """
+    Find the distinct rows of a matrix.
+
+    Rows are compared by their bytes, so -0.0 and 0.0 count as different
+    (which only costs a duplicate score, never a wrong one).
+
+    Args:
+        X: Array of shape (n_rows, n_features)
+
+    Returns:
+        tuple: (first, inverse) where X[first] are the distinct rows and
+        X[first][inverse] equals X
+    """
+    X = np.ascontiguousarray(X)
+    if len(X) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    hashes = _row_hashes(X)
+    order = np.argsort(hashes)
+    hashes = hashes[order]
+    starts = np.empty(len(X), dtype=bool)
+    starts[0] = True
+    np.not_equal(hashes[1:], hashes[:-1], out=starts[1:])
+
+    inverse = np.empty(len(X), dtype=np.intp)
+    inverse[order] = np.cumsum(starts) - 1
+    first = order[starts]
+
+    if not np.array_equal(X[first][inverse], X):
+        # Two different rows share a hash; group them exactly instead
+        return _void_unique(X)
+    return first, inverse
+
+
+def _row_hashes(X: np.ndarray) -> np.ndarray:
+    """Mix each row's bytes into one uint64 per row."""
+    words = X.view(np.uint8).reshape(len(X), -1)
+    if words.shape[1] % 8:
+        words = np.pad(words, ((0, 0), (0, 8 - words.shape[1] % 8)))
+    words = np.ascontiguousarray(words).view(np.uint64)
+
+    hashes = np.zeros(len(X), dtype=np.uint64)
+    for column in range(words.shape[1]):
+        hashes ^= words[:, column]
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= _MIX1
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= _MIX2
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def _void_unique(X: np.ndarray) -> tuple:
+    """Exact grouping by sorting the rows as opaque byte strings."""
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def worth_deduplicating(model, kernel) -> bool:
+    """
+    Whether scoring a row costs enough to be worth finding duplicates first.
+
+    Linear models score a row in a few nanoseconds, less than it takes to
+    hash it; trees, forests and any model scored through sklearn cost more.
+
+    Args:
+        model: Served model (sklearn estimator or bundle model)
+        kernel: Its compiled kernel, or None
+
+    Returns:
+        bool: True unless the model is linear
+    """
+    if type(kernel).__name__ == 'LinearKernel':
+        return False
+    return getattr(model, 'model_type', type(model).__name__) not in FUSABLE_LINEAR_MODELS
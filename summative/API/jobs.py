@@ -0,0 +1,699 @@
+"""
+Asynchronous batch jobs for the Endometriosis Prediction API.
+
+POST /jobs spools an uploaded batch (a /predict_batch JSON body, NDJSON
+or CSV) to disk and answers immediately with a job ID. A small pool of
+background threads claims queued jobs from a SQLite store, scores them
+chunk by chunk and appends each chunk's NDJSON results to its own part
+file, so memory use depends on the chunk size rather than the job size.
+
+The store is a single SQLite file next to the inputs and results, so
+jobs outlive the process and every worker process of serve.py can share
+it. A worker holds a job through a lease it renews after every chunk; a
+job whose lease ran out (its process died) is claimed again and resumes
+after the last chunk that was recorded. Finished jobs, their inputs and
+their results are deleted once their TTL has passed.
+"""
+
+import codecs
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Input formats accepted by POST /jobs, by media type
+INPUT_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+# Job states; a job only moves forward through them
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# Name of the SQLite job store inside the jobs directory
+STORE_FILE = "jobs.sqlite3"
+
+# Bytes read at a time from a spooled JSON input
+JSON_READ_BYTES = 1 << 16
+
+# Largest single value (one patient) buffered while reading a JSON input
+JSON_MAX_VALUE_BYTES = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_format TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    chunks_done INTEGER NOT NULL DEFAULT 0,
+    model_versions TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+
+class JobInputError(ValueError):
+    """Raised when an uploaded job input can't be read."""
+
+
+class JobInputTooLarge(JobInputError):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+def input_format(content_type: str):
+    """
+    Map a request Content-Type to a job input format.
+
+    Args:
+        content_type: Request Content-Type header (parameters are ignored)
+
+    Returns:
+        str: "json", "ndjson" or "csv", or None if the type isn't accepted
+    """
+    return INPUT_FORMATS.get((content_type or "").split(";")[0].strip().lower())
+
+
+def count_rows(path: str, fmt: str) -> int:
+    """
+    Count the patients in a spooled input, checking that it can be read.
+
+    Args:
+        path: Spooled input file
+        fmt: Input format
+
+    Returns:
+        int: Number of patients (non-blank NDJSON lines, CSV data rows, JSON patients)
+
+    Raises:
+        JobInputError: If the input is malformed
+    """
+    if fmt == "json":
+        with open(path, "rb") as f:
+            return sum(1 for _ in iter_json_patients(f))
+    if fmt == "ndjson":
+        with open(path, "rb") as f:
+            return sum(1 for line in f if line.strip())
+    with open(path, newline="", encoding="utf-8") as f:
+        try:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise JobInputError(f"Could not read CSV input: {e}")
+
+
+def iter_chunks(path: str, fmt: str, chunk_size: int, aliases: dict = None):
+    """
+    Read a spooled input in chunks of (patient_id, record) pairs.
+
+    Patient IDs are 1-based positions in the input. NDJSON records are raw
+    line bytes; JSON and CSV records are dicts (CSV values are strings,
+    with headers renamed through `aliases`).
+
+    Args:
+        path: Spooled input file
+        fmt: Input format
+        chunk_size: Records per chunk
+        aliases: CSV header -> record key (e.g. training column -> API field)
+
+    Yields:
+        list: One chunk of (patient_id, record) pairs
+    """
+    if fmt == "json":
+        handle = open(path, "rb")
+        records = iter_json_patients(handle)
+    elif fmt == "ndjson":
+        handle = open(path, "rb")
+        records = (line.rstrip(b"\r\n") for line in handle if line.strip())
+    else:
+        handle = open(path, newline="", encoding="utf-8")
+        reader = csv.reader(handle)
+        header = [(aliases or {}).get(name.strip(), name.strip()) for name in next(reader, [])]
+        records = (dict(zip(header, row)) for row in reader)
+
+    try:
+        chunk = []
+        for patient_id, record in enumerate(records, 1):
+            chunk.append((patient_id, record))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        handle.close()
+
+
+def iter_json_patients(f, block_size: int = JSON_READ_BYTES):
+    """
+    Yield the `patients` of a /predict_batch-style JSON body one at a time.
+
+    The file is read in blocks and only the current patient is decoded, so
+    memory use doesn't grow with the number of patients. Other keys of the
+    top-level object are decoded and discarded.
+
+    Args:
+        f: Binary file positioned at the start of the body
+        block_size: Bytes read at a time
+
+    Yields:
+        Each element of the `patients` list, as json.loads would return it
+
+    Raises:
+        JobInputError: If the body is malformed or has no "patients" list
+    """
+    reader = _JsonReader(f, block_size)
+    try:
+        if reader.next_char() != "{":
+            raise JobInputError('JSON input must be an object with a "patients" list')
+        reader.advance()
+
+        found = False
+        if reader.next_char() == "}":
+            reader.advance()
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str) or reader.next_char() != ":":
+                    raise JobInputError("Could not parse JSON input: expected a key and ':' in the top-level object")
+                reader.advance()
+
+                if key == "patients" and not found:
+                    found = True
+                    if reader.next_char() != "[":
+                        raise JobInputError('JSON input must be an object with a "patients" list')
+                    reader.advance()
+                    if reader.next_char() == "]":
+                        reader.advance()
+                    else:
+                        while True:
+                            yield reader.value()
+                            separator = reader.next_char()
+                            reader.advance()
+                            if separator == "]":
+                                break
+                            if separator != ",":
+                                raise JobInputError("Could not parse JSON input: expected ',' or ']' in \"patients\"")
+                elif key == "patients":
+                    raise JobInputError('JSON input has more than one "patients" key')
+                else:
+                    reader.value()
+
+                separator = reader.next_char()
+                reader.advance()
+                if separator == "}":
+                    break
+                if separator != ",":
+                    raise JobInputError("Could not parse JSON input: expected ',' or '}' in the top-level object")
+
+        if reader.next_char() != "":
+            raise JobInputError("Could not parse JSON input: extra data after the top-level object")
+        if not found:
+            raise JobInputError('JSON input must be an object with a "patients" list')
+    except UnicodeDecodeError as e:
+        raise JobInputError(f"Could not parse JSON input: {e}")
+
+
+class _JsonReader:
+    """Decode consecutive JSON values from a binary file without reading all of it."""
+
+    def __init__(self, f, block_size: int):
+        self._file = f
+        self._block_size = block_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size: int) -> bool:
+        """Append at least `size` more bytes of text; False at the end of the file."""
+        if self._eof:
+            return False
+        if self._pos:
+            # Drop what was already decoded
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        data = self._file.read(size)
+        self._eof = not data
+        self._buffer += self._text_decoder.decode(data, final=self._eof)
+        return True
+
+    def next_char(self) -> str:
+        """Skip whitespace and return the next character ("" at the end of the file)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read(self._block_size):
+                return ""
+
+    def advance(self):
+        """Consume the character returned by next_char()."""
+        self._pos += 1
+
+    def value(self):
+        """Decode the next value, reading more of the file until it is complete."""
+        self.next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value ending the buffer may continue (a number cut in two)
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise JobInputError(f"Could not parse JSON input: {e}")
+            if len(self._buffer) - self._pos > JSON_MAX_VALUE_BYTES:
+                raise JobInputError(f"Could not parse JSON input: a value is longer than {JSON_MAX_VALUE_BYTES} bytes")
+            # Grow geometrically so a large value is decoded a bounded number of times
+            self._read(max(self._block_size, len(self._buffer) - self._pos))
+
+
+class JobStore:
+    """
+    Job records in a SQLite file shared by every worker thread and process.
+
+    Each call opens its own short-lived connection, so the store is safe to
+    use from any thread and across fork().
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that waits for other writers instead of failing, and close it after use."""
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def create(self, job_id: str, fmt: str, total_rows: int) -> dict:
+        """Insert a queued job and return its record."""
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, input_format, total_rows, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, fmt, total_rows, time.time())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str):
+        """Return a job record as a dict, or None if it doesn't exist."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self, worker: str, lease: float):
+        """
+        Take the oldest queued job, or a running job whose lease has run out.
+
+        Args:
+            worker: Identifier of the claiming worker thread
+            lease: Seconds without a heartbeat after which a running job is abandoned
+
+        Returns:
+            dict: The claimed job record, or None if there is nothing to do
+        """
+        now = time.time()
+        with self._connect() as db:
+            # BEGIN IMMEDIATE takes the write lock, so two workers can't claim the same job
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now - lease)
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, heartbeat_at = ?, "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"])
+                )
+            db.execute("COMMIT")
+        return self.get(row["id"]) if row is not None else None
+
+    def progress(self, job_id: str, worker: str, chunks_done: int, rows_done: int,
+                 model_versions: list) -> bool:
+        """
+        Record a finished chunk and renew the worker's lease.
+
+        Returns:
+            bool: False if the job was deleted or claimed by another worker
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET chunks_done = ?, rows_done = ?, model_versions = ?, heartbeat_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (chunks_done, rows_done, json.dumps(model_versions), time.time(), job_id, worker, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, worker: str, status: str, ttl: float, error: str = None) -> bool:
+        """
+        Mark a job succeeded or failed and start its TTL.
+
+        Returns:
+            bool: False if the job was deleted or claimed by another worker
+        """
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, error, now, now + ttl, now, job_id, worker, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker: str):
+        """Put a running job back in the queue, keeping its progress."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE id = ? AND worker = ? AND status = ?",
+                (QUEUED, job_id, worker, RUNNING)
+            )
+
+    def delete(self, job_id: str) -> bool:
+        """Delete a job record; returns False if it didn't exist."""
+        with self._connect() as db:
+            cursor = db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return cursor.rowcount == 1
+
+    def expire(self, now: float = None) -> list:
+        """Delete finished jobs past their TTL and return their IDs."""
+        now = time.time() if now is None else now
+        with self._connect() as db:
+            rows = db.execute("SELECT id FROM jobs WHERE expires_at < ?", (now,)).fetchall()
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        return [row["id"] for row in rows]
+
+    def counts(self) -> dict:
+        """Number of jobs in each state."""
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED), 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class JobRunner:
+    """Spools job inputs, scores queued jobs on background threads and serves their results."""
+
+    def __init__(self, directory: str, score_fn, workers: int = 1, chunk_size: int = 10000,
+                 ttl: float = 86400.0, lease: float = 60.0, poll_interval: float = 1.0,
+                 max_input_bytes: int = 1 << 30, aliases: dict = None):
+        """
+        Args:
+            directory: Directory holding the job store, inputs and results
+            score_fn: Callable (chunk of (patient_id, record)) -> (NDJSON bytes, model version)
+            workers: Background threads scoring jobs
+            chunk_size: Rows scored, written and checkpointed together
+            ttl: Seconds a finished job and its results are kept
+            lease: Seconds without progress after which another worker may take over a running job
+            poll_interval: Seconds between checks for new or abandoned jobs and expired results
+            max_input_bytes: Largest accepted upload
+            aliases: CSV header -> record key
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        self.directory = directory
+        self.score_fn = score_fn
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_input_bytes = max_input_bytes
+        self.aliases = aliases or {}
+
+        os.makedirs(os.path.join(directory, "inputs"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "results"), exist_ok=True)
+        self.store = JobStore(os.path.join(directory, STORE_FILE))
+
+        self._instance = uuid.uuid4().hex[:8]
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def input_path(self, job_id: str, fmt: str) -> str:
+        """Where a job's spooled input is kept until it has been scored."""
+        return os.path.join(self.directory, "inputs", f"{job_id}.{fmt}")
+
+    def results_dir(self, job_id: str) -> str:
+        """Directory holding a job's result part files."""
+        return os.path.join(self.directory, "results", job_id)
+
+    def part_path(self, job_id: str, index: int) -> str:
+        """Result part file for one chunk."""
+        return os.path.join(self.results_dir(job_id), f"part-{index:06d}.ndjson")
+
+    async def spool(self, stream) -> str:
+        """
+        Write an upload to a temporary file in the jobs directory.
+
+        Args:
+            stream: Async iterator of body chunks (request.stream())
+
+        Returns:
+            str: Path of the temporary file
+
+        Raises:
+            JobInputTooLarge: If the upload exceeds max_input_bytes
+        """
+        fd, path = tempfile.mkstemp(prefix="upload-", dir=os.path.join(self.directory, "inputs"))
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in stream:
+                    size += len(chunk)
+                    if size > self.max_input_bytes:
+                        raise JobInputTooLarge(f"Job input exceeds {self.max_input_bytes} bytes")
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path
+
+    def submit(self, spooled_path: str, fmt: str) -> dict:
+        """
+        Queue a spooled input as a new job.
+
+        Args:
+            spooled_path: File written by spool (moved into place or deleted)
+            fmt: Input format
+
+        Returns:
+            dict: The new job's status
+
+        Raises:
+            JobInputError: If the input can't be read
+        """
+        try:
+            total_rows = count_rows(spooled_path, fmt)
+        except JobInputError:
+            os.unlink(spooled_path)
+            raise
+
+        job_id = uuid.uuid4().hex
+        os.replace(spooled_path, self.input_path(job_id, fmt))
+        job = self.store.create(job_id, fmt, total_rows)
+        self._wake.set()
+        return self.describe(job)
+
+    def status(self, job_id: str):
+        """Return a job's status, or None if it doesn't exist (or has expired)."""
+        job = self.store.get(job_id)
+        if job is None or (job["expires_at"] is not None and job["expires_at"] < time.time()):
+            return None
+        return self.describe(job)
+
+    @staticmethod
+    def describe(job: dict) -> dict:
+        """Public view of a job record."""
+        total = job["total_rows"]
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "input_format": job["input_format"],
+            "total_rows": total,
+            "rows_done": job["rows_done"],
+            "progress": round(job["rows_done"] / total, 4) if total else 1.0,
+            "model_versions": json.loads(job["model_versions"]),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "expires_at": job["expires_at"],
+        }
+
+    def iter_results(self, job_id: str):
+        """
+        Yield a finished job's NDJSON results part by part, in input order.
+
+        Args:
+            job_id: Job whose results to read
+
+        Yields:
+            bytes: Contents of one part file
+        """
+        job = self.store.get(job_id)
+        for index in range(job["chunks_done"] if job is not None else 0):
+            try:
+                with open(self.part_path(job_id, index), "rb") as f:
+                    yield f.read()
+            except FileNotFoundError:
+                # Expired (and removed) while it was being downloaded
+                return
+
+    def delete(self, job_id: str) -> bool:
+        """
+        Delete a job with its input and results.
+
+        A worker scoring the job notices at its next chunk and stops.
+
+        Returns:
+            bool: False if the job didn't exist
+        """
+        job = self.store.get(job_id)
+        if job is None or not self.store.delete(job_id):
+            return False
+        self._remove_files(job_id, job["input_format"])
+        return True
+
+    def expire(self) -> int:
+        """Delete finished jobs past their TTL; returns how many were removed."""
+        expired = self.store.expire()
+        for job_id in expired:
+            self._remove_files(job_id)
+        return len(expired)
+
+    def stats(self) -> dict:
+        """Jobs per state and the runner's settings."""
+        return {**self.store.counts(), "workers": self.workers, "chunk_size": self.chunk_size,
+                "ttl_seconds": self.ttl}
+
+    def start(self):
+        """Start the background worker threads."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(f"{self._instance}-{os.getpid()}-{i}",),
+                             name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop the workers; jobs in progress go back to the queue after their current chunk."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run_once(self, worker: str) -> bool:
+        """
+        Claim one job and score it to completion (or until stopped).
+
+        Args:
+            worker: Identifier recorded as the job's owner
+
+        Returns:
+            bool: True if a job was claimed
+        """
+        job = self.store.claim(worker, self.lease)
+        if job is None:
+            return False
+
+        job_id, fmt = job["id"], job["input_format"]
+        chunks_done, rows_done = job["chunks_done"], job["rows_done"]
+        versions = json.loads(job["model_versions"])
+        try:
+            os.makedirs(self.results_dir(job_id), exist_ok=True)
+            chunks = iter_chunks(self.input_path(job_id, fmt), fmt, self.chunk_size, self.aliases)
+            for index, chunk in enumerate(chunks):
+                if index < chunks_done:
+                    # Scored before a restart; its part file is already on disk
+                    continue
+                if self._stop.is_set():
+                    self.store.release(job_id, worker)
+                    return True
+
+                encoded, version = self.score_fn(chunk)
+                self._write_part(job_id, index, encoded)
+                if version not in versions:
+                    versions.append(version)
+                chunks_done, rows_done = index + 1, rows_done + len(chunk)
+                if not self.store.progress(job_id, worker, chunks_done, rows_done, versions):
+                    # Deleted, or taken over after this worker's lease ran out
+                    return True
+        except Exception as e:
+            finished = self.store.finish(job_id, worker, FAILED, self.ttl, error=str(e))
+            if finished:
+                print(f"⚠ Warning: Batch job {job_id} failed: {e}")
+        else:
+            finished = self.store.finish(job_id, worker, SUCCEEDED, self.ttl)
+
+        # The results are complete; the input is no longer needed (unless another worker took over)
+        if finished:
+            self._remove_input(job_id, fmt)
+        return True
+
+    def _run(self, worker: str):
+        """Score jobs until stopped, expiring old results between polls."""
+        while not self._stop.is_set():
+            try:
+                if self.run_once(worker):
+                    continue
+                self.expire()
+            except Exception as e:
+                print(f"⚠ Warning: Batch job worker error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _write_part(self, job_id: str, index: int, encoded: bytes):
+        """Write one part file atomically, so a crash never leaves half a chunk."""
+        path = self.part_path(job_id, index)
+        with open(path + ".tmp", "wb") as f:
+            f.write(encoded)
+        os.replace(path + ".tmp", path)
+
+    def _remove_input(self, job_id: str, fmt: str):
+        """Delete a job's spooled input if it is still there."""
+        try:
+            os.unlink(self.input_path(job_id, fmt))
+        except FileNotFoundError:
+            pass
+
+    def _remove_files(self, job_id: str, fmt: str = None):
+        """Delete a job's results and its input (in any format if fmt is None)."""
+        shutil.rmtree(self.results_dir(job_id), ignore_errors=True)
+        for name in ([fmt] if fmt else INPUT_FORMATS.values()):
+            self._remove_input(job_id, name)
@@ -0,0 +1,486 @@
+"""
+Compiled inference kernels for the Endometriosis Prediction API.
+
+A kernel folds the preprocessing step (StandardScaler) into the model
+parameters at load time, so request-time scoring works directly on raw
+feature values without building DataFrames or calling into sklearn.
+
+Linear models become a single `x @ w + b`. Decision trees and random
+forests are flattened into contiguous node arrays and every tree is
+walked for a whole batch at once.
+
+Kernels can also run in float32 (see reduced_precision): parameters are
+converted once and inputs are scored in float32 buffers, which halves
+the memory traffic of large batches. Outputs are always float64.
+"""
+
+import threading
+
+import numpy as np
+
+# Linear models whose predict() is exactly X @ coef_ + intercept_
+FUSABLE_LINEAR_MODELS = {
+    'SGDRegressor',
+    'LinearRegression',
+    'Ridge',
+    'Lasso',
+    'ElasticNet',
+}
+
+# Tree models whose predict() is the mean of their trees' leaf values
+TREE_ENSEMBLE_MODELS = {
+    'DecisionTreeRegressor',
+    'ExtraTreeRegressor',
+    'RandomForestRegressor',
+    'ExtraTreesRegressor',
+}
+
+# Rows walked together through the trees; bounds the (trees x rows) index arrays
+TREE_BLOCK_ROWS = 512
+
+# Maximum allowed difference between the fused kernel and the sklearn path
+KERNEL_TOLERANCE = 1e-9
+
+# Default maximum allowed difference between a float32 kernel and its float64 original
+PRECISION_TOLERANCE = 1e-5
+
+# Rows in the reference set a reduced-precision kernel is checked on
+PRECISION_PROBE_ROWS = 4096
+
+
+class LinearKernel:
+    """Standard scaling and a linear model fused into `x @ w + b`."""
+
+    def __init__(self, weights: np.ndarray, bias: float, dtype=np.float64):
+        """
+        Initialize the kernel from already-fused parameters.
+
+        Args:
+            weights: Weight vector applied to raw (unscaled) features
+            bias: Constant term added to every prediction
+            dtype: Precision features and weights are multiplied in
+        """
+        self.dtype = np.dtype(dtype)
+        self.weights = np.ascontiguousarray(weights, dtype=self.dtype)
+        self.bias = float(bias)
+        self.n_features = len(self.weights)
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, model, scaler) -> "LinearKernel":
+        """
+        Fold a fitted StandardScaler into a fitted linear model.
+
+        With scaled = (x - mean) / scale, the model computes
+        scaled @ coef + intercept, which equals x @ (coef / scale) +
+        (intercept - mean @ (coef / scale)).
+
+        Args:
+            model: Fitted linear regressor with coef_ and intercept_
+            scaler: Fitted StandardScaler the model was trained behind
+
+        Returns:
+            LinearKernel: The fused kernel
+        """
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        intercept = float(np.ravel(model.intercept_)[0])
+
+        scale = getattr(scaler, 'scale_', None)
+        mean = getattr(scaler, 'mean_', None)
+
+        weights = coef / scale if scale is not None else coef.copy()
+        bias = intercept - float(mean @ weights) if mean is not None else intercept
+
+        return cls(weights, bias)
+
+    def astype(self, dtype) -> "LinearKernel":
+        """
+        Return a copy of this kernel that scores in another precision.
+
+        Convert from the float64 kernel: going back up from float32 does
+        not restore the dropped bits.
+
+        Args:
+            dtype: New precision (np.float32 or np.float64)
+
+        Returns:
+            LinearKernel: Kernel with the weights converted once
+        """
+        return LinearKernel(self.weights, self.bias, dtype)
+
+    def _buffer(self) -> np.ndarray:
+        """Return this thread's preallocated single-row buffer."""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty(self.n_features, dtype=self.dtype)
+            self._local.buffer = buffer
+        return buffer
+
+    def predict_one(self, values) -> float:
+        """
+        Score a single row of raw feature values.
+
+        Args:
+            values: Sequence of feature values in training order
+
+        Returns:
+            float: Unclipped model output
+        """
+        buffer = self._buffer()
+        buffer[:] = values
+        return float(buffer @ self.weights) + self.bias
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Score a matrix of raw feature values.
+
+        Args:
+            X: Array of shape (n_rows, n_features) in training order
+
+        Returns:
+            np.ndarray: Unclipped float64 model outputs
+        """
+        # The bias is added in float64, which also converts float32 outputs
+        return np.add(np.asarray(X, dtype=self.dtype) @ self.weights, self.bias, dtype=np.float64)
+
+
+class TreeEnsembleKernel:
+    """
+    Decision trees flattened into node arrays and evaluated for whole batches.
+
+    All trees share one set of arrays and tree t starts at node roots[t].
+    Nodes are numbered breadth-first with the two children of a split next
+    to each other, so a step is `node = left[node] + (x > threshold[node])`.
+    Leaves point back at themselves with an infinite threshold, so after
+    `depth` steps every row sits on its leaf without any branching.
+
+    Like sklearn, features are standardized in float64, cast to float32 and
+    compared with the split threshold. Thresholds are stored as the largest
+    float32 not above sklearn's float64 threshold, which gives the same
+    comparison for every float32 input. Tree outputs are summed in tree
+    order and divided by the tree count, as in RandomForestRegressor.predict.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, depth: int,
+                 mean: np.ndarray, scale: np.ndarray, dtype=np.float64):
+        """
+        Initialize the kernel from already-flattened arrays.
+
+        Args:
+            feature: Feature index tested at each node (0 at leaves)
+            threshold: float32 split threshold at each node (+inf at leaves)
+            left: Node taken when x <= threshold; x > threshold takes left + 1 (the node itself at leaves)
+            value: float64 output at each node (read at leaves)
+            roots: Index of each tree's root node
+            depth: Maximum depth over all trees
+            mean: Scaler mean per feature
+            scale: Scaler scale per feature
+            dtype: Precision raw features are standardized in
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.dtype = np.dtype(dtype)
+        self.mean = np.asarray(mean, dtype=self.dtype)
+        self.scale = np.asarray(scale, dtype=self.dtype)
+        self.n_features = len(self.mean)
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler) -> "TreeEnsembleKernel":
+        """
+        Flatten a fitted tree or forest regressor and its scaler.
+
+        Args:
+            model: Fitted DecisionTreeRegressor, RandomForestRegressor or extra-trees variant
+            scaler: Fitted StandardScaler the model was trained behind
+
+        Returns:
+            TreeEnsembleKernel: The compiled kernel
+        """
+        trees = [estimator.tree_ for estimator in getattr(model, 'estimators_', [model])]
+        n_features = trees[0].n_features
+
+        sizes = [tree.node_count for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        total = int(sum(sizes))
+
+        # Compact dtypes: a 100-tree, depth-10 forest takes well under 1 MB
+        feature = np.empty(total, dtype=np.uint8 if n_features <= 256 else np.int32)
+        threshold = np.empty(total, dtype=np.float32)
+        left = np.empty(total, dtype=np.int32)
+        value = np.empty(total, dtype=np.float64)
+
+        for tree, offset in zip(trees, offsets):
+            order, first_child = _breadth_first(tree)
+            nodes = slice(offset, offset + len(order))
+            is_leaf = tree.children_left[order] == -1
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature[order])
+            threshold[nodes] = np.where(is_leaf, np.float32(np.inf), _float32_floor(tree.threshold[order]))
+            left[nodes] = offset + np.where(is_leaf, np.arange(len(order)), first_child)
+            value[nodes] = tree.value[order, 0, 0]
+
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        return cls(
+            feature, threshold, left, value,
+            roots=offsets.astype(np.int32),
+            depth=max(tree.max_depth for tree in trees),
+            mean=np.zeros(n_features) if mean is None else mean,
+            scale=np.ones(n_features) if scale is None else scale
+        )
+
+    def astype(self, dtype) -> "TreeEnsembleKernel":
+        """
+        Return a copy of this kernel that standardizes in another precision.
+
+        The node arrays are shared; only the scaler parameters are converted,
+        so convert from the float64 kernel.
+
+        Args:
+            dtype: New precision (np.float32 or np.float64)
+
+        Returns:
+            TreeEnsembleKernel: Kernel with the scaler parameters converted once
+        """
+        return TreeEnsembleKernel(
+            self.feature, self.threshold, self.left, self.value, self.roots, self.depth,
+            self.mean, self.scale, dtype
+        )
+
+    def predict_scaled(self, X: np.ndarray) -> np.ndarray:
+        """
+        Score already-standardized features.
+
+        Args:
+            X: Array of shape (n_rows, n_features)
+
+        Returns:
+            np.ndarray: float64 model outputs
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), TREE_BLOCK_ROWS):
+            block = X[start:start + TREE_BLOCK_ROWS]
+            out[start:start + len(block)] = self._predict_block(block)
+        return out
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        """Walk every tree for one block of float32 rows."""
+        flat = X.ravel()
+        row_offsets = np.arange(len(X), dtype=np.intp) * self.n_features
+
+        # One (n_trees, n_rows) grid of current nodes, all starting at the roots.
+        # Node indices are kept as intp so NumPy doesn't convert them on every gather.
+        nodes = np.repeat(self.roots.astype(np.intp)[:, None], len(X), axis=1)
+        for _ in range(self.depth):
+            x = flat[row_offsets + self.feature[nodes]]
+            nodes = np.add(self.left[nodes], x > self.threshold[nodes], dtype=np.intp)
+
+        # cumsum adds the trees strictly one after another, in sklearn's order
+        # (sum() may switch to pairwise summation and differ in the last bit)
+        total = np.cumsum(self.value[nodes], axis=0)[-1]
+        if self.n_trees > 1:
+            total /= self.n_trees
+        return total
+
+    def predict_one(self, values) -> float:
+        """
+        Score a single row of raw feature values.
+
+        Args:
+            values: Sequence of feature values in training order
+
+        Returns:
+            float: Model output
+        """
+        return float(self.predict(np.asarray([values], dtype=self.dtype))[0])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Score a matrix of raw feature values.
+
+        Args:
+            X: Array of shape (n_rows, n_features) in training order
+
+        Returns:
+            np.ndarray: Model outputs
+        """
+        return self.predict_scaled((np.asarray(X, dtype=self.dtype) - self.mean) / self.scale)
+
+
+def _breadth_first(tree) -> tuple:
+    """
+    Number a sklearn tree's nodes breadth-first with sibling children adjacent.
+
+    Args:
+        tree: Fitted sklearn Tree (estimator.tree_)
+
+    Returns:
+        tuple: (old node id for each new position, new position of each node's left child)
+    """
+    children_left, children_right = tree.children_left, tree.children_right
+    levels = [np.array([0])]
+    first_child = np.zeros(tree.node_count, dtype=np.int64)
+    placed = 1
+    while True:
+        level = levels[-1]
+        splits = level[children_left[level] != -1]
+        if len(splits) == 0:
+            break
+        first_child[splits] = placed + 2 * np.arange(len(splits))
+        placed += 2 * len(splits)
+        levels.append(np.stack([children_left[splits], children_right[splits]], axis=1).ravel())
+
+    order = np.concatenate(levels)
+    return order, first_child[order]
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """Round float64 values down to the nearest float32."""
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def compile_kernel(model, scaler):
+    """
+    Compile a fused kernel for a model/scaler pair if the model supports it.
+
+    The kernel is checked against the sklearn path on a probe set and
+    discarded if the outputs disagree, so callers can always fall back
+    to sklearn when this returns None.
+
+    Args:
+        model: Fitted sklearn regressor
+        scaler: Fitted StandardScaler
+
+    Returns:
+        LinearKernel, TreeEnsembleKernel or None: The compiled kernel, or None if the model can't be compiled
+    """
+    model_type = type(model).__name__
+    if type(scaler).__name__ != 'StandardScaler':
+        return None
+
+    if model_type in FUSABLE_LINEAR_MODELS:
+        if np.ndim(model.coef_) != 1:
+            return None
+        kernel = LinearKernel.from_sklearn(model, scaler)
+    elif model_type in TREE_ENSEMBLE_MODELS:
+        if getattr(model, 'n_outputs_', 1) != 1:
+            return None
+        kernel = TreeEnsembleKernel.from_sklearn(model, scaler)
+    else:
+        return None
+
+    if not kernel_matches_sklearn(kernel, model, scaler):
+        return None
+    return kernel
+
+
+def kernel_matches_sklearn(kernel, model, scaler, n_probe: int = 256) -> bool:
+    """
+    Check a kernel against the sklearn scaler + model path.
+
+    Args:
+        kernel: Compiled kernel to check
+        model: Fitted sklearn regressor
+        scaler: Fitted StandardScaler
+        n_probe: Number of random probe rows
+
+    Returns:
+        bool: True if every probe prediction agrees within KERNEL_TOLERANCE
+    """
+    rng = np.random.default_rng(0)
+    center, spread = _distribution(scaler, kernel.n_features)
+    probe = probe_rows(scaler, kernel.n_features, n_probe, rng)
+
+    if isinstance(kernel, TreeEnsembleKernel):
+        # Also land exactly on split thresholds, where float32 rounding matters
+        splits = np.flatnonzero(np.isfinite(kernel.threshold))
+        chosen = rng.choice(splits, size=min(n_probe, len(splits)), replace=False)
+        on_split = np.zeros((len(chosen), kernel.n_features))
+        on_split[np.arange(len(chosen)), kernel.feature[chosen]] = kernel.threshold[chosen]
+        probe = np.vstack([probe, center + spread * on_split])
+
+    expected = model.predict(scaler.transform(_as_frame(probe, scaler)))
+    fused = kernel.predict(probe)
+    single = np.array([kernel.predict_one(row) for row in probe[:8]])
+
+    return (
+        np.allclose(fused, expected, rtol=KERNEL_TOLERANCE, atol=KERNEL_TOLERANCE)
+        and np.allclose(single, expected[:8], rtol=KERNEL_TOLERANCE, atol=KERNEL_TOLERANCE)
+    )
+
+
+def probe_rows(scaler, n_features: int, n_probe: int, rng) -> np.ndarray:
+    """
+    Draw raw feature rows around the training distribution (mean +/- 3 std).
+
+    Args:
+        scaler: Fitted StandardScaler (or anything with mean_ and scale_)
+        n_features: Number of features
+        n_probe: Number of rows
+        rng: NumPy random Generator
+
+    Returns:
+        np.ndarray: float64 array of shape (n_probe, n_features)
+    """
+    center, spread = _distribution(scaler, n_features)
+    return center + spread * rng.uniform(-3.0, 3.0, size=(n_probe, n_features))
+
+
+def _distribution(scaler, n_features: int) -> tuple:
+    """Scaler mean and scale, or 0 and 1 when the scaler doesn't have them."""
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    return (
+        np.asarray(mean, dtype=np.float64) if mean is not None else np.zeros(n_features),
+        np.asarray(scale, dtype=np.float64) if scale is not None else np.ones(n_features)
+    )
+
+
+def reduced_precision(kernel, scaler, dtype=np.float32, tolerance: float = PRECISION_TOLERANCE,
+                      n_probe: int = PRECISION_PROBE_ROWS) -> tuple:
+    """
+    Convert a float64 kernel to a lower precision and measure the accuracy drift.
+
+    Both kernels score the same reference set (rows around the training
+    distribution, through the batch and single-row paths) and the drift is
+    the largest absolute difference between their outputs.
+
+    Args:
+        kernel: Compiled float64 kernel
+        scaler: Scaler the kernel was compiled with (places the reference set)
+        dtype: Precision to convert to
+        tolerance: Largest drift accepted
+        n_probe: Rows in the reference set
+
+    Returns:
+        tuple: (converted kernel, or None if the drift exceeds tolerance, drift)
+    """
+    candidate = kernel.astype(dtype)
+    reference = probe_rows(scaler, kernel.n_features, n_probe, np.random.default_rng(0))
+
+    drift = float(np.max(np.abs(candidate.predict(reference) - kernel.predict(reference))))
+    for row in reference[:8]:
+        drift = max(drift, abs(candidate.predict_one(row) - kernel.predict_one(row)))
+
+    if not drift <= tolerance:
+        return None, drift
+    return candidate, drift
+
+
+def _as_frame(X: np.ndarray, scaler):
+    """Wrap X in a DataFrame when the scaler was fitted with feature names."""
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is None:
+        return X
+    import pandas as pd
+    return pd.DataFrame(X, columns=list(names))
@@ -3,16 +3,53 @@ FastAPI application for Endometriosis Regression Model Predictions
 This API provides endpoints to make predictions using the trained linear regression model.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Literal, Optional
+import contextvars
+import hmac
+import json
 import joblib
 import numpy as np
-import pandas as pd
 import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
 
+from admission import AdmissionError, InferenceExecutor
+from batching import BatcherClosedError, MicroBatcher
+from bundle import ARTIFACT_FILES, BUNDLE_FILE, artifact_hash, open_bundle
+from cache import PredictionCache
+from columnar import (
+    ARROW_FILE_CONTENT_TYPE,
+    ARROW_STREAM_CONTENT_TYPE,
+    INVALID_CODE,
+    NPY_CONTENT_TYPE,
+    NPZ_CONTENT_TYPE,
+    ColumnarDependencyError,
+    ColumnarFormatError,
+    column_specs,
+    decode_columns,
+    encode_results,
+    is_columnar,
+    json_rows_to_columns,
+    validate_columns,
+)
+from dedup import DEDUP_MIN_ROWS, unique_rows, worth_deduplicating
+from fast_json import FastJSONResponse, dumps as fast_dumps, encoder_name, loads as fast_loads
+from jobs import JobInputError, JobInputTooLarge, JobRunner, input_format as job_input_format
+from kernels import KERNEL_TOLERANCE, PRECISION_TOLERANCE, compile_kernel, reduced_precision
+from metrics import ApiMetrics, MetricsMiddleware, mark_handler_end, mark_handler_start
+from online import FeedbackBufferFull, OnlineLearner
+from watcher import ArtifactWatcher
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Endometriosis Prediction API",
@@ -29,6 +66,14 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Per-endpoint request and stage timings, exported by GET /metrics
+METRICS = ApiMetrics(
+    endpoints=("/predict", "/predict_batch", "/predict_stream"),
+    stages=("validate", "features", "dedup", "kernel", "dataframe", "scale", "predict",
+            "micro_batch", "serialize")
+)
+app.add_middleware(MetricsMiddleware, metrics=METRICS)
+
 # ==================== Pydantic Models ====================
 
 class PatientData(BaseModel):
@@ -158,6 +203,31 @@ class PredictionResponse(BaseModel):
     input_data: dict = Field(..., description="Echo of input data for verification")
 
 
+class LabelledPatient(PatientData):
+    """
+    Patient data with a confirmed outcome, used for online learning.
+    
+    Attributes:
+        diagnosis: Confirmed diagnosis (the model's training target)
+    """
+    diagnosis: float = Field(
+        ...,
+        ge=0.0,
+        le=1.0,
+        description="Confirmed diagnosis (0=No, 1=Yes)"
+    )
+
+
+class FeedbackRequest(BaseModel):
+    """
+    Input model for confirmed outcomes.
+    
+    Attributes:
+        outcomes: Patients with their confirmed diagnosis
+    """
+    outcomes: list[LabelledPatient] = Field(..., min_length=1, description="Patients with confirmed diagnoses")
+
+
 class BatchPredictionResponse(BaseModel):
     """Response model for batch predictions."""
     predictions: list[dict] = Field(..., description="List of predictions for each patient")
@@ -167,74 +237,465 @@ class BatchPredictionResponse(BaseModel):
 
 # ==================== Model Loading ====================
 
+# Map each model feature name to the matching PatientData attribute
+FEATURE_FIELDS = {
+    'Age': 'age',
+    'Menstrual_Irregularity': 'menstrual_irregularity',
+    'Chronic_Pain_Level': 'chronic_pain_level',
+    'Hormone_Level_Abnormality': 'hormone_level_abnormality',
+    'Infertility': 'infertility',
+    'BMI': 'bmi'
+}
+
+# Confidence buckets: prediction < 0.33 is Low, < 0.67 is Medium, otherwise High
+CONFIDENCE_THRESHOLDS = np.array([0.33, 0.67])
+CONFIDENCE_LEVELS = np.array(["Low", "Medium", "High"])
+
+
+class ModelReloadError(Exception):
+    """Raised when a new artifact set can't be loaded or fails its smoke test."""
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """
+    One consistent set of loaded artifacts.
+    
+    ModelManager publishes a new LoadedModel with a single assignment, so a
+    request that reads it once always scores with a model, scaler, kernel and
+    version that belong together.
+    """
+    version: str
+    model: object
+    scaler: object
+    features: list
+    label_encoders: dict
+    kernel: Optional[object] = None
+    # Artifact version an online-learning model was trained from (None for artifacts from disk)
+    origin_version: Optional[str] = None
+    # Largest float32-vs-float64 difference on the reference set (None unless float32 was requested)
+    precision_drift: Optional[float] = None
+    # Score each distinct row of a batch once (see dedup.py)
+    dedup: bool = False
+    
+    @property
+    def dtype(self) -> np.dtype:
+        """Precision feature matrices are built and scored in."""
+        return self.kernel.dtype if self.kernel is not None else np.dtype(np.float64)
+    
+    def feature_values(self, data: PatientData) -> tuple:
+        """Extract raw feature values for one patient in training order."""
+        return tuple(getattr(data, FEATURE_FIELDS[feature]) for feature in self.features)
+    
+    def feature_matrix(self, patients: list[PatientData], dtype=None) -> np.ndarray:
+        """Build the raw (n_patients, n_features) matrix in training order (default: in the kernel's precision)."""
+        # Fill the array column by column, straight into the scoring precision
+        raw = np.empty((len(patients), len(self.features)), dtype=dtype or self.dtype)
+        for col, feature in enumerate(self.features):
+            field = FEATURE_FIELDS[feature]
+            raw[:, col] = [getattr(patient, field) for patient in patients]
+        return raw
+    
+    def score_one(self, values: tuple) -> float:
+        """Score one row of raw feature values (unclipped)."""
+        if self.kernel is not None:
+            # Fused kernel scores raw features directly
+            start = time.perf_counter()
+            prediction = self.kernel.predict_one(values)
+            METRICS.observe_stage("kernel", time.perf_counter() - start)
+            return prediction
+        
+        return self._score_sklearn([values])[0]
+    
+    def score_matrix(self, raw: np.ndarray) -> np.ndarray:
+        """Score a raw feature matrix (unclipped), scoring repeated rows only once."""
+        if self.dedup and len(raw) >= DEDUP_MIN_ROWS:
+            start = time.perf_counter()
+            first, inverse = unique_rows(raw)
+            METRICS.observe_stage("dedup", time.perf_counter() - start)
+            METRICS.count_dedup(len(raw), len(first))
+            if len(first) < len(raw):
+                # Score the distinct rows and copy each result back to every duplicate
+                return self._score_matrix(raw[first])[inverse]
+        
+        return self._score_matrix(raw)
+    
+    def _score_matrix(self, raw: np.ndarray) -> np.ndarray:
+        """Score every row of a raw feature matrix with the kernel or the sklearn path."""
+        if self.kernel is not None:
+            start = time.perf_counter()
+            predictions = self.kernel.predict(raw)
+            METRICS.observe_stage("kernel", time.perf_counter() - start)
+            return predictions
+        
+        return self._score_sklearn(raw)
+    
+    def _score_sklearn(self, rows) -> np.ndarray:
+        """Score rows through a DataFrame, scaler.transform and model.predict, timing each step."""
+        import pandas as pd
+        
+        # Keep the feature names so the scaler sees the same columns as in training
+        start = time.perf_counter()
+        df = pd.DataFrame(rows, columns=self.features)
+        built = time.perf_counter()
+        scaled = self.scaler.transform(df)
+        transformed = time.perf_counter()
+        predictions = self.model.predict(scaled)
+        done = time.perf_counter()
+        
+        METRICS.observe_stage("dataframe", built - start)
+        METRICS.observe_stage("scale", transformed - built)
+        METRICS.observe_stage("predict", done - transformed)
+        return predictions
+
+
 class ModelManager:
     """Manager for loading and using the trained model."""
     
-    def __init__(self, model_dir: str = "models"):
-        """Initialize the model manager and load artifacts."""
+    def __init__(self, model_dir: str = "models", cache_size: int = 0,
+                 inference_dtype: str = "float64", precision_tolerance: float = PRECISION_TOLERANCE,
+                 dedup: str = "auto"):
+        """
+        Initialize the model manager and load artifacts.
+        
+        Args:
+            model_dir: Directory containing the model artifacts
+            cache_size: Maximum number of cached predictions (0 disables the cache)
+            inference_dtype: "float64", or "float32" to score with a reduced-precision kernel
+            precision_tolerance: Largest float32-vs-float64 drift accepted before falling back to float64
+            dedup: Score repeated rows of a batch once: "on", "off", or "auto" (for all but linear models)
+        """
+        if inference_dtype not in ("float32", "float64"):
+            raise ValueError(f"inference_dtype must be 'float32' or 'float64', got {inference_dtype!r}")
+        if dedup not in ("auto", "on", "off"):
+            raise ValueError(f"dedup must be 'auto', 'on' or 'off', got {dedup!r}")
+        self.dedup = dedup
         self.model_dir = model_dir
-        self.model = None
-        self.scaler = None
-        self.features = None
-        self.label_encoders = None
+        self.inference_dtype = np.dtype(inference_dtype)
+        self.precision_tolerance = precision_tolerance
+        self.cache = PredictionCache(cache_size) if cache_size > 0 else None
+        self.batcher = None
+        self.watcher = None
+        self.learner = None
+        self.jobs = None
+        self._active = None
+        self._pinned = contextvars.ContextVar(f"pinned_model_{id(self)}", default=None)
+        self._load_lock = threading.Lock()
         self._load_artifacts()
     
-    def _load_artifacts(self):
-        """Load model and preprocessing artifacts."""
+    @property
+    def active(self) -> Optional[LoadedModel]:
+        """The artifact set serving the current request (see pinned), or None if nothing is loaded."""
+        pinned = self._pinned.get()
+        return pinned if pinned is not None else self._active
+    
+    @contextmanager
+    def pinned(self, state: Optional[LoadedModel] = None):
+        """
+        Serve everything inside the block from one artifact set, even across a reload.
+        
+        The pin is a context variable, so it follows the request into
+        run_in_threadpool and INFERENCE.run calls made inside the block.
+        
+        Args:
+            state: Artifact set to pin (default: the one active now)
+            
+        Yields:
+            LoadedModel: The pinned artifact set (None if nothing is loaded)
+        """
+        state = state if state is not None else self.active
+        token = self._pinned.set(state)
         try:
-            # Try loading from relative path first (for local testing)
-            if os.path.exists(self.model_dir):
-                model_path = os.path.join(self.model_dir, 'best_model.pkl')
+            yield state
+        finally:
+            self._pinned.reset(token)
+    
+    @property
+    def model(self):
+        return self.active.model if self.active else None
+    
+    @property
+    def scaler(self):
+        return self.active.scaler if self.active else None
+    
+    @property
+    def features(self):
+        return self.active.features if self.active else None
+    
+    @property
+    def label_encoders(self):
+        return self.active.label_encoders if self.active else None
+    
+    @property
+    def model_version(self):
+        return self.active.version if self.active else None
+    
+    @property
+    def kernel(self):
+        return self.active.kernel if self.active else None
+    
+    @kernel.setter
+    def kernel(self, kernel):
+        """Swap the kernel of the active model (None forces the sklearn path)."""
+        self._active = replace(self._active, kernel=kernel)
+    
+    def _read_artifacts(self) -> tuple:
+        """
+        Load a complete artifact set without touching the one being served.
+        
+        Returns:
+            tuple: (model_dir, LoadedModel)
+        """
+        # Try loading from relative path first (for local testing)
+        model_dir = self.model_dir
+        if os.path.exists(model_dir):
+            model_path = os.path.join(model_dir, 'best_model.pkl')
+        else:
+            # Try parent directory path (for when running from API folder)
+            model_path = os.path.join('..', 'linear_regression', 'models', 'best_model.pkl')
+            model_dir = os.path.dirname(model_path)
+        
+        # Prefer the memory-mapped bundle: no unpickling, no sklearn import
+        bundle = open_bundle(model_dir)
+        if bundle is not None:
+            model, scaler = bundle.model, bundle.scaler
+            features, label_encoders = bundle.features, bundle.label_encoders
+            model_version = bundle.model_version
+        else:
+            model = joblib.load(model_path)
+            scaler_path = os.path.join(model_dir, 'scaler.pkl')
+            scaler = joblib.load(scaler_path)
+            
+            features_path = os.path.join(model_dir, 'features.pkl')
+            features = joblib.load(features_path)
+            
+            encoders_path = os.path.join(model_dir, 'label_encoders.pkl')
+            label_encoders = joblib.load(encoders_path)
+            
+            # Version the model by its artifact contents; cached predictions never cross versions
+            model_version = artifact_hash(model_dir)
+        
+        # Fold the scaler into the model so requests skip pandas and sklearn
+        kernel = None
+        if bundle is not None:
+            # The bundle ships a kernel that was verified against sklearn at conversion
+            kernel = bundle.kernel
+            print(f"✓ Memory-mapped model bundle {bundle.path} ({bundle.model_type})")
+        else:
+            try:
+                kernel = compile_kernel(model, scaler)
+            except Exception as e:
+                print(f"⚠ Warning: Could not compile fused kernel ({e}), using sklearn path")
             else:
-                # Try parent directory path (for when running from API folder)
-                model_path = os.path.join('..', 'linear_regression', 'models', 'best_model.pkl')
-                self.model_dir = os.path.dirname(model_path)
+                if kernel is not None:
+                    print(f"✓ Compiled fused inference kernel for {type(model).__name__}")
+                else:
+                    print(f"ℹ No fused kernel for {type(model).__name__}, using sklearn path")
+        
+        kernel, drift = self._reduce_precision(kernel, scaler, log=True)
+        state = LoadedModel(
+            version=model_version,
+            model=model,
+            scaler=scaler,
+            features=features,
+            label_encoders=label_encoders,
+            kernel=kernel,
+            precision_drift=drift,
+            dedup=self._dedup_enabled(model, kernel)
+        )
+        return model_dir, state
+    
+    def _dedup_enabled(self, model, kernel) -> bool:
+        """Whether batches for this model should be deduplicated before scoring."""
+        if self.dedup == "auto":
+            return worth_deduplicating(model, kernel)
+        return self.dedup == "on"
+    
+    def _reduce_precision(self, kernel, scaler, log: bool = False) -> tuple:
+        """
+        Convert a float64 kernel to INFERENCE_DTYPE if its drift is within tolerance.
+        
+        Args:
+            kernel: Compiled float64 kernel (or None for the sklearn path)
+            scaler: Scaler the kernel was compiled with
+            log: Print the outcome
+            
+        Returns:
+            tuple: (kernel to serve, measured drift or None if nothing was converted)
+        """
+        if self.inference_dtype == np.float64:
+            return kernel, None
+        if kernel is None:
+            if log:
+                print(f"ℹ {self.inference_dtype} inference needs a fused kernel, scoring in float64")
+            return kernel, None
+        
+        reduced, drift = reduced_precision(kernel, scaler, self.inference_dtype, self.precision_tolerance)
+        if reduced is None:
+            print(f"⚠ Warning: {self.inference_dtype} drift {drift:.3g} exceeds {self.precision_tolerance:g}, "
+                  "scoring in float64")
+            return kernel, drift
+        if log:
+            print(f"✓ {self.inference_dtype} inference kernel (drift {drift:.3g} vs float64)")
+        return reduced, drift
+    
+    def _smoke_test(self, state: LoadedModel):
+        """Smoke-test an artifact set, allowing the accepted drift for reduced-precision kernels."""
+        smoke_test(state, KERNEL_TOLERANCE if state.dtype == np.float64 else self.precision_tolerance)
+    
+    def _publish(self, state: LoadedModel):
+        """Make an artifact set the active one with a single assignment."""
+        self._active = state
+        
+        # Entries from older versions can never be hit again; drop them
+        if self.cache is not None:
+            self.cache.clear()
+    
+    def _load_artifacts(self):
+        """Load model and preprocessing artifacts."""
+        with self._load_lock:
+            try:
+                model_dir, state = self._read_artifacts()
+            except Exception as e:
+                print(f"⚠ Warning: Could not load model artifacts: {e}")
+                print("API will attempt to load models on first request")
+                return
             
-            self.model = joblib.load(model_path)
-            scaler_path = os.path.join(self.model_dir, 'scaler.pkl')
-            self.scaler = joblib.load(scaler_path)
+            # Publish the whole artifact set with one assignment
+            self.model_dir = model_dir
+            self._publish(state)
             
-            features_path = os.path.join(self.model_dir, 'features.pkl')
-            self.features = joblib.load(features_path)
+            print(f"✓ Model artifacts loaded successfully from {self.model_dir} (version {state.version})")
+    
+    def reload(self) -> dict:
+        """
+        Load the artifacts again and swap them in if they pass a smoke test.
+        
+        Requests keep being served by the current artifact set while the new
+        one loads; requests already running finish on the version they
+        started with. If loading or the smoke test fails, nothing changes.
+        
+        Returns:
+            dict: Reload outcome with the previous and active model versions
+        """
+        with self._load_lock:
+            previous = self._active
+            start = time.perf_counter()
+            try:
+                model_dir, state = self._read_artifacts()
+                self._smoke_test(state)
+            except Exception as e:
+                raise ModelReloadError(f"Could not reload model artifacts: {e}")
             
-            encoders_path = os.path.join(self.model_dir, 'label_encoders.pkl')
-            self.label_encoders = joblib.load(encoders_path)
+            previous_version = previous.version if previous is not None else None
+            # Unchanged files also keep the online updates made on top of them
+            origin_version = previous.origin_version if previous is not None else None
+            if state.version in (previous_version, origin_version):
+                return {
+                    "status": "unchanged",
+                    "model_version": previous_version,
+                    "previous_version": previous_version,
+                    "load_seconds": round(time.perf_counter() - start, 3)
+                }
             
-            print(f"✓ Model artifacts loaded successfully from {self.model_dir}")
-        except Exception as e:
-            print(f"⚠ Warning: Could not load model artifacts: {e}")
-            print("API will attempt to load models on first request")
+            self.model_dir = model_dir
+            self._publish(state)
+        
+        print(f"✓ Model reloaded: {previous_version} -> {state.version}")
+        return {
+            "status": "reloaded",
+            "model_version": state.version,
+            "previous_version": previous_version,
+            "load_seconds": round(time.perf_counter() - start, 3)
+        }
     
-    def preprocess_input(self, data: PatientData) -> np.ndarray:
+    def publish_online(self, base: LoadedModel, model, version: str) -> Optional[LoadedModel]:
         """
-        Preprocess input data for prediction.
+        Swap in a model updated by online learning, unless a reload got there first.
         
         Args:
-            data: PatientData input
+            base: Artifact set the update was trained from
+            model: Updated model (same scaler and features as `base`)
+            version: Version of the updated model
             
         Returns:
-            np.ndarray: Scaled features
-        """
-        # Convert input to dictionary with correct column names
-        input_dict = {
-            'Age': data.age,
-            'Menstrual_Irregularity': data.menstrual_irregularity,
-            'Chronic_Pain_Level': data.chronic_pain_level,
-            'Hormone_Level_Abnormality': data.hormone_level_abnormality,
-            'Infertility': data.infertility,
-            'BMI': data.bmi
-        }
+            LoadedModel: The published artifact set, or None if `base` is no longer active
+        """
+        with self._load_lock:
+            if self._active is not base:
+                return None
+            
+            try:
+                kernel = compile_kernel(model, base.scaler)
+            except Exception:
+                kernel = None
+            kernel, drift = self._reduce_precision(kernel, base.scaler)
+            state = replace(
+                base,
+                version=version,
+                model=model,
+                kernel=kernel,
+                origin_version=base.origin_version or base.version,
+                precision_drift=drift,
+                dedup=self._dedup_enabled(model, kernel)
+            )
+            self._smoke_test(state)
+            self._publish(state)
+        
+        print(f"✓ Online update published: {base.version} -> {version}")
+        return state
+    
+    def enable_online_learning(self, **options):
+        """
+        Start learning from confirmed outcomes posted to /feedback.
         
-        # Create DataFrame with correct column order
-        df = pd.DataFrame([input_dict])
+        A checkpoint trained from the artifacts being served is restored first.
+        
+        Args:
+            **options: OnlineLearner settings (batch_size, interval, ...)
+        """
+        if self.learner is not None:
+            self.learner.stop()
+        self.learner = OnlineLearner(lambda: self._active, self.publish_online, lambda: self.model_dir, **options)
+        self.learner.restore()
+        self.learner.start()
+    
+    def enable_jobs(self, score_fn, directory: str, **options):
+        """
+        Start scoring batch jobs submitted to POST /jobs in the background.
         
-        # Ensure columns are in the same order as training data
-        df = df[self.features]
+        Jobs left unfinished by an earlier process are resumed.
         
-        # Scale the features
-        scaled_data = self.scaler.transform(df)
+        Args:
+            score_fn: Callable scoring one chunk of (patient_id, record) pairs,
+                returning (NDJSON bytes, model version)
+            directory: Directory for the job store, inputs and results
+            **options: JobRunner settings (workers, chunk_size, ttl, ...)
+        """
+        if self.jobs is not None:
+            self.jobs.stop()
+        self.jobs = JobRunner(directory, score_fn, **options)
+        self.jobs.start()
+    
+    def watch(self, interval: float):
+        """
+        Reload automatically when the artifact files change.
         
-        return scaled_data
+        Args:
+            interval: Seconds between checks of the model directory
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+        filenames = ARTIFACT_FILES + [BUNDLE_FILE]
+        self.watcher = ArtifactWatcher(lambda: self.model_dir, filenames, self._reload_from_watcher, interval)
+        self.watcher.start()
+    
+    def _reload_from_watcher(self):
+        """Reload after a file change, logging instead of raising."""
+        try:
+            self.reload()
+        except ModelReloadError as e:
+            print(f"⚠ Warning: {e}; still serving version {self.model_version}")
     
     def predict(self, data: PatientData) -> tuple:
         """
@@ -246,17 +707,44 @@ class ModelManager:
         Returns:
             tuple: (prediction, confidence_level)
         """
-        if self.model is None:
+        # Read the active model once; everything below uses this snapshot
+        state = self.active
+        if state is None:
             raise HTTPException(
                 status_code=503,
                 detail="Model is not loaded. Please check server logs."
             )
         
-        # Preprocess input
-        scaled_data = self.preprocess_input(data)
+        start = time.perf_counter()
+        values = state.feature_values(data)
+        METRICS.observe_stage("features", time.perf_counter() - start)
         
-        # Make prediction
-        prediction = self.model.predict(scaled_data)[0]
+        # Serve repeated profiles from the cache
+        if self.cache is not None:
+            cached = self.cache.get((state.version, values))
+            if cached is not None:
+                return cached
+        
+        batcher = self.batcher
+        if batcher is not None:
+            # Score together with other concurrent requests; the batch may run on
+            # a newer model, so cache under the version that actually scored it
+            start = time.perf_counter()
+            try:
+                prediction, confidence, version = batcher.submit(values)
+            except BatcherClosedError:
+                # The batcher was replaced or shut down; score this row directly
+                pass
+            else:
+                METRICS.observe_stage("micro_batch", time.perf_counter() - start)
+                if self.cache is not None:
+                    self.cache.put((version, values), (prediction, confidence))
+                # A reload landed while the row was queued; answer from this request's snapshot
+                if version == state.version:
+                    return prediction, confidence
+        
+        prediction = state.score_one(values)
+        METRICS.count_rows(state.version, 1)
         
         # Clip prediction to valid range [0, 1]
         prediction = max(0.0, min(1.0, prediction))
@@ -269,47 +757,718 @@ class ModelManager:
         else:
             confidence = "High"
         
+        if self.cache is not None:
+            self.cache.put((state.version, values), (prediction, confidence))
+        
         return prediction, confidence
+    
+    def feature_values(self, data: PatientData) -> tuple:
+        """
+        Extract raw feature values for one patient in training order.
+        
+        Args:
+            data: PatientData input
+            
+        Returns:
+            tuple: Unscaled feature values
+        """
+        return self.active.feature_values(data)
+    
+    def feature_matrix(self, patients: list[PatientData]) -> np.ndarray:
+        """
+        Build the raw feature matrix for a list of patients.
+        
+        Args:
+            patients: List of PatientData inputs
+            
+        Returns:
+            np.ndarray: Unscaled features with shape (n_patients, n_features)
+        """
+        return self.active.feature_matrix(patients)
+    
+    def score_matrix(self, raw: np.ndarray) -> np.ndarray:
+        """
+        Score a raw feature matrix with the fused kernel or the sklearn path.
+        
+        Args:
+            raw: Unscaled features with shape (n_rows, n_features)
+            
+        Returns:
+            np.ndarray: Unclipped predictions
+        """
+        return self.active.score_matrix(raw)
+    
+    def predict_batch(self, patients: list[PatientData]) -> tuple:
+        """
+        Make predictions for many patients with one scaler and model call.
+        
+        Args:
+            patients: List of PatientData inputs
+            
+        Returns:
+            tuple: (predictions, confidence_levels) as aligned np.ndarrays
+        """
+        state = self.active
+        if state is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Model is not loaded. Please check server logs."
+            )
+        
+        if not patients:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=CONFIDENCE_LEVELS.dtype)
+        
+        # Preprocess and predict the whole batch at once
+        start = time.perf_counter()
+        raw = state.feature_matrix(patients)
+        METRICS.observe_stage("features", time.perf_counter() - start)
+        
+        predictions = state.score_matrix(raw)
+        METRICS.observe_batch(len(patients))
+        METRICS.count_rows(state.version, len(patients))
+        
+        return self.finalize_predictions(predictions)
+    
+    def predict_matrix(self, raw: np.ndarray) -> tuple:
+        """
+        Score a raw feature matrix and return clipped predictions with confidence codes.
+        
+        Args:
+            raw: Unscaled features with shape (n_rows, n_features)
+            
+        Returns:
+            tuple: (predictions, confidence_codes) where codes index CONFIDENCE_LEVELS
+        """
+        state = self.active
+        if state is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Model is not loaded. Please check server logs."
+            )
+        
+        predictions = np.clip(state.score_matrix(raw), 0.0, 1.0)
+        METRICS.observe_batch(len(raw))
+        METRICS.count_rows(state.version, len(raw))
+        return predictions, confidence_codes(predictions)
+    
+    def finalize_predictions(self, predictions: np.ndarray) -> tuple:
+        """
+        Clip raw predictions and bucket them into confidence levels.
+        
+        Args:
+            predictions: Unclipped model outputs
+            
+        Returns:
+            tuple: (clipped_predictions, confidence_levels) as aligned np.ndarrays
+        """
+        # Clip predictions to valid range [0, 1]
+        predictions = np.clip(predictions, 0.0, 1.0)
+        
+        # Bucket all predictions into confidence levels
+        confidences = CONFIDENCE_LEVELS[confidence_codes(predictions)]
+        
+        return predictions, confidences
+    
+    def enable_micro_batching(self, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Route single predictions through an adaptive micro-batcher.
+        
+        Args:
+            max_batch_size: Maximum number of concurrent requests scored together
+            max_wait_ms: Maximum time a started batch waits for more requests
+        """
+        # Install the new batcher before closing the old one; requests still
+        # queued on the old batcher fall back to direct scoring
+        old_batcher, self.batcher = self.batcher, MicroBatcher(self._score_rows, max_batch_size, max_wait_ms)
+        if old_batcher is not None:
+            old_batcher.close()
+    
+    def _score_rows(self, raw: np.ndarray) -> list:
+        """Score a micro-batch and return one (prediction, confidence, version) per row."""
+        state = self._active
+        predictions, confidences = self.finalize_predictions(state.score_matrix(raw))
+        METRICS.count_rows(state.version, len(raw))
+        return [
+            (prediction, confidence, state.version)
+            for prediction, confidence in zip(predictions.tolist(), confidences.tolist())
+        ]
+
+
+def confidence_codes(predictions: np.ndarray) -> np.ndarray:
+    """
+    Bucket clipped predictions into confidence codes (indices into CONFIDENCE_LEVELS).
+    
+    Args:
+        predictions: Predictions in [0, 1]
+        
+    Returns:
+        np.ndarray: int8 codes, 0=Low, 1=Medium, 2=High
+    """
+    return np.searchsorted(CONFIDENCE_THRESHOLDS, predictions, side='right').astype(np.int8)
+
+
+# Column-wise validation rules derived from the PatientData Field constraints
+# (defined before the model manager: smoke_test needs them for startup loads)
+COLUMN_SPECS = column_specs(PatientData, FEATURE_FIELDS)
+
+
+def smoke_test(state: LoadedModel, tolerance: float = KERNEL_TOLERANCE):
+    """
+    Score a probe patient with a freshly loaded artifact set before serving it.
+    
+    Args:
+        state: Artifact set to check
+        tolerance: Largest allowed single-row vs matrix difference
+        
+    Raises:
+        ModelReloadError: If the features don't match the API inputs or the
+            single-row and matrix paths don't produce the same finite prediction
+    """
+    if sorted(state.features) != sorted(FEATURE_FIELDS):
+        raise ModelReloadError(f"Model features {list(state.features)} don't match the API inputs")
+    
+    # A patient in the middle of every valid range
+    by_feature = {spec.feature: spec for spec in COLUMN_SPECS}
+    probe = []
+    for feature in state.features:
+        spec = by_feature[feature]
+        middle = (spec.ge + spec.le) / 2
+        probe.append(float(round(middle)) if spec.is_int else middle)
+    
+    single = state.score_one(tuple(probe))
+    matrix = state.score_matrix(np.array([probe]))
+    if not (np.isfinite(single) and np.isfinite(matrix).all()):
+        raise ModelReloadError(f"Smoke prediction is not finite ({single})")
+    if abs(single - matrix[0]) > tolerance:
+        raise ModelReloadError(f"Single-row and batch predictions disagree ({single} vs {matrix[0]})")
 
 
 # Initialize model manager
 try:
-    model_manager = ModelManager(model_dir="models")
+    model_manager = ModelManager(
+        model_dir="models",
+        cache_size=int(os.getenv("PREDICTION_CACHE_SIZE", "1024")),
+        inference_dtype=os.getenv("INFERENCE_DTYPE", "float64"),
+        precision_tolerance=float(os.getenv("INFERENCE_PRECISION_TOLERANCE", str(PRECISION_TOLERANCE))),
+        dedup=os.getenv("BATCH_DEDUP", "auto")
+    )
+    
+    # Opt-in micro-batching of concurrent /predict requests
+    micro_batch_size = int(os.getenv("MICRO_BATCH_MAX_SIZE", "0"))
+    if micro_batch_size > 0:
+        model_manager.enable_micro_batching(
+            max_batch_size=micro_batch_size,
+            max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+        )
+    
+    # Opt-in online learning from confirmed outcomes posted to /feedback
+    if os.getenv("ONLINE_LEARNING", "0") == "1":
+        model_manager.enable_online_learning(
+            batch_size=int(os.getenv("ONLINE_BATCH_SIZE", "32")),
+            interval=float(os.getenv("ONLINE_UPDATE_INTERVAL", "5")),
+            max_mse_increase=float(os.getenv("ONLINE_MAX_MSE_INCREASE", "0")),
+            checkpoint_interval=float(os.getenv("ONLINE_CHECKPOINT_INTERVAL", "60"))
+        )
+    
+    # Opt-in reload when the files in the models directory change
+    model_watch_interval = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+    if model_watch_interval > 0:
+        model_manager.watch(model_watch_interval)
 except Exception as e:
     print(f"Error initializing model manager: {e}")
     model_manager = None
 
 
-# ==================== API Endpoints ====================
+# Number of NDJSON lines validated and scored together by /predict_stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
 
-@app.get("/", tags=["Health Check"])
-def read_root():
-    """Root endpoint - Health check."""
-    return {
-        "status": "online",
-        "message": "Endometriosis Prediction API is running",
-        "docs_url": "/docs",
-        "openapi_url": "/openapi.json"
-    }
+# Longest NDJSON line /predict_stream buffers; longer lines are reported as errors
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
 
 
-@app.get("/health", tags=["Health Check"])
-def health_check():
-    """Health check endpoint."""
+# Prediction work runs on its own bounded pool so /health and the metadata
+# endpoints stay responsive under overload. 0 means one thread per CPU, or one
+# per micro-batch slot so a full micro-batch can still form.
+INFERENCE = InferenceExecutor(
+    concurrency=int(os.getenv("INFERENCE_CONCURRENCY", "0"))
+    or max(os.cpu_count() or 1, int(os.getenv("MICRO_BATCH_MAX_SIZE", "0"))),
+    queue_depth=int(os.getenv("INFERENCE_QUEUE_DEPTH", "64")),
+    timeout_ms=float(os.getenv("INFERENCE_TIMEOUT_MS", "30000")),
+    retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+)
+
+# Request header carrying the client's own timeout in milliseconds
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+
+# Response header naming the model version that produced a prediction
+MODEL_VERSION_HEADER = "X-Model-Version"
+
+# Shared secret for POST /admin/reload; the endpoint is disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Opt-in: encode /predict and /predict_batch results straight to JSON bytes,
+# skipping the response_model validation pass (the OpenAPI schema is unchanged)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "0") == "1"
+
+
+# JSON schema of the /predict_batch JSON body, documented via openapi_extra
+BATCH_REQUEST_SCHEMA = BatchPredictionRequest.model_json_schema(
+    ref_template="#/components/schemas/{model}"
+)
+BATCH_REQUEST_SCHEMA.pop("$defs", None)
+
+
+# ==================== Helpers ====================
+
+def inference_precision() -> Optional[dict]:
+    """
+    Requested and active scoring precision of the served model.
+    
+    Returns:
+        dict: requested and active dtype, measured float32 drift and the
+        accepted tolerance, or None if no model is loaded
+    """
+    state = model_manager.active if model_manager else None
+    if state is None:
+        return None
     return {
-        "status": "healthy",
-        "model_loaded": model_manager.model is not None if model_manager else False,
-        "service": "Endometriosis Prediction API"
+        "requested": model_manager.inference_dtype.name,
+        "dtype": state.dtype.name,
+        "drift": state.precision_drift,
+        "tolerance": model_manager.precision_tolerance
     }
 
 
-@app.post("/predict", response_model=PredictionResponse, tags=["Predictions"])
-def predict_single(patient: PatientData):
+def request_deadline(request: Request) -> Optional[float]:
     """
-    Make a prediction for a single patient.
+    Deadline for a request's inference work (see InferenceExecutor.deadline).
+    
+    Args:
+        request: Incoming request, optionally carrying X-Request-Timeout-Ms
+        
+    Returns:
+        float: time.monotonic() deadline, or None if no timeout applies
+    """
+    try:
+        timeout_ms = float(request.headers.get(REQUEST_TIMEOUT_HEADER, 0))
+    except ValueError:
+        timeout_ms = 0
+    return INFERENCE.deadline(timeout_ms)
+
+
+def parse_batch_request(body: bytes) -> BatchPredictionRequest:
+    """
+    Parse and validate a JSON /predict_batch body.
+    
+    Errors are raised as RequestValidationError with the same shape FastAPI
+    produces for a typed body parameter, so clients see identical 422s.
+    
+    Args:
+        body: Raw request body
+        
+    Returns:
+        BatchPredictionRequest: The validated batch
+    """
+    if not body:
+        raise RequestValidationError([
+            {"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}
+        ])
+    
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([
+            {
+                "type": "json_invalid",
+                "loc": ("body", e.pos),
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": e.msg}
+            }
+        ])
+    
+    try:
+        return BatchPredictionRequest.model_validate(payload, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body",) + tuple(error["loc"])}
+            for error in e.errors(include_url=False)
+        ])
+
+
+def validate_batch_columns(body: bytes) -> tuple:
+    """
+    Parse a JSON /predict_batch body and validate it column by column.
+    
+    Bounds and integrality are checked on whole NumPy columns. Only rows
+    that fail those checks, or hold values that aren't plain numbers, are
+    validated again with PatientData, so their error messages are exactly
+    the ones the model would give (and rows it accepts are still scored).
+    
+    Args:
+        body: Raw request body
+        
+    Returns:
+        tuple: (raw, valid, errors) with the (n_rows, n_features) feature
+        matrix, a boolean mask of valid rows and a message per invalid row
+    """
+    try:
+        payload = fast_loads(body) if body else None
+    except json.JSONDecodeError:
+        payload = None
+    rows = payload.get("patients") if isinstance(payload, dict) else None
+    
+    state = model_manager.active
+    if not isinstance(rows, list):
+        # Malformed envelope: let the model path raise the usual 422
+        batch = parse_batch_request(body)
+        return state.feature_matrix(batch.patients), np.ones(len(batch.patients), dtype=bool), {}
+    
+    raw, irregular = json_rows_to_columns(rows, COLUMN_SPECS, state.features)
+    valid, _ = validate_columns(raw, COLUMN_SPECS, state.features)
+    valid &= ~irregular
+    
+    invalid = np.flatnonzero(~valid).tolist()
+    if invalid and encoder_name() == "orjson":
+        # orjson reads integers wider than 64 bits as floats; such values are
+        # out of bounds anyway, but re-read the rows so messages match exactly
+        rows = json.loads(body)["patients"]
+    
+    errors = {}
+    for row in invalid:
+        try:
+            patient = PatientData.model_validate(rows[row], from_attributes=True)
+        except ValidationError as e:
+            errors[row] = validation_error_message(e)
+        else:
+            raw[row] = state.feature_values(patient)
+            valid[row] = True
+    
+    return raw, valid, errors
+
+
+def run_column_batch(body: bytes):
+    """
+    Validate a JSON batch column-wise, score the valid rows and report the rest.
+    
+    Args:
+        body: Raw request body
+        
+    Returns:
+        BatchPredictionResponse, or bytes when FAST_JSON_RESPONSES is on
+    """
+    raw, valid, errors = validate_batch_columns(body)
+    mark_handler_start()
+    
+    try:
+        predictions, codes = model_manager.predict_matrix(raw[valid])
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error during batch prediction: {str(e)}"
+        )
+    
+    scored = zip(np.round(predictions, 4).tolist(), CONFIDENCE_LEVELS[codes].tolist())
+    entries = []
+    for row, is_valid in enumerate(valid.tolist()):
+        if is_valid:
+            prediction, confidence = next(scored)
+            entries.append({
+                "patient_id": row + 1,
+                "prediction": prediction,
+                "confidence": confidence,
+                "status": "success"
+            })
+        else:
+            entries.append(error_entry(row + 1, errors[row]))
+    
+    result = {
+        "predictions": entries,
+        "total_processed": len(entries),
+        "success": not errors
+    }
+    mark_handler_end()
+    if FAST_JSON_RESPONSES:
+        return fast_dumps(result)
+    return BatchPredictionResponse(**result)
+
+
+def score_patients(patients: list[PatientData], patient_ids) -> list[dict]:
+    """
+    Score validated patients and build one result dict per patient.
+    
+    The whole list is scored in one matrix call. If that fails, patients are
+    scored one at a time so each failing row gets its own error entry.
+    
+    Args:
+        patients: List of PatientData inputs
+        patient_ids: Identifier reported for each patient, aligned with `patients`
+        
+    Returns:
+        list[dict]: Per-patient prediction entries
+    """
+    predictions = []
+    
+    try:
+        # Score the whole batch in one matrix call
+        batch_predictions, batch_confidences = model_manager.predict_batch(patients)
+        rounded = np.round(batch_predictions, 4).tolist()
+        
+        for patient_id, prediction, confidence in zip(patient_ids, rounded, batch_confidences.tolist()):
+            predictions.append({
+                "patient_id": patient_id,
+                "prediction": prediction,
+                "confidence": confidence,
+                "status": "success"
+            })
+    except HTTPException:
+        raise
+    except Exception:
+        # Fall back to per-patient scoring so each failing row gets its own error
+        predictions = []
+        for patient_id, patient in zip(patient_ids, patients):
+            try:
+                prediction, confidence = model_manager.predict(patient)
+                predictions.append({
+                    "patient_id": patient_id,
+                    "prediction": round(prediction, 4),
+                    "confidence": confidence,
+                    "status": "success"
+                })
+            except Exception as e:
+                predictions.append(error_entry(patient_id, str(e)))
+    
+    return predictions
+
+
+def error_entry(patient_id, message: str) -> dict:
+    """Build the result entry reported for a patient that could not be scored."""
+    return {
+        "patient_id": patient_id,
+        "prediction": None,
+        "confidence": None,
+        "status": "error",
+        "error": message
+    }
+
+
+def validation_error_message(error: ValidationError) -> str:
+    """Flatten a Pydantic ValidationError into a single-line message."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item['loc'] else item['msg']
+        for item in error.errors()
+    )
+
+
+async def iter_lines(stream, max_line_bytes: int = None):
+    """
+    Split an async byte stream into lines without buffering the whole body.
+    
+    Args:
+        stream: Async iterator of byte chunks
+        max_line_bytes: Longest line kept in memory (defaults to STREAM_MAX_LINE_BYTES)
+        
+    Yields:
+        bytes or None: One line at a time without the trailing newline, or
+        None for a line longer than max_line_bytes (its bytes are discarded)
+    """
+    if max_line_bytes is None:
+        max_line_bytes = STREAM_MAX_LINE_BYTES
+    
+    pending = bytearray()
+    oversized = False
+    
+    async for chunk in stream:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+            
+            # Once a line is too long, drop the rest of it instead of buffering
+            if not oversized:
+                pending += piece
+                if len(pending) > max_line_bytes:
+                    oversized = True
+                    pending.clear()
+            
+            if end < 0:
+                break
+            
+            yield None if oversized else bytes(pending)
+            pending.clear()
+            oversized = False
+            start = end + 1
+    
+    if oversized:
+        yield None
+    elif pending:
+        yield bytes(pending)
+
+
+def score_stream_chunk(chunk: list, state: Optional[LoadedModel] = None) -> bytes:
+    """
+    Validate and score one chunk of raw NDJSON lines and encode the results as NDJSON.
+    
+    Runs in the threadpool so parsing and validation never block the event loop.
+    
+    Args:
+        chunk: List of (patient_id, raw line bytes, a decoded dict, or None for an over-long line)
+        state: Artifact set to score with (default: the active one)
+        
+    Returns:
+        bytes: One JSON result per input line, in input order
+    """
+    start = time.perf_counter()
+    parsed = []
+    for patient_id, line in chunk:
+        if line is None:
+            parsed.append((patient_id, None, f"Line exceeds maximum length of {STREAM_MAX_LINE_BYTES} bytes"))
+            continue
+        try:
+            if isinstance(line, bytes):
+                patient = PatientData.model_validate_json(line)
+            else:
+                patient = PatientData.model_validate(line)
+            parsed.append((patient_id, patient, None))
+        except ValidationError as e:
+            parsed.append((patient_id, None, validation_error_message(e)))
+    
+    validated = time.perf_counter()
+    METRICS.observe_stage("validate", validated - start)
+    
+    valid = [(patient_id, patient) for patient_id, patient, _ in parsed if patient is not None]
+    with model_manager.pinned(state):
+        scored = iter(score_patients([p for _, p in valid], [i for i, _ in valid])) if valid else iter(())
+    
+    start = time.perf_counter()
+    lines = []
+    for patient_id, patient, error in parsed:
+        entry = next(scored) if patient is not None else error_entry(patient_id, error)
+        lines.append(json.dumps(entry))
+    
+    encoded = ("\n".join(lines) + "\n").encode("utf-8")
+    METRICS.observe_stage("serialize", time.perf_counter() - start)
+    return encoded
+
+
+def score_job_chunk(chunk: list) -> tuple:
+    """
+    Score one chunk of a batch job with the model active now.
+    
+    Args:
+        chunk: List of (patient_id, NDJSON line bytes or decoded dict)
+        
+    Returns:
+        tuple: (NDJSON results, version of the model that scored them)
+    """
+    state = model_manager.active
+    if state is None:
+        raise RuntimeError("Model is not loaded")
+    return score_stream_chunk(chunk, state), state.version
+
+
+# Opt-in asynchronous batch jobs (POST /jobs), scored in the background by the
+# same ModelManager. Started here, once score_job_chunk exists.
+if model_manager is not None and os.getenv("BATCH_JOBS", "0") == "1":
+    try:
+        model_manager.enable_jobs(
+            score_job_chunk,
+            directory=os.getenv("JOBS_DIR", "jobs"),
+            workers=int(os.getenv("JOB_WORKERS", "1")),
+            chunk_size=int(os.getenv("JOB_CHUNK_SIZE", "10000")),
+            ttl=float(os.getenv("JOB_TTL_SECONDS", "86400")),
+            lease=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+            max_input_bytes=int(os.getenv("JOB_MAX_INPUT_BYTES", str(1 << 30))),
+            aliases=dict(FEATURE_FIELDS)
+        )
+    except Exception as e:
+        print(f"⚠ Warning: Could not start batch jobs: {e}")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that lets its body iterator keep reading the request.
+    
+    Starlette's StreamingResponse may listen for client disconnects by
+    consuming `receive`, which would steal request body messages from an
+    iterator that is still reading the upload. Here the body iterator is the
+    only consumer and sees disconnects itself through `request.stream()`.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        
+        if self.background is not None:
+            await self.background()
+
+
+async def stream_predictions(request: Request, state: Optional[LoadedModel] = None):
+    """
+    Validate and score an NDJSON request body chunk by chunk.
+    
+    Args:
+        request: Incoming request whose body is newline-delimited JSON patients
+        state: Artifact set to score every chunk with (default: the active one per chunk)
+        
+    Yields:
+        bytes: NDJSON results for each scored chunk
+    """
+    chunk = []
+    patient_id = 0
+    
+    async for line in iter_lines(request.stream()):
+        if line is not None and not line.strip():
+            continue
+        patient_id += 1
+        
+        # Only collect raw lines here; validation happens in the threadpool
+        chunk.append((patient_id, line))
+        
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield await INFERENCE.run(score_stream_chunk, chunk, state, admit=False)
+            chunk = []
+    
+    if chunk:
+        yield await INFERENCE.run(score_stream_chunk, chunk, state, admit=False)
+
+
+# ==================== API Endpoints ====================
+
+@app.get("/", tags=["Health Check"])
+def read_root():
+    """Root endpoint - Health check."""
+    return {
+        "status": "online",
+        "message": "Endometriosis Prediction API is running",
+        "docs_url": "/docs",
+        "openapi_url": "/openapi.json"
+    }
+
+
+@app.get("/health", tags=["Health Check"])
+def health_check():
+    """Health check endpoint."""
+    return {
+        "status": "healthy",
+        "model_loaded": model_manager.model is not None if model_manager else False,
+        "model_version": model_manager.model_version if model_manager else None,
+        "service": "Endometriosis Prediction API"
+    }
+
+
+@app.post("/predict", response_model=PredictionResponse, tags=["Predictions"])
+async def predict_single(patient: PatientData, request: Request, response: Response):
+    """
+    Make a prediction for a single patient.
     
     Args:
         patient: Patient data containing all required features
+        request: Incoming request, optionally carrying X-Request-Timeout-Ms
+        response: Response whose headers are merged into the result
         
     Returns:
         PredictionResponse: Prediction probability and confidence level
@@ -324,31 +1483,65 @@ def predict_single(patient: PatientData):
             "bmi": 23.5
         }
     """
-    try:
-        if model_manager is None or model_manager.model is None:
-            raise HTTPException(
-                status_code=503,
-                detail="Model is not available. Please contact administrator."
-            )
+    # Body parsing and PatientData validation are done by the time we get here
+    mark_handler_start()
+    
+    if model_manager is None or model_manager.model is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is not available. Please contact administrator."
+        )
+    
+    with model_manager.pinned() as state:
+        result = await INFERENCE.run(score_single, patient, deadline=request_deadline(request))
+    
+    if isinstance(result, bytes):
+        return FastJSONResponse(result, headers={MODEL_VERSION_HEADER: state.version})
+    response.headers[MODEL_VERSION_HEADER] = state.version
+    return result
+
+
+def score_single(patient: PatientData):
+    """
+    Score one validated patient on the inference pool.
+    
+    Args:
+        patient: Patient data containing all required features
         
+    Returns:
+        PredictionResponse, or bytes when FAST_JSON_RESPONSES is on
+    """
+    try:
         # Make prediction
         prediction, confidence = model_manager.predict(patient)
         
+        input_data = {
+            "age": patient.age,
+            "menstrual_irregularity": patient.menstrual_irregularity,
+            "chronic_pain_level": patient.chronic_pain_level,
+            "hormone_level_abnormality": patient.hormone_level_abnormality,
+            "infertility": patient.infertility,
+            "bmi": patient.bmi
+        }
+        
+        if FAST_JSON_RESPONSES:
+            # Already in PredictionResponse shape; encode it directly
+            mark_handler_end()
+            return fast_dumps({
+                "prediction": round(float(prediction), 4),
+                "confidence": confidence,
+                "input_data": input_data
+            })
+        
         # Create response
-        response = PredictionResponse(
+        result = PredictionResponse(
             prediction=round(prediction, 4),
             confidence=confidence,
-            input_data={
-                "age": patient.age,
-                "menstrual_irregularity": patient.menstrual_irregularity,
-                "chronic_pain_level": patient.chronic_pain_level,
-                "hormone_level_abnormality": patient.hormone_level_abnormality,
-                "infertility": patient.infertility,
-                "bmi": patient.bmi
-            }
+            input_data=input_data
         )
         
-        return response
+        mark_handler_end()
+        return result
     
     except HTTPException:
         raise
@@ -359,51 +1552,127 @@ def predict_single(patient: PatientData):
         )
 
 
-@app.post("/predict_batch", response_model=BatchPredictionResponse, tags=["Predictions"])
-def predict_batch(request: BatchPredictionRequest):
+@app.post(
+    "/predict_batch",
+    response_model=BatchPredictionResponse,
+    tags=["Predictions"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": BATCH_REQUEST_SCHEMA
+                },
+                NPZ_CONTENT_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                },
+                NPY_CONTENT_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                },
+                ARROW_STREAM_CONTENT_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                },
+                ARROW_FILE_CONTENT_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                }
+            }
+        }
+    }
+)
+async def predict_batch(
+    request: Request,
+    response: Response,
+    validation: Literal["model", "columns"] = Query(
+        "model",
+        description=(
+            "JSON bodies only. 'model' validates every patient with PatientData and rejects the "
+            "whole batch with 422 if any patient is invalid. 'columns' checks bounds on whole "
+            "columns at once, scores the valid patients and reports invalid ones with status 'error'."
+        )
+    )
+):
     """
     Make predictions for multiple patients.
     
+    The request format is chosen by Content-Type. JSON bodies use
+    BatchPredictionRequest and get a BatchPredictionResponse. NumPy
+    (application/x-npy, application/x-npz) and Arrow IPC
+    (application/vnd.apache.arrow.stream / .file) bodies carry one column per
+    feature and get columnar prediction and confidence-code arrays back in
+    the same family of formats.
+    
     Args:
-        request: BatchPredictionRequest containing list of patients
+        request: Incoming request with the batch in its body
+        response: Response whose headers are merged into a JSON result
+        validation: How a JSON body is validated ("model" or "columns")
         
     Returns:
-        BatchPredictionResponse: List of predictions for all patients
+        BatchPredictionResponse or Response: Predictions for all patients
     """
-    try:
-        if model_manager is None or model_manager.model is None:
-            raise HTTPException(
-                status_code=503,
-                detail="Model is not available. Please contact administrator."
-            )
+    if model_manager is None or model_manager.model is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is not available. Please contact administrator."
+        )
+    
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    deadline = request_deadline(request)
+    
+    # Decoding, validation and scoring all run on the inference pool, on the
+    # model version that was active when the request arrived
+    with model_manager.pinned() as state:
+        if is_columnar(content_type):
+            result = await INFERENCE.run(predict_batch_columnar, body, content_type, deadline=deadline)
+            result.headers[MODEL_VERSION_HEADER] = state.version
+            return result
         
-        predictions = []
+        if validation == "columns":
+            result = await INFERENCE.run(run_column_batch, body, deadline=deadline)
+        else:
+            result = await INFERENCE.run(run_model_batch, body, deadline=deadline)
+    
+    if isinstance(result, bytes):
+        return FastJSONResponse(result, headers={MODEL_VERSION_HEADER: state.version})
+    response.headers[MODEL_VERSION_HEADER] = state.version
+    return result
+
+
+def run_model_batch(body: bytes):
+    """
+    Validate a JSON batch with BatchPredictionRequest and score it.
+    
+    Args:
+        body: Raw request body
         
-        for idx, patient in enumerate(request.patients):
-            try:
-                prediction, confidence = model_manager.predict(patient)
-                predictions.append({
-                    "patient_id": idx + 1,
-                    "prediction": round(prediction, 4),
-                    "confidence": confidence,
-                    "status": "success"
-                })
-            except Exception as e:
-                predictions.append({
-                    "patient_id": idx + 1,
-                    "prediction": None,
-                    "confidence": None,
-                    "status": "error",
-                    "error": str(e)
-                })
+    Returns:
+        BatchPredictionResponse, or bytes when FAST_JSON_RESPONSES is on
+    """
+    batch = parse_batch_request(body)
+    mark_handler_start()
+    if FAST_JSON_RESPONSES:
+        return run_batch_prediction_fast(batch)
+    return run_batch_prediction(batch)
+
+
+def batch_result(request: BatchPredictionRequest) -> dict:
+    """
+    Score a validated JSON batch into a BatchPredictionResponse-shaped dict.
+    
+    Args:
+        request: BatchPredictionRequest containing list of patients
         
-        response = BatchPredictionResponse(
-            predictions=predictions,
-            total_processed=len(request.patients),
-            success=all(p["status"] == "success" for p in predictions)
-        )
+    Returns:
+        dict: predictions, total_processed and success
+    """
+    try:
+        predictions = score_patients(request.patients, range(1, len(request.patients) + 1))
         
-        return response
+        return {
+            "predictions": predictions,
+            "total_processed": len(request.patients),
+            "success": all(p["status"] == "success" for p in predictions)
+        }
     
     except HTTPException:
         raise
@@ -414,21 +1683,478 @@ def predict_batch(request: BatchPredictionRequest):
         )
 
 
+def run_batch_prediction(request: BatchPredictionRequest) -> BatchPredictionResponse:
+    """
+    Score a validated JSON batch.
+    
+    Args:
+        request: BatchPredictionRequest containing list of patients
+        
+    Returns:
+        BatchPredictionResponse: List of predictions for all patients
+    """
+    result = batch_result(request)
+    
+    # Building and re-validating the response model counts as serialization
+    mark_handler_end()
+    return BatchPredictionResponse(**result)
+
+
+def run_batch_prediction_fast(request: BatchPredictionRequest) -> bytes:
+    """
+    Score a validated JSON batch and encode the result as JSON bytes.
+    
+    The entries built by score_patients already have the documented shape,
+    so they are encoded directly instead of being validated again against
+    BatchPredictionResponse.
+    
+    Args:
+        request: BatchPredictionRequest containing list of patients
+        
+    Returns:
+        bytes: Encoded BatchPredictionResponse
+    """
+    result = batch_result(request)
+    mark_handler_end()
+    return fast_dumps(result)
+
+
+def predict_batch_columnar(body: bytes, content_type: str) -> Response:
+    """
+    Decode, validate and score a NumPy or Arrow batch.
+    
+    Args:
+        body: Request body
+        content_type: Request Content-Type
+        
+    Returns:
+        Response: Columnar results in the matching binary format
+    """
+    features = model_manager.features
+    try:
+        raw = decode_columns(body, content_type, COLUMN_SPECS, features)
+    except ColumnarDependencyError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ColumnarFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Check bounds and integrality on whole columns at once
+    valid, errors = validate_columns(raw, COLUMN_SPECS, features)
+    mark_handler_start()
+    
+    predictions = np.full(len(raw), np.nan)
+    codes = np.full(len(raw), INVALID_CODE, dtype=np.int8)
+    if valid.all():
+        predictions, codes = model_manager.predict_matrix(raw)
+    elif valid.any():
+        predictions[valid], codes[valid] = model_manager.predict_matrix(raw[valid])
+    
+    mark_handler_end()
+    content, response_type = encode_results(
+        predictions, codes, errors, content_type, CONFIDENCE_LEVELS.tolist()
+    )
+    return Response(content=content, media_type=response_type)
+
+
+@app.post(
+    "/predict_stream",
+    tags=["Predictions"],
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {
+                    "schema": {"$ref": "#/components/schemas/PatientData"}
+                }
+            },
+            "description": "One PatientData JSON object per line"
+        }
+    }
+)
+async def predict_stream(request: Request):
+    """
+    Stream predictions for a newline-delimited JSON file of patients.
+    
+    Lines are validated and scored in chunks of STREAM_CHUNK_SIZE, and the
+    results are streamed back as NDJSON in input order while the request is
+    still being read, so memory use does not depend on the input size.
+    Invalid lines are reported inline with status "error".
+    
+    Args:
+        request: Request whose body is one patient JSON object per line
+        
+    Returns:
+        StreamingResponse: One prediction JSON object per non-empty input line
+    """
+    if model_manager is None or model_manager.model is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is not available. Please contact administrator."
+        )
+    
+    # Streams are turned away before the response starts; once accepted, their
+    # chunks share the inference pool without counting against the queue limit
+    INFERENCE.check_capacity()
+    
+    # Every chunk of this stream is scored by the version active right now
+    state = model_manager.active
+    return DuplexStreamingResponse(
+        stream_predictions(request, state),
+        media_type="application/x-ndjson",
+        headers={MODEL_VERSION_HEADER: state.version}
+    )
+
+
+def require_admin_token(request: Request):
+    """
+    Check `Authorization: Bearer <ADMIN_TOKEN>` on an administrative request.
+    
+    Args:
+        request: Incoming request
+        
+    Raises:
+        HTTPException: 404 if ADMIN_TOKEN is not set, 401 if the token doesn't match
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post("/admin/reload", tags=["Administration"])
+async def reload_model(request: Request):
+    """
+    Reload the model artifacts from disk without a restart.
+    
+    The new artifact set is loaded in the threadpool while requests keep
+    being served, checked with a smoke prediction and swapped in with a
+    single assignment. Requests already running finish on the old version.
+    Requires `Authorization: Bearer <ADMIN_TOKEN>`; disabled if ADMIN_TOKEN
+    is not set.
+    
+    Args:
+        request: Incoming request carrying the admin token
+        
+    Returns:
+        dict: Reload status with the previous and active model versions
+    """
+    require_admin_token(request)
+    
+    if model_manager is None:
+        raise HTTPException(status_code=503, detail="Model manager is not initialized")
+    
+    try:
+        return await run_in_threadpool(model_manager.reload)
+    except ModelReloadError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"{e}; still serving version {model_manager.model_version}"
+        )
+
+
+@app.post("/feedback", status_code=202, tags=["Administration"])
+def submit_feedback(feedback: FeedbackRequest, request: Request):
+    """
+    Queue confirmed outcomes for online learning.
+    
+    Outcomes are buffered and applied in the background with partial_fit on
+    a copy of the model, which is published as a new model version only if
+    it doesn't worsen the MSE on held-out outcomes. Scoring is never blocked
+    by training. Requires `Authorization: Bearer <ADMIN_TOKEN>` and
+    ONLINE_LEARNING=1.
+    
+    Args:
+        feedback: Patients with their confirmed diagnosis
+        request: Incoming request carrying the admin token
+        
+    Returns:
+        dict: Outcomes accepted, held out and waiting, and the serving model version
+    """
+    require_admin_token(request)
+    
+    learner = model_manager.learner if model_manager is not None else None
+    if learner is None:
+        raise HTTPException(status_code=404, detail="Online learning is not enabled")
+    
+    state = model_manager.active
+    if not hasattr(state.model, "partial_fit"):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Online learning needs a model with partial_fit, not {type(state.model).__name__}"
+        )
+    
+    # Learn from the exact inputs, whatever precision requests are scored in
+    raw = state.feature_matrix(feedback.outcomes, dtype=np.float64)
+    targets = np.array([outcome.diagnosis for outcome in feedback.outcomes])
+    try:
+        result = learner.submit(raw, targets)
+    except FeedbackBufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(INFERENCE.retry_after)})
+    
+    return {**result, "model_version": state.version}
+
+
+def require_jobs() -> JobRunner:
+    """Return the job runner, or answer 404 when batch jobs are disabled."""
+    runner = model_manager.jobs if model_manager is not None else None
+    if runner is None:
+        raise HTTPException(status_code=404, detail="Batch jobs are not enabled")
+    return runner
+
+
+def job_status(runner: JobRunner, job_id: str) -> dict:
+    """Return a job's status, or answer 404 if it doesn't exist or has expired."""
+    status = runner.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return status
+
+
+def with_job_links(status: dict) -> dict:
+    """Add the status and results URLs to a job status."""
+    return {
+        **status,
+        "status_url": f"/jobs/{status['job_id']}",
+        "results_url": f"/jobs/{status['job_id']}/results"
+    }
+
+
+@app.post("/jobs", status_code=202, tags=["Batch Jobs"])
+async def submit_job(request: Request, response: Response):
+    """
+    Submit a batch for background scoring and get a job ID back immediately.
+    
+    The body is a /predict_batch JSON object (`application/json`), one
+    patient per line (`application/x-ndjson`), or a CSV file with a header
+    naming the fields or training columns (`text/csv`). It is written to
+    disk as it arrives and scored in chunks by the job workers. Poll
+    GET /jobs/{job_id} for progress and download GET /jobs/{job_id}/results
+    once the job has succeeded. Requires BATCH_JOBS=1.
+    
+    Args:
+        request: Incoming request with the batch as its body
+        response: Response whose Location header points at the job
+        
+    Returns:
+        dict: The queued job's status and URLs
+    """
+    runner = require_jobs()
+    fmt = job_input_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Job input must be application/json, application/x-ndjson or text/csv"
+        )
+    
+    try:
+        path = await runner.spool(request.stream())
+        status = await run_in_threadpool(runner.submit, path, fmt)
+    except JobInputTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except JobInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers["Location"] = f"/jobs/{status['job_id']}"
+    return with_job_links(status)
+
+
+@app.get("/jobs/{job_id}", tags=["Batch Jobs"])
+def get_job(job_id: str):
+    """
+    Report a batch job's state and progress.
+    
+    Args:
+        job_id: ID returned by POST /jobs
+        
+    Returns:
+        dict: State (queued, running, succeeded or failed), rows done out of
+        the total, model versions used, error and timestamps
+    """
+    return with_job_links(job_status(require_jobs(), job_id))
+
+
+@app.get("/jobs/{job_id}/results", tags=["Batch Jobs"], response_class=StreamingResponse)
+def get_job_results(job_id: str):
+    """
+    Download a finished job's results as NDJSON, one line per input patient.
+    
+    Lines have the same shape as /predict_stream results, in input order.
+    
+    Args:
+        job_id: ID returned by POST /jobs
+        
+    Returns:
+        StreamingResponse: The results, read from disk part by part
+    """
+    runner = require_jobs()
+    status = job_status(runner, job_id)
+    if status["status"] != "succeeded":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job {job_id} is {status['status']}; results are available once it has succeeded"
+        )
+    
+    return StreamingResponse(
+        runner.iter_results(job_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{job_id}.ndjson"'}
+    )
+
+
+@app.delete("/jobs/{job_id}", tags=["Batch Jobs"])
+def delete_job(job_id: str):
+    """
+    Cancel a batch job, or delete a finished one, along with its files.
+    
+    Args:
+        job_id: ID returned by POST /jobs
+        
+    Returns:
+        dict: The deleted job's ID
+    """
+    if not require_jobs().delete(job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"job_id": job_id, "status": "deleted"}
+
+
+@app.get("/metrics", tags=["Model Information"], response_class=Response)
+def get_metrics():
+    """
+    Export request, stage and batch metrics in the Prometheus text format.
+    
+    Latency histograms are per endpoint; stage histograms split each request
+    into validate, features, dedup, kernel (or dataframe/scale/predict on
+    the sklearn path), micro_batch and serialize. Work done by the micro-batcher
+    thread is reported under endpoint="background".
+    
+    Returns:
+        Response: Prometheus exposition text
+    """
+    extra_histograms = {}
+    extra_counters = {}
+    
+    if model_manager is not None and model_manager.batcher is not None:
+        batcher_stats = model_manager.batcher.stats()
+        extra_histograms["endometriosis_micro_batch_size"] = (
+            "Rows scored per micro-batch.", {"": batcher_stats["batch_size"]}
+        )
+        extra_histograms["endometriosis_micro_batch_queue_depth"] = (
+            "Requests queued when a micro-batch was collected.", {"": batcher_stats["queue_depth"]}
+        )
+    
+    inference_stats = INFERENCE.stats()
+    extra_histograms["endometriosis_inference_queue_wait_seconds"] = (
+        "Time inference work waited for a thread of the inference pool.", {"": inference_stats["queue_wait"]}
+    )
+    extra_counters["endometriosis_inference_running"] = (
+        "Inference jobs running.", "gauge", {"": inference_stats["running"]}
+    )
+    extra_counters["endometriosis_inference_queued"] = (
+        "Inference jobs waiting for a thread.", "gauge", {"": inference_stats["queued"]}
+    )
+    extra_counters["endometriosis_inference_rejected_total"] = (
+        "Requests rejected with 503, by reason.", "counter",
+        {f'reason="{reason}"': count for reason, count in inference_stats["rejected"].items()}
+    )
+    
+    if model_manager is not None and model_manager.learner is not None:
+        learner_stats = model_manager.learner.stats()
+        for name, help_text in (("received", "Confirmed outcomes received."),
+                                ("trained", "Outcomes folded into a published online update."),
+                                ("published", "Online updates published as a new model version."),
+                                ("rejected_updates", "Online updates rejected for worsening the held-out MSE.")):
+            extra_counters[f"endometriosis_online_{name}_total"] = (help_text, "counter", {"": learner_stats[name]})
+        extra_counters["endometriosis_online_pending"] = (
+            "Confirmed outcomes waiting for the next online update.", "gauge", {"": learner_stats["pending"]}
+        )
+    
+    if model_manager is not None and model_manager.jobs is not None:
+        extra_counters["endometriosis_batch_jobs"] = (
+            "Batch jobs in the job store, by state.", "gauge",
+            {f'status="{status}"': count for status, count in model_manager.jobs.store.counts().items()}
+        )
+    
+    precision = inference_precision()
+    if precision is not None:
+        extra_counters["endometriosis_inference_dtype_info"] = (
+            "Precision requests are scored in.", "gauge", {f'dtype="{precision["dtype"]}"': 1}
+        )
+        if precision["drift"] is not None:
+            extra_counters["endometriosis_inference_precision_drift"] = (
+                "Largest float32 vs float64 difference on the startup reference set.", "gauge",
+                {f'dtype="{precision["requested"]}"': precision["drift"]}
+            )
+    
+    if model_manager is not None and model_manager.cache is not None:
+        cache_stats = model_manager.cache.stats()
+        for name in ("hits", "misses", "evictions"):
+            extra_counters[f"endometriosis_prediction_cache_{name}_total"] = (
+                f"Prediction cache {name}.", "counter", {"": cache_stats[name]}
+            )
+        extra_counters["endometriosis_prediction_cache_size"] = (
+            "Entries in the prediction cache.", "gauge", {"": cache_stats["size"]}
+        )
+    
+    content = METRICS.render(
+        model_manager.model_version if model_manager else None,
+        extra_histograms,
+        extra_counters
+    )
+    return Response(content=content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Human-readable names for the model types the notebook can select
+MODEL_DESCRIPTIONS = {
+    "SGDRegressor": "Linear Regression with Gradient Descent",
+    "LinearRegression": "Linear Regression",
+    "DecisionTreeRegressor": "Decision Tree",
+    "RandomForestRegressor": "Random Forest",
+}
+
+
 @app.get("/model-info", tags=["Model Information"])
 def get_model_info():
     """Get information about the trained model."""
+    model = model_manager.model if model_manager else None
+    algorithm = getattr(model, 'model_type', type(model).__name__) if model is not None else None
     return {
-        "model_type": "Linear Regression with Gradient Descent",
-        "algorithm": "SGDRegressor",
+        "model_type": MODEL_DESCRIPTIONS.get(algorithm, algorithm),
+        "algorithm": algorithm,
+        "inference_kernel": type(model_manager.kernel).__name__ if model_manager and model_manager.kernel else None,
+        "inference_precision": inference_precision(),
+        "deduplication": {
+            "mode": model_manager.dedup,
+            "active": model_manager.active.dedup,
+            **METRICS.dedup_totals()
+        } if model_manager and model_manager.active else None,
         "dataset": "Endometriosis Dataset",
         "features": model_manager.features if model_manager else None,
         "model_loaded": model_manager.model is not None if model_manager else False,
-        "features_count": len(model_manager.features) if model_manager and model_manager.features else 0
+        "features_count": len(model_manager.features) if model_manager and model_manager.features else 0,
+        "model_version": model_manager.model_version if model_manager else None,
+        "prediction_cache": model_manager.cache.stats() if model_manager and model_manager.cache is not None else None,
+        "micro_batching": model_manager.batcher.stats() if model_manager and model_manager.batcher is not None else None,
+        "admission": {key: value for key, value in INFERENCE.stats().items() if key != "queue_wait"},
+        "online_learning": model_manager.learner.stats() if model_manager and model_manager.learner is not None else None,
+        "batch_jobs": model_manager.jobs.stats() if model_manager and model_manager.jobs is not None else None
     }
 
 
 # ==================== Error Handlers ====================
 
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request, exc):
+    """Answer overload and expired deadlines with 503 and a Retry-After hint."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.exception_handler(ValueError)
 async def value_error_handler(request, exc):
     """Handle validation errors."""
@@ -440,7 +2166,7 @@ async def value_error_handler(request, exc):
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from serve import serve
     print("\n" + "="*60)
     print(" Starting Endometriosis Prediction API Server")
     print("="*60)
@@ -449,9 +2175,9 @@ if __name__ == "__main__":
     print(" Network access: http://0.0.0.0:8000")
     print(" Swagger UI: http://localhost:8000/docs")
     print("="*60 + "\n")
-    uvicorn.run(
-        "main:app",
+    # WEB_CONCURRENCY > 1 pre-forks workers that share the loaded model (see serve.py)
+    serve(
         host="0.0.0.0",
         port=8000,
-        reload=False
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
     )
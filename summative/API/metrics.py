@@ -0,0 +1,400 @@
+"""
+Lightweight metrics primitives for the Endometriosis Prediction API.
+
+Every metric keeps one shard per thread. A thread only ever writes its own
+shard, so recording an observation takes no lock and allocates nothing
+beyond the float being added; readers sum the shards when /metrics is
+scraped. Values are exposed in the Prometheus text format.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+# Per-request timing marks: [endpoint, request_start, handler_start, handler_end]
+REQUEST_MARKS = contextvars.ContextVar("request_marks", default=None)
+
+# Endpoint label used for work done outside a request (e.g. the micro-batcher thread)
+BACKGROUND_ENDPOINT = "background"
+
+
+class _Sharded:
+    """Base for metrics that keep one list of slots per writing thread."""
+
+    def __init__(self, slots: int):
+        self._slots = slots
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> list:
+        """Return this thread's shard, creating it on the thread's first write."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self._slots
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _totals(self) -> list:
+        """Sum every shard slot by slot."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = [0] * self._slots
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+    def reset(self):
+        """Zero every shard in place; writes racing with the reset may be lost."""
+        with self._shards_lock:
+            for shard in self._shards:
+                shard[:] = [0] * self._slots
+
+
+class Histogram(_Sharded):
+    """Fixed-bucket histogram with cumulative (Prometheus-style) snapshots."""
+
+    def __init__(self, buckets):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets: Upper bounds of the buckets; an implicit +Inf bucket is added
+        """
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket, one for +Inf and one for the running sum
+        super().__init__(len(self.buckets) + 2)
+
+    def observe(self, value: float):
+        """Record one observation."""
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> dict:
+        """
+        Return cumulative bucket counts, total count and sum.
+
+        Returns:
+            dict: {"buckets": {upper_bound: cumulative_count}, "count": int, "sum": float}
+        """
+        totals = self._totals()
+        counts, total = totals[:-1], totals[-1]
+
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            running += count
+            cumulative["+Inf" if bound == float('inf') else bound] = running
+
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+
+class Counter(_Sharded):
+    """Monotonic counter."""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        """Add to the counter."""
+        self._shard()[0] += amount
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+
+class Gauge(_Sharded):
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        """Raise the gauge."""
+        self._shard()[0] += amount
+
+    def dec(self, amount: float = 1):
+        """Lower the gauge."""
+        self._shard()[0] -= amount
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+
+def exponential_buckets(start: float, factor: float, count: int) -> list:
+    """
+    Build `count` bucket bounds starting at `start`, each `factor` times the previous.
+
+    Args:
+        start: First upper bound
+        factor: Growth factor between bounds
+        count: Number of bounds
+
+    Returns:
+        list: Bucket upper bounds
+    """
+    return [start * factor ** i for i in range(count)]
+
+
+# 1us .. ~8s, doubling
+LATENCY_BUCKETS = exponential_buckets(1e-6, 2, 24)
+
+# 1 .. 65536 rows, doubling
+BATCH_SIZE_BUCKETS = exponential_buckets(1, 2, 17)
+
+
+class ApiMetrics:
+    """
+    All request, stage and batch metrics of the API, pre-created per endpoint.
+
+    Metrics for every (endpoint, stage) pair are built up front so recording
+    one is two dict lookups and a shard write.
+    """
+
+    def __init__(self, endpoints: tuple, stages: tuple):
+        """
+        Args:
+            endpoints: Request paths that are measured
+            stages: Stage names timed inside a request
+        """
+        self.endpoints = tuple(endpoints)
+        self.stages = tuple(stages)
+        labels = self.endpoints + (BACKGROUND_ENDPOINT,)
+
+        self.request_seconds = {endpoint: Histogram(LATENCY_BUCKETS) for endpoint in self.endpoints}
+        self.in_flight = {endpoint: Gauge() for endpoint in self.endpoints}
+        self.responses = {endpoint: {} for endpoint in self.endpoints}
+        self.stage_seconds = {
+            endpoint: {stage: Histogram(LATENCY_BUCKETS) for stage in self.stages}
+            for endpoint in labels
+        }
+        self.batch_rows = {endpoint: Histogram(BATCH_SIZE_BUCKETS) for endpoint in labels}
+        self.rows_scored = {}
+        self.dedup_rows = {endpoint: Counter() for endpoint in labels}
+        self.dedup_unique_rows = {endpoint: Counter() for endpoint in labels}
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float):
+        """Record a stage duration for the endpoint serving the current request."""
+        marks = REQUEST_MARKS.get()
+        endpoint = marks[0] if marks is not None else BACKGROUND_ENDPOINT
+        self.stage_seconds[endpoint][stage].observe(seconds)
+
+    def observe_batch(self, rows: int):
+        """Record the number of rows scored together by the current request."""
+        marks = REQUEST_MARKS.get()
+        endpoint = marks[0] if marks is not None else BACKGROUND_ENDPOINT
+        self.batch_rows[endpoint].observe(rows)
+
+    def count_dedup(self, rows: int, unique_rows: int):
+        """Count the rows of a deduplicated batch and how many of them were distinct."""
+        marks = REQUEST_MARKS.get()
+        endpoint = marks[0] if marks is not None else BACKGROUND_ENDPOINT
+        self.dedup_rows[endpoint].inc(rows)
+        self.dedup_unique_rows[endpoint].inc(unique_rows)
+
+    def dedup_totals(self) -> dict:
+        """Rows checked for duplicates, distinct rows scored and their ratio, over all endpoints."""
+        rows = sum(counter.value for counter in self.dedup_rows.values())
+        unique_rows = sum(counter.value for counter in self.dedup_unique_rows.values())
+        return {
+            "rows": int(rows),
+            "unique_rows": int(unique_rows),
+            "ratio": round(rows / unique_rows, 3) if unique_rows else None
+        }
+
+    def reset(self):
+        """
+        Forget everything recorded so far (e.g. warm-up traffic).
+
+        In-flight gauges are kept, since requests may still be running.
+        """
+        for endpoint in self.endpoints:
+            self.request_seconds[endpoint].reset()
+        for stages in self.stage_seconds.values():
+            for histogram in stages.values():
+                histogram.reset()
+        for metric in (*self.batch_rows.values(), *self.dedup_rows.values(), *self.dedup_unique_rows.values()):
+            metric.reset()
+        with self._lock:
+            self.rows_scored = {}
+            self.responses = {endpoint: {} for endpoint in self.endpoints}
+
+    def count_rows(self, version: str, rows: int):
+        """Count rows scored by a model version."""
+        counter = self.rows_scored.get(version)
+        if counter is None:
+            with self._lock:
+                counter = self.rows_scored.setdefault(version, Counter())
+        counter.inc(rows)
+
+    def count_response(self, endpoint: str, status: int):
+        """Count a finished response by status code."""
+        counter = self.responses[endpoint].get(status)
+        if counter is None:
+            with self._lock:
+                counter = self.responses[endpoint].setdefault(status, Counter())
+        counter.inc()
+
+    def render(self, model_version: str = None, extra_histograms: dict = None,
+               extra_counters: dict = None) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Args:
+            model_version: Active model version, exported as model_info{version=...}
+            extra_histograms: {name: (help, {label_string: Histogram snapshot})}
+            extra_counters: {name: (help, type, {label_string: value})}
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+
+        if model_version is not None:
+            lines += [
+                "# HELP endometriosis_model_info Active model version.",
+                "# TYPE endometriosis_model_info gauge",
+                f'endometriosis_model_info{{version="{model_version}"}} 1',
+            ]
+
+        _render_histogram(
+            lines, "endometriosis_request_duration_seconds",
+            "Time from request start to the end of the response, per endpoint.",
+            {f'endpoint="{e}"': h.snapshot() for e, h in self.request_seconds.items()}
+        )
+        _render_histogram(
+            lines, "endometriosis_stage_duration_seconds",
+            "Time spent in each request stage, per endpoint.",
+            {
+                f'endpoint="{e}",stage="{s}"': h.snapshot()
+                for e, stages in self.stage_seconds.items()
+                for s, h in stages.items()
+                if h.snapshot()["count"]
+            }
+        )
+        _render_histogram(
+            lines, "endometriosis_batch_rows",
+            "Rows scored together per request or stream chunk.",
+            {f'endpoint="{e}"': h.snapshot() for e, h in self.batch_rows.items() if h.snapshot()["count"]}
+        )
+
+        _render_values(lines, "endometriosis_requests_in_flight", "Requests being handled.", "gauge",
+                       {f'endpoint="{e}"': g.value for e, g in self.in_flight.items()})
+        _render_values(lines, "endometriosis_responses_total", "Finished responses by status code.", "counter",
+                       {
+                           f'endpoint="{e}",status="{status}"': c.value
+                           for e, statuses in self.responses.items()
+                           for status, c in sorted(statuses.items())
+                       })
+        _render_values(lines, "endometriosis_rows_scored_total", "Rows scored per model version.", "counter",
+                       {f'version="{v}"': c.value for v, c in sorted(self.rows_scored.items())})
+        _render_values(lines, "endometriosis_dedup_rows_total", "Rows checked for in-batch duplicates.", "counter",
+                       {f'endpoint="{e}"': c.value for e, c in self.dedup_rows.items() if c.value})
+        _render_values(lines, "endometriosis_dedup_unique_rows_total",
+                       "Distinct rows actually scored after deduplication.", "counter",
+                       {f'endpoint="{e}"': c.value for e, c in self.dedup_unique_rows.items() if c.value})
+
+        for name, (help_text, snapshots) in (extra_histograms or {}).items():
+            _render_histogram(lines, name, help_text, snapshots)
+        for name, (help_text, metric_type, values) in (extra_counters or {}).items():
+            _render_values(lines, name, help_text, metric_type, values)
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines: list, name: str, help_text: str, snapshots: dict):
+    """Append one histogram family (one series per label string)."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, snapshot in snapshots.items():
+        prefix = f"{labels}," if labels else ""
+        for bound, count in snapshot["buckets"].items():
+            le = bound if bound == "+Inf" else repr(float(bound))
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {float(snapshot['sum'])!r}")
+        lines.append(f"{name}_count{suffix} {snapshot['count']}")
+
+
+def _render_values(lines: list, name: str, help_text: str, metric_type: str, values: dict):
+    """Append one counter or gauge family (one series per label string)."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in values.items():
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}{suffix} {value}")
+
+
+def mark_handler_start():
+    """Record that the endpoint function started (validation and body parsing are done)."""
+    marks = REQUEST_MARKS.get()
+    if marks is not None:
+        marks[2] = time.perf_counter()
+
+
+def mark_handler_end():
+    """Record that the endpoint function returned (serialization starts)."""
+    marks = REQUEST_MARKS.get()
+    if marks is not None:
+        marks[3] = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing whole requests for the measured endpoints.
+
+    It records the request duration, in-flight count and response status,
+    and derives two stages from the marks set by the endpoint: "validate"
+    (request start to handler start: body read, JSON parsing and Pydantic
+    validation) and "serialize" (handler return to response start).
+    """
+
+    def __init__(self, app, metrics: ApiMetrics):
+        """
+        Args:
+            app: Wrapped ASGI app
+            metrics: Metrics to record into
+        """
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path") if scope["type"] == "http" else None
+        if path not in self.metrics.request_seconds:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        marks = [path, time.perf_counter(), 0.0, 0.0]
+        token = REQUEST_MARKS.set(marks)
+        in_flight = metrics.in_flight[path]
+        in_flight.inc()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if marks[3]:
+                    metrics.stage_seconds[path]["serialize"].observe(time.perf_counter() - marks[3])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end = time.perf_counter()
+            in_flight.dec()
+            metrics.request_seconds[path].observe(end - marks[1])
+            if marks[2]:
+                metrics.stage_seconds[path]["validate"].observe(marks[2] - marks[1])
+            metrics.count_response(path, status)
+            REQUEST_MARKS.reset(token)
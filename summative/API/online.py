@@ -0,0 +1,304 @@
+"""
+Online learning from confirmed outcomes for the Endometriosis Prediction API.
+
+Labelled patients posted to /feedback are buffered. A background thread
+periodically copies the served model, applies mini-batch partial_fit
+updates to the copy and hands it back to be published as a new model
+version; requests keep scoring with the current model the whole time and
+only ever see a complete swap. Every fifth outcome is kept back as a
+rolling held-out set, and an update that makes the held-out MSE worse is
+thrown away. The latest published model is checkpointed to disk so a
+restart can pick up where training left off.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+
+# File names of the checkpoint written next to the model artifacts
+CHECKPOINT_FILE = "online_model.pkl"
+CHECKPOINT_META_FILE = "online_model.json"
+
+
+class FeedbackBufferFull(RuntimeError):
+    """Raised when outcomes arrive faster than the learner can apply them."""
+
+
+def online_version(base_version: str, model) -> str:
+    """
+    Version a model updated online by its parent version and its weights.
+
+    Args:
+        base_version: Version of the model the update started from
+        model: Updated linear model (coef_ and intercept_)
+
+    Returns:
+        str: 12 hex characters, like artifact versions
+    """
+    digest = hashlib.sha256(base_version.encode())
+    digest.update(np.ascontiguousarray(model.coef_, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(model.intercept_, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:12]
+
+
+class OnlineLearner:
+    """Buffers labelled outcomes and folds them into the served model in the background."""
+
+    def __init__(self, state_fn, publish_fn, checkpoint_dir_fn, batch_size: int = 32,
+                 interval: float = 5.0, holdout_every: int = 5, holdout_size: int = 500,
+                 min_holdout: int = 20, max_mse_increase: float = 0.0,
+                 checkpoint_interval: float = 60.0, max_pending: int = 10000):
+        """
+        Args:
+            state_fn: Callable returning the served LoadedModel
+            publish_fn: Callable (base_state, model, version) publishing the update;
+                returns None if base_state is no longer the served model
+            checkpoint_dir_fn: Callable returning the directory for checkpoints
+            batch_size: Rows per partial_fit call; a full batch wakes the learner early
+            interval: Seconds between update rounds when fewer rows are waiting
+            holdout_every: Every n-th outcome goes to the held-out set instead of training
+            holdout_size: Most recent held-out outcomes kept
+            min_holdout: Held-out outcomes needed before any update is applied
+            max_mse_increase: Relative held-out MSE increase still accepted (0 = must not worsen)
+            checkpoint_interval: Minimum seconds between checkpoints (0 disables them)
+            max_pending: Outcomes that may wait for training before feedback is refused
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if holdout_every < 2:
+            raise ValueError("holdout_every must be at least 2")
+
+        self.state_fn = state_fn
+        self.publish_fn = publish_fn
+        self.checkpoint_dir_fn = checkpoint_dir_fn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.holdout_every = holdout_every
+        self.min_holdout = min_holdout
+        self.max_mse_increase = max_mse_increase
+        self.checkpoint_interval = checkpoint_interval
+        self.max_pending = max_pending
+
+        self.counts = {"received": 0, "trained": 0, "rejected_rows": 0, "published": 0,
+                       "rejected_updates": 0, "checkpoints": 0}
+        self.last_update = None
+
+        self._pending = []
+        self._holdout = deque(maxlen=holdout_size)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._checkpointed_version = None
+        self._last_checkpoint = time.monotonic()
+
+    def submit(self, raw: np.ndarray, targets: np.ndarray) -> dict:
+        """
+        Buffer labelled outcomes for the next update round.
+
+        Args:
+            raw: Unscaled features, shape (n_rows, n_features) in training order
+            targets: Confirmed diagnosis for each row
+
+        Returns:
+            dict: Rows accepted, rows kept for the held-out set and rows now waiting
+
+        Raises:
+            FeedbackBufferFull: If accepting the rows would exceed max_pending
+        """
+        rows = list(zip(map(tuple, np.asarray(raw, dtype=np.float64).tolist()),
+                        np.asarray(targets, dtype=np.float64).tolist()))
+        with self._lock:
+            received = self.counts["received"]
+            held_out = [row for i, row in enumerate(rows, received + 1) if i % self.holdout_every == 0]
+            training = [row for i, row in enumerate(rows, received + 1) if i % self.holdout_every != 0]
+            if len(self._pending) + len(training) > self.max_pending:
+                raise FeedbackBufferFull(f"{len(self._pending)} outcomes are already waiting for training")
+            self._holdout.extend(held_out)
+            self._pending.extend(training)
+            self.counts["received"] += len(rows)
+            pending = len(self._pending)
+
+        if pending >= self.batch_size:
+            self._wake.set()
+        return {"accepted": len(rows), "held_out": len(held_out), "pending": pending}
+
+    def update(self) -> dict:
+        """
+        Run one update round on the buffered outcomes.
+
+        Returns:
+            dict: "status" is one of waiting, unsupported, rejected, superseded or
+            published, with the held-out MSE before and after where computed
+        """
+        state = self.state_fn()
+        if state is None or not hasattr(state.model, "partial_fit"):
+            return {"status": "unsupported"}
+
+        with self._lock:
+            if not self._pending or len(self._holdout) < self.min_holdout:
+                return {"status": "waiting", "pending": len(self._pending), "held_out": len(self._holdout)}
+            rows, self._pending = self._pending, []
+            holdout = list(self._holdout)
+
+        X = self._scale(state, [values for values, _ in rows])
+        y = np.array([target for _, target in rows])
+        X_holdout = self._scale(state, [values for values, _ in holdout])
+        y_holdout = np.array([target for _, target in holdout])
+
+        # Train a copy; the served model is never touched. Yield the GIL after
+        # every mini-batch so request threads aren't held up by a long round.
+        model = copy.deepcopy(state.model)
+        for start in range(0, len(y), self.batch_size):
+            model.partial_fit(X[start:start + self.batch_size], y[start:start + self.batch_size])
+            time.sleep(0)
+
+        before = self._mse(state.model, X_holdout, y_holdout)
+        after = self._mse(model, X_holdout, y_holdout)
+        result = {"rows": len(rows), "holdout_rows": len(holdout),
+                  "holdout_mse_before": before, "holdout_mse_after": after}
+
+        if not np.isfinite(after) or after > before * (1.0 + self.max_mse_increase):
+            with self._lock:
+                self.counts["rejected_updates"] += 1
+                self.counts["rejected_rows"] += len(rows)
+            result["status"] = "rejected"
+        else:
+            version = online_version(state.version, model)
+            if self.publish_fn(state, model, version) is None:
+                # A reload swapped the model meanwhile; retrain these rows on the new one
+                with self._lock:
+                    self._pending[:0] = rows
+                result["status"] = "superseded"
+            else:
+                with self._lock:
+                    self.counts["published"] += 1
+                    self.counts["trained"] += len(rows)
+                result.update(status="published", previous_version=state.version, model_version=version)
+
+        self.last_update = result
+        return result
+
+    def checkpoint(self) -> bool:
+        """
+        Write the served model to disk if it was produced by online learning.
+
+        The model and a small JSON manifest are written to temporary files and
+        renamed into place, so a crash never leaves a half-written checkpoint.
+
+        Returns:
+            bool: True if a checkpoint was written
+        """
+        state = self.state_fn()
+        origin = self._origin(state)
+        if origin is None or state.version == self._checkpointed_version:
+            return False
+
+        directory = self.checkpoint_dir_fn()
+        model_path = os.path.join(directory, CHECKPOINT_FILE)
+        meta_path = os.path.join(directory, CHECKPOINT_META_FILE)
+        meta = {"model_version": state.version, "origin_version": origin,
+                "trained_rows": self.counts["trained"], "updates": self.counts["published"],
+                "written_at": time.time()}
+
+        joblib.dump(state.model, model_path + ".tmp")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(model_path + ".tmp", model_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        self._checkpointed_version = state.version
+        self._last_checkpoint = time.monotonic()
+        self.counts["checkpoints"] += 1
+        return True
+
+    def restore(self) -> bool:
+        """
+        Publish the checkpointed model if it was trained from the served artifacts.
+
+        Returns:
+            bool: True if the checkpoint was restored
+        """
+        state = self.state_fn()
+        directory = self.checkpoint_dir_fn()
+        try:
+            with open(os.path.join(directory, CHECKPOINT_META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        # A checkpoint from older artifacts would undo the newer training run
+        if state is None or meta.get("origin_version") != state.version:
+            return False
+
+        model = joblib.load(os.path.join(directory, CHECKPOINT_FILE))
+        if self.publish_fn(state, model, meta["model_version"]) is None:
+            return False
+        self._checkpointed_version = meta["model_version"]
+        print(f"✓ Restored online-learning checkpoint {meta['model_version']} "
+              f"({meta.get('trained_rows', 0)} rows on top of {state.version})")
+        return True
+
+    def stats(self) -> dict:
+        """Return outcome and update counters, buffer sizes and the last update round."""
+        with self._lock:
+            return {
+                **self.counts,
+                "pending": len(self._pending),
+                "held_out": len(self._holdout),
+                "batch_size": self.batch_size,
+                "last_update": self.last_update,
+            }
+
+    def start(self):
+        """Start applying updates in the background."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and wait for the round in progress to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """Update whenever a batch is full or the interval passes; checkpoint periodically."""
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.update()
+                if self.checkpoint_interval > 0 and \
+                        time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint()
+            except Exception as e:
+                print(f"⚠ Warning: Online learning update failed: {e}")
+
+    def _origin(self, state):
+        """Artifact version the served model was trained from online, or None if it is not an online model."""
+        return getattr(state, "origin_version", None) if state is not None else None
+
+    @staticmethod
+    def _scale(state, rows: list) -> np.ndarray:
+        """Scale raw rows with the served scaler, keeping the training column names."""
+        import pandas as pd
+
+        return state.scaler.transform(pd.DataFrame(rows, columns=state.features))
+
+    @staticmethod
+    def _mse(model, X: np.ndarray, y: np.ndarray) -> float:
+        """Mean squared error of the served (clipped) predictions."""
+        predictions = np.clip(model.predict(X), 0.0, 1.0)
+        return float(np.mean((predictions - y) ** 2))
@@ -7,51 +7,116 @@ on new data for the endometriosis dataset.
 import pandas as pd
 import numpy as np
 import joblib
+import argparse
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from bundle import open_bundle
+from dedup import DEDUP_MIN_ROWS, unique_rows, worth_deduplicating
+from kernels import PRECISION_TOLERANCE, compile_kernel, reduced_precision
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
 class PredictionEngine:
     """
     A class to handle model predictions using the best-trained regression model.
     """
     
-    def __init__(self, model_dir='models'):
+    def __init__(self, model_dir='models', verbose=True, dtype='float64',
+                 precision_tolerance=PRECISION_TOLERANCE, dedup='auto'):
         """
         Initialize the prediction engine by loading the model and preprocessing objects.
         
         Args:
             model_dir (str): Directory containing the saved model files
+            verbose (bool): Print a line for each loaded artifact
+            dtype (str): 'float64', or 'float32' to score with a reduced-precision kernel
+            precision_tolerance (float): Largest float32-vs-float64 drift accepted
+                before falling back to float64
+            dedup (str): Score repeated rows once: 'on', 'off', or 'auto' (for all but linear models)
         """
         self.model_dir = model_dir
+        self.verbose = verbose
         self.model = None
         self.scaler = None
         self.features = None
         self.label_encoders = None
+        self.kernel = None
+        self.bundle_kernel = None
+        self.precision_drift = None
+        # Distinct rows in the last predict() call (None if it wasn't deduplicated)
+        self.last_unique_rows = None
         
         self._load_model_artifacts()
+        if dtype == 'float32':
+            self._load_reduced_precision(precision_tolerance)
+        elif dtype != 'float64':
+            raise ValueError(f"dtype must be 'float32' or 'float64', got {dtype!r}")
+        
+        if dedup not in ('auto', 'on', 'off'):
+            raise ValueError(f"dedup must be 'auto', 'on' or 'off', got {dedup!r}")
+        self.dedup = worth_deduplicating(self.model, self.kernel) if dedup == 'auto' else dedup == 'on'
+    
+    def _load_reduced_precision(self, tolerance):
+        """Convert the fused kernel to float32 once, unless its drift exceeds the tolerance."""
+        kernel = self.bundle_kernel or compile_kernel(self.model, self.scaler)
+        if kernel is None:
+            print(f"Note: No fused kernel for {type(self.model).__name__}, scoring in float64")
+            return
+        
+        reduced, self.precision_drift = reduced_precision(kernel, self.scaler, np.float32, tolerance)
+        if reduced is None:
+            print(f"Warning: float32 drift {self.precision_drift:.3g} exceeds {tolerance:g}, scoring in float64")
+            return
+        self.kernel = reduced
+        if self.verbose:
+            print(f"✓ float32 inference kernel (drift {self.precision_drift:.3g} vs float64)")
     
     def _load_model_artifacts(self):
         """Load the saved model, scaler, and preprocessing objects."""
+        # Prefer the memory-mapped bundle when it matches the pickles
+        bundle = open_bundle(self.model_dir)
+        if bundle is not None:
+            self.model = bundle.model
+            self.scaler = bundle.scaler
+            self.features = bundle.features
+            self.label_encoders = bundle.label_encoders
+            self.bundle_kernel = bundle.kernel
+            if self.verbose:
+                print(f"✓ Model bundle loaded from: {bundle.path}")
+            return
+        
         try:
             # Load model
             model_path = os.path.join(self.model_dir, 'best_model.pkl')
             self.model = joblib.load(model_path)
-            print(f"✓ Model loaded from: {model_path}")
+            if self.verbose:
+                print(f"✓ Model loaded from: {model_path}")
             
             # Load scaler
             scaler_path = os.path.join(self.model_dir, 'scaler.pkl')
             self.scaler = joblib.load(scaler_path)
-            print(f"✓ Scaler loaded from: {scaler_path}")
+            if self.verbose:
+                print(f"✓ Scaler loaded from: {scaler_path}")
             
             # Load features
             features_path = os.path.join(self.model_dir, 'features.pkl')
             self.features = joblib.load(features_path)
-            print(f"✓ Features loaded from: {features_path}")
+            if self.verbose:
+                print(f"✓ Features loaded from: {features_path}")
             
             # Load label encoders
             encoders_path = os.path.join(self.model_dir, 'label_encoders.pkl')
             self.label_encoders = joblib.load(encoders_path)
-            print(f"✓ Label encoders loaded from: {encoders_path}")
+            if self.verbose:
+                print(f"✓ Label encoders loaded from: {encoders_path}")
             
         except FileNotFoundError as e:
             print(f"Error: Could not find model files. {e}")
@@ -67,12 +132,23 @@ class PredictionEngine:
         Returns:
             np.ndarray: Preprocessed and scaled features
         """
+        # Scale the features
+        return self.scaler.transform(self._encode(data))
+    
+    def _encode(self, data):
+        """
+        Select the model features in training order and encode categorical columns.
+        
+        Args:
+            data (pd.DataFrame or dict): Input data for prediction
+            
+        Returns:
+            pd.DataFrame: Unscaled features
+        """
         # Convert dict to DataFrame if necessary
         if isinstance(data, dict):
             data = pd.DataFrame([data])
-        elif isinstance(data, pd.DataFrame):
-            data = data.copy()
-        else:
+        elif not isinstance(data, pd.DataFrame):
             raise ValueError("Input must be a dictionary or pandas DataFrame")
         
         # Ensure all required features are present
@@ -80,8 +156,12 @@ class PredictionEngine:
             if feature not in data.columns:
                 raise ValueError(f"Missing required feature: {feature}")
         
-        # Select only the required features in the correct order
+        # Select only the required features in the correct order. Only this
+        # projection is copied (and only if encoding will modify it), never
+        # the caller's whole frame.
         data = data[self.features]
+        if self.label_encoders:
+            data = data.copy()
         
         # Encode categorical variables
         for col, encoder in self.label_encoders.items():
@@ -92,10 +172,7 @@ class PredictionEngine:
                     print(f"Warning: Unknown category in {col}. Using first category as default.")
                     data[col] = encoder.transform(np.full(len(data), encoder.classes_[0]))
         
-        # Scale the features
-        data_scaled = self.scaler.transform(data)
-        
-        return data_scaled
+        return data
     
     def predict(self, data):
         """
@@ -107,13 +184,28 @@ class PredictionEngine:
         Returns:
             np.ndarray: Predicted values
         """
-        # Preprocess the input
-        data_scaled = self.preprocess_input(data)
+        features = self._encode(data)
+        # Reduced precision: raw features go straight into a float32 buffer
+        X = features.to_numpy(dtype=self.kernel.dtype) if self.kernel is not None else features
+        
+        # Score each distinct row once and copy the results back to the duplicates
+        self.last_unique_rows = None
+        if self.dedup and len(features) >= DEDUP_MIN_ROWS:
+            first, inverse = unique_rows(X if self.kernel is not None else features.to_numpy(dtype=np.float64))
+            self.last_unique_rows = len(first)
+            if len(first) < len(features):
+                unique = X[first] if self.kernel is not None else features.iloc[first]
+                return self._predict_encoded(unique)[inverse]
         
-        # Make predictions
-        predictions = self.model.predict(data_scaled)
+        return self._predict_encoded(X)
+    
+    def _predict_encoded(self, features):
+        """Score encoded, unscaled features (an array for the kernel, a DataFrame for sklearn)."""
+        if self.kernel is not None:
+            return self.kernel.predict(features)
         
-        return predictions
+        # Scale the features and make predictions
+        return self.model.predict(self.scaler.transform(features))
     
     def predict_with_confidence(self, data):
         """
@@ -130,13 +222,194 @@ class PredictionEngine:
         result = {
             'predictions': predictions,
             'num_samples': len(predictions) if isinstance(predictions, np.ndarray) else 1,
-            'model_type': type(self.model).__name__
+            'model_type': getattr(self.model, 'model_type', type(self.model).__name__)
         }
         
         return result
 
 
-def main():
+# ==================== Chunked file scoring ====================
+
+# Prediction engine of the current process (see _init_worker)
+_worker_engine = None
+
+
+def _init_worker(model_dir, dtype='float64', dedup='auto'):
+    """Load the model artifacts once per worker process."""
+    global _worker_engine
+    _worker_engine = PredictionEngine(model_dir=model_dir, verbose=False, dtype=dtype, dedup=dedup)
+
+
+def _score_chunk(chunk, output_format, header):
+    """
+    Score one chunk and encode it for the output file.
+    
+    CSV chunks are rendered to text here so formatting, usually the most
+    expensive step, also runs in the workers.
+    
+    Args:
+        chunk (pd.DataFrame): Input rows
+        output_format (str): 'csv' or 'parquet'
+        header (bool): Whether a CSV chunk starts with the header line
+        
+    Returns:
+        tuple: (rows scored, distinct rows scored, CSV text or scored DataFrame)
+    """
+    chunk['predictions'] = _worker_engine.predict(chunk)
+    unique = _worker_engine.last_unique_rows
+    if unique is None:
+        unique = len(chunk)
+    if output_format == 'csv':
+        return len(chunk), unique, chunk.to_csv(index=False, header=header)
+    return len(chunk), unique, chunk
+
+
+class ChunkWriter:
+    """
+    Append scored chunks to a CSV or Parquet file as they arrive.
+    """
+    
+    def __init__(self, output_path, output_format):
+        """
+        Args:
+            output_path (str): File to write
+            output_format (str): 'csv' or 'parquet'
+        """
+        self.output_path = output_path
+        self.output_format = output_format
+        self._handle = None
+        self._writer = None
+        self._schema = None
+    
+    def write(self, encoded):
+        """Append one encoded chunk (CSV text or DataFrame) to the output file."""
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            table = pa.Table.from_pandas(encoded, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.output_path, self._schema)
+            elif table.schema != self._schema:
+                # e.g. an int column that picked up a NaN in this chunk
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+        else:
+            if self._handle is None:
+                self._handle = open(self.output_path, 'w', newline='')
+            self._handle.write(encoded)
+    
+    def close(self):
+        """Flush and close the output file."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._handle is not None:
+            self._handle.close()
+
+
+def peak_rss_mb(workers):
+    """
+    Report the peak resident set size of this process and of its largest finished worker.
+    
+    Args:
+        workers (int): Number of worker processes that were used
+        
+    Returns:
+        dict: {'main': MB, 'worker': MB}, None where it can't be measured
+    """
+    if resource is None:
+        return {'main': None, 'worker': None}
+    
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    main_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return {
+        'main': round(main_rss, 1),
+        'worker': round(worker_rss, 1) if workers > 1 else None
+    }
+
+
+def score_file(input_path, output_path, model_dir='models', chunk_size=100_000,
+               workers=None, output_format=None, dtype='float64', dedup='auto'):
+    """
+    Score a CSV file chunk by chunk and write the results in input order.
+    
+    Chunks are read lazily and scored in a process pool whose workers each
+    load the model artifacts once. At most two chunks per worker are in
+    flight, so memory use depends on the chunk size, not the file size.
+    
+    Args:
+        input_path (str): CSV file to score
+        output_path (str): File to write (input columns plus 'predictions')
+        model_dir (str): Directory containing the saved model files
+        chunk_size (int): Rows per chunk
+        workers (int): Worker processes (default: CPU count; 1 scores in-process)
+        output_format (str): 'csv' or 'parquet' (default: from the output extension)
+        dtype (str): 'float64', or 'float32' to score with a reduced-precision kernel
+        dedup (str): Score repeated rows in a chunk once: 'on', 'off' or 'auto'
+        
+    Returns:
+        dict: Rows scored, distinct rows scored (and rows per distinct row), elapsed
+        seconds, rows/sec and peak RSS in MB
+    """
+    global _worker_engine
+    
+    workers = workers or os.cpu_count() or 1
+    if output_format is None:
+        output_format = 'parquet' if Path(output_path).suffix.lower() in ('.parquet', '.pq') else 'csv'
+    
+    start = time.perf_counter()
+    rows = 0
+    unique_rows_scored = 0
+    writer = ChunkWriter(output_path, output_format)
+    
+    try:
+        with pd.read_csv(input_path, chunksize=chunk_size) as reader:
+            if workers == 1:
+                _init_worker(model_dir, dtype, dedup)
+                for index, chunk in enumerate(reader):
+                    count, unique, encoded = _score_chunk(chunk, output_format, index == 0)
+                    writer.write(encoded)
+                    rows += count
+                    unique_rows_scored += unique
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(model_dir, dtype, dedup)
+                ) as pool:
+                    # Results are written oldest-first, which keeps input order
+                    in_flight = deque()
+                    for index, chunk in enumerate(reader):
+                        in_flight.append(pool.submit(_score_chunk, chunk, output_format, index == 0))
+                        if len(in_flight) >= 2 * workers:
+                            count, unique, encoded = in_flight.popleft().result()
+                            writer.write(encoded)
+                            rows += count
+                            unique_rows_scored += unique
+                    while in_flight:
+                        count, unique, encoded = in_flight.popleft().result()
+                        writer.write(encoded)
+                        rows += count
+                        unique_rows_scored += unique
+    finally:
+        writer.close()
+        _worker_engine = None
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'unique_rows': unique_rows_scored,
+        'dedup_ratio': round(rows / unique_rows_scored, 3) if unique_rows_scored else None,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': peak_rss_mb(workers)
+    }
+
+
+def run_examples():
     """
     Example usage of the PredictionEngine.
     """
@@ -204,5 +477,53 @@ def main():
     print("="*60)
 
 
+def main(argv=None):
+    """
+    Score a CSV file from the command line, or run the examples without arguments.
+    
+    Usage:
+        python prediction.py INPUT.csv OUTPUT.(csv|parquet) [--chunk-size N] [--workers N]
+    """
+    parser = argparse.ArgumentParser(description="Score a CSV file with the trained model")
+    parser.add_argument('input', nargs='?', help="CSV file to score")
+    parser.add_argument('output', nargs='?', help="Output file (.csv or .parquet)")
+    parser.add_argument('--model-dir', default='models', help="Directory containing the model files")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help="Scoring precision; float32 is checked against float64 at load (default: float64)")
+    parser.add_argument('--dedup', choices=['auto', 'on', 'off'], default='auto',
+                        help="Score repeated rows once per chunk (default: auto, all but linear models)")
+    args = parser.parse_args(argv)
+    
+    if args.input is None:
+        run_examples()
+        return
+    if args.output is None:
+        parser.error("an output file is required when scoring a file")
+    
+    stats = score_file(
+        args.input,
+        args.output,
+        model_dir=args.model_dir,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        output_format=args.format,
+        dtype=args.dtype,
+        dedup=args.dedup
+    )
+    
+    rss = stats['peak_rss_mb']
+    print(f"✓ Scored {stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    print(f"  - Output file: {args.output}")
+    if stats['unique_rows'] < stats['rows']:
+        print(f"  - Distinct rows scored: {stats['unique_rows']} ({stats['dedup_ratio']}x deduplication)")
+    if rss['main'] is not None:
+        workers = f", largest worker {rss['worker']} MB" if rss['worker'] is not None else ""
+        print(f"  - Peak RSS: main {rss['main']} MB{workers}")
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,403 @@
+"""
+Pre-fork multi-worker server for the Endometriosis Prediction API.
+
+The parent process imports the app (loading the model artifacts) once,
+binds the listening socket and forks the workers. Workers inherit the
+loaded model, scaler and kernel pages copy-on-write, so each extra worker
+only adds its own private memory. Every worker warms up before it starts
+accepting connections from the shared socket.
+
+Usage:
+    python serve.py --workers 4 --port 8000 [--cpu-affinity] [--warmup 50]
+
+Where fork() is not available (e.g. Windows) or --workers is 1, the app is
+served by a single uvicorn process as before.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+# One BLAS thread per worker; must be set before numpy is imported
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+
+def asgi_request(app, method: str, path: str, body: bytes = b"") -> int:
+    """
+    Send one in-process HTTP request through the ASGI app.
+
+    Args:
+        app: ASGI application
+        method: HTTP method
+        path: Request path
+        body: JSON request body
+
+    Returns:
+        int: Response status code
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"warmup"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 0),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = {}
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    asyncio.run(app(scope, receive, send))
+    return status.get("code")
+
+
+def warm_up(app, manager, rounds: int = 50):
+    """
+    Exercise the prediction endpoints before a worker takes traffic.
+
+    Runs validation, scoring and response serialization once per code path
+    so the first real requests don't pay for lazy imports and first-call
+    setup. The prediction cache is detached meanwhile, and the request,
+    admission and micro-batch metrics are reset afterwards, so /metrics
+    only reflects real traffic.
+
+    Args:
+        app: ASGI application
+        manager: The app's ModelManager
+        rounds: Number of /predict requests (plus one /predict_batch per 10)
+    """
+    import numpy as np
+
+    import main
+
+    rng = np.random.default_rng(os.getpid())
+    cache, manager.cache = manager.cache, None
+    try:
+        for i in range(rounds):
+            patient = {
+                "age": int(rng.integers(18, 101)),
+                "menstrual_irregularity": int(rng.integers(0, 2)),
+                "chronic_pain_level": round(float(rng.uniform(0, 10)), 1),
+                "hormone_level_abnormality": int(rng.integers(0, 2)),
+                "infertility": int(rng.integers(0, 2)),
+                "bmi": round(float(rng.uniform(10, 60)), 1),
+            }
+            status = asgi_request(app, "POST", "/predict", json.dumps(patient).encode())
+            if status != 200:
+                raise RuntimeError(f"Warmup /predict returned {status}")
+            if i % 10 == 0:
+                body = json.dumps({"patients": [patient] * 32}).encode()
+                status = asgi_request(app, "POST", "/predict_batch", body)
+                if status != 200:
+                    raise RuntimeError(f"Warmup /predict_batch returned {status}")
+    finally:
+        manager.cache = cache
+        main.METRICS.reset()
+        main.INFERENCE.reset_stats()
+        if manager.batcher is not None:
+            manager.batcher.reset_stats()
+
+
+def worker_memory(pid: int):
+    """
+    Read a process's memory breakdown from /proc/<pid>/smaps_rollup (Linux).
+
+    Pss splits shared pages evenly between the processes mapping them, so
+    the sum of Pss over all workers is the real memory used; Private is what
+    one worker adds on top of the pages it shares.
+
+    Args:
+        pid: Process id
+
+    Returns:
+        dict or None: Rss, Pss, Shared and Private in MB, or None if unavailable
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    kb = {}
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+            kb[parts[0][:-1]] = int(parts[1])
+
+    def mb(*keys):
+        return round(sum(kb.get(key, 0) for key in keys) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+    }
+
+
+def suspend_background_threads(manager) -> dict:
+    """
+    Stop the manager's background threads before forking.
+
+    Threads don't survive fork(), so the micro-batcher, the model watcher,
+    the online learner and the batch job workers are stopped in the parent and restarted in each
+    worker.
+
+    Returns:
+        dict: Settings needed to restart them
+    """
+    settings = {}
+    if manager.batcher is not None:
+        settings["micro_batching"] = (manager.batcher.max_batch_size, manager.batcher.max_wait * 1000.0)
+        manager.batcher.close()
+        manager.batcher = None
+    if manager.watcher is not None:
+        settings["watch_interval"] = manager.watcher.interval
+        manager.watcher.stop()
+        manager.watcher = None
+    if manager.learner is not None:
+        # Keep the learner (and its checkpoint state); only its thread stops
+        settings["online_learning"] = True
+        manager.learner.stop()
+    if manager.jobs is not None:
+        # Jobs in progress go back to the queue and are resumed by the workers
+        settings["batch_jobs"] = True
+        manager.jobs.stop()
+    return settings
+
+
+def resume_background_threads(manager, settings: dict):
+    """Restart the threads stopped by suspend_background_threads in this process."""
+    if "micro_batching" in settings:
+        max_batch_size, max_wait_ms = settings["micro_batching"]
+        manager.enable_micro_batching(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    if "watch_interval" in settings:
+        manager.watch(settings["watch_interval"])
+    if "online_learning" in settings:
+        manager.learner.start()
+    if "batch_jobs" in settings:
+        manager.jobs.start()
+
+
+class PreforkServer:
+    """Parent process that forks, supervises and stops the API workers."""
+
+    def __init__(self, host: str, port: int, workers: int, cpu_affinity: bool = False,
+                 warmup_rounds: int = 50, log_level: str = "info"):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind
+            workers: Number of worker processes
+            cpu_affinity: Pin worker i to the i-th CPU this process may run on
+            warmup_rounds: Warmup requests per worker before it accepts traffic
+            log_level: uvicorn log level
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.cpu_affinity = cpu_affinity
+        self.warmup_rounds = warmup_rounds
+        self.log_level = log_level
+        self.children = {}
+        self.stopping = False
+
+    def run(self):
+        """Load the app, fork the workers and supervise them until stopped."""
+        import main
+
+        if main.model_manager is None or main.model_manager.model is None:
+            print("⚠ Warning: Model is not loaded; workers will answer 503")
+        self.app = main.app
+        self.manager = main.model_manager
+        self.thread_settings = suspend_background_threads(self.manager) if self.manager else {}
+        if "online_learning" in self.thread_settings and self.workers > 1:
+            print("⚠ Warning: each worker learns only from the outcomes it receives; "
+                  "run online learning with a single worker")
+
+        # asyncio only sets TCP_NODELAY on accepted sockets whose proto is
+        # IPPROTO_TCP; without it small responses wait ~40ms on delayed ACKs
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+        # Move everything loaded so far out of the GC's reach so collections in
+        # the workers don't write to (and un-share) the inherited pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        ready_pipes = {}
+        for slot in range(self.workers):
+            pid, ready = self._spawn(slot)
+            ready_pipes[ready] = pid
+        self._report(ready_pipes)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is not None and not self.stopping:
+                print(f"⚠ Worker {pid} exited (status {status}); starting a replacement")
+                time.sleep(0.5)
+                _, ready = self._spawn(slot)
+                os.close(ready)
+
+        self.sock.close()
+
+    def _spawn(self, slot: int) -> tuple:
+        """Fork one worker; return (pid, read end of its readiness pipe)."""
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            code = 0
+            try:
+                self._worker(slot, ready_write)
+            except Exception as e:
+                print(f"⚠ Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+
+        os.close(ready_write)
+        self.children[pid] = slot
+        return pid, ready_read
+
+    def _worker(self, slot: int, ready_write: int):
+        """Body of a worker process: pin, warm up, signal readiness and serve."""
+        import uvicorn
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        if self.cpu_affinity and hasattr(os, "sched_setaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, {cpus[slot % len(cpus)]})
+
+        if self.manager is not None:
+            resume_background_threads(self.manager, self.thread_settings)
+            if self.manager.model is not None and self.warmup_rounds > 0:
+                warm_up(self.app, self.manager, self.warmup_rounds)
+
+        os.write(ready_write, b"1")
+        os.close(ready_write)
+
+        config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="off")
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _report(self, ready_pipes: dict, timeout: float = 120.0):
+        """Wait for the first workers to warm up, then log their memory use."""
+        deadline = time.monotonic() + timeout
+        pending = dict(ready_pipes)
+        while pending and time.monotonic() < deadline:
+            readable, _, _ = select.select(list(pending), [], [], max(0.0, deadline - time.monotonic()))
+            for fd in readable:
+                os.read(fd, 1)
+                os.close(fd)
+                pending.pop(fd)
+        for fd in pending:
+            os.close(fd)
+
+        print(f"✓ {len(ready_pipes) - len(pending)}/{len(ready_pipes)} workers warmed up "
+              f"and serving on http://{self.host}:{self.port}")
+        parent = worker_memory(os.getpid())
+        if parent is not None:
+            print(f"  parent {os.getpid()}: rss {parent['rss_mb']} MB")
+        total_pss = 0.0
+        for pid in ready_pipes.values():
+            memory = worker_memory(pid)
+            if memory is None:
+                continue
+            total_pss += memory["pss_mb"]
+            print(f"  worker {pid}: rss {memory['rss_mb']} MB, pss {memory['pss_mb']} MB, "
+                  f"shared {memory['shared_mb']} MB, private {memory['private_mb']} MB")
+        if total_pss:
+            print(f"  total worker pss: {round(total_pss, 1)} MB")
+
+    def _handle_stop(self, signum, frame):
+        """Forward a stop signal to every worker; they finish in-flight requests first."""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 1, cpu_affinity: bool = False,
+          warmup_rounds: int = 50, log_level: str = "info"):
+    """
+    Serve the API with one process, or with pre-forked workers where fork() exists.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes
+        cpu_affinity: Pin each worker to its own CPU
+        warmup_rounds: Warmup requests per worker before it accepts traffic
+        log_level: uvicorn log level
+    """
+    if workers <= 1 or not hasattr(os, "fork"):
+        if workers > 1:
+            print("ℹ fork() is not available on this platform; serving with a single process")
+        import uvicorn
+        uvicorn.run("main:app", host=host, port=port, log_level=log_level)
+        return
+
+    PreforkServer(host, port, workers, cpu_affinity, warmup_rounds, log_level).run()
+
+
+def main(argv=None):
+    """Parse command-line options and start the server."""
+    parser = argparse.ArgumentParser(description="Serve the Endometriosis Prediction API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Worker processes (default: $WEB_CONCURRENCY or 1)")
+    parser.add_argument("--cpu-affinity", action="store_true",
+                        default=os.getenv("WORKER_CPU_AFFINITY", "") == "1",
+                        help="Pin each worker to its own CPU (Linux)")
+    parser.add_argument("--warmup", type=int, default=int(os.getenv("WORKER_WARMUP_ROUNDS", "50")),
+                        help="Warmup requests per worker before it accepts traffic")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    serve(args.host, args.port, args.workers, args.cpu_affinity, args.warmup, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Tests for admission control on the inference pool
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import REJECT_DEADLINE, REJECT_QUEUE_FULL, AdmissionError, InferenceExecutor
+from test_batch_predictions import make_patients
+
+
+def occupy(executor, count=1):
+    """Block `count` admitted jobs on the executor until the returned event is set"""
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def hold():
+        started.release()
+        release.wait(10)
+
+    threads = [threading.Thread(target=asyncio.run, args=(executor.run(hold),)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for _ in range(min(count, executor.concurrency)):
+        assert started.acquire(timeout=5)
+    deadline = time.monotonic() + 5
+    while executor.stats()["running"] + executor.stats()["queued"] < count:
+        assert time.monotonic() < deadline, "jobs were not admitted"
+        time.sleep(0.001)
+    return release, threads
+
+
+def test_full_queue_is_rejected_immediately():
+    """Beyond concurrency + queue_depth jobs, run() fails fast without queueing"""
+    executor = InferenceExecutor(concurrency=1, queue_depth=1, retry_after=3)
+    release, threads = occupy(executor, count=2)
+    try:
+        start = time.perf_counter()
+        with pytest.raises(AdmissionError) as error:
+            asyncio.run(executor.run(lambda: None))
+        assert time.perf_counter() - start < 0.5
+        assert error.value.reason == REJECT_QUEUE_FULL
+        assert error.value.retry_after == 3
+
+        stats = executor.stats()
+        assert (stats["running"], stats["queued"]) == (1, 1)
+        assert stats["rejected"] == {REJECT_QUEUE_FULL: 1, REJECT_DEADLINE: 0}
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+        executor.shutdown()
+
+    assert asyncio.run(executor.run(lambda x: x * 2, 21)) == 42
+    assert executor.stats()["queued"] == 0
+
+
+def test_queued_job_past_its_deadline_is_dropped():
+    """A job whose deadline passes while it waits is never run"""
+    executor = InferenceExecutor(concurrency=1, queue_depth=4)
+    release, threads = occupy(executor)
+    calls = []
+    try:
+        with pytest.raises(AdmissionError) as error:
+            asyncio.run(executor.run(calls.append, 1, deadline=executor.deadline(50)))
+        assert error.value.reason == REJECT_DEADLINE
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+        executor.shutdown()
+
+    assert calls == []
+    assert executor.stats()["rejected"][REJECT_DEADLINE] == 1
+
+
+def test_deadline_takes_the_shorter_timeout():
+    """A client timeout only ever shortens the default deadline"""
+    executor = InferenceExecutor(concurrency=1, queue_depth=0, timeout_ms=1000)
+    now = time.monotonic()
+    assert executor.deadline() - now == pytest.approx(1.0, abs=0.1)
+    assert executor.deadline(200) - now == pytest.approx(0.2, abs=0.1)
+    assert executor.deadline(5000) - now == pytest.approx(1.0, abs=0.1)
+    assert InferenceExecutor(concurrency=1, queue_depth=0).deadline() is None
+
+
+def test_jobs_run_in_the_callers_context():
+    """Context variables set by the caller are visible on the worker thread"""
+    variable = contextvars.ContextVar("variable", default=None)
+    executor = InferenceExecutor(concurrency=2, queue_depth=0)
+
+    async def call():
+        variable.set("request")
+        return await executor.run(variable.get)
+
+    try:
+        assert asyncio.run(call()) == "request"
+    finally:
+        executor.shutdown()
+
+
+def test_overload_returns_503_while_health_stays_up(monkeypatch):
+    """A saturated inference pool rejects predictions but not health probes"""
+    executor = InferenceExecutor(concurrency=1, queue_depth=0, retry_after=2)
+    monkeypatch.setattr(main, "INFERENCE", executor)
+    client = TestClient(main.app)
+    patient = make_patients(1, seed=41)[0].model_dump()
+
+    release, threads = occupy(executor)
+    try:
+        response = client.post("/predict", json=patient)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "2"
+        assert response.json()["reason"] == REJECT_QUEUE_FULL
+
+        response = client.post("/predict_batch", json={"patients": [patient]})
+        assert response.status_code == 503
+
+        assert client.get("/health").status_code == 200
+        assert client.get("/model-info").json()["admission"]["running"] == 1
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert client.post("/predict", json=patient).status_code == 200
+    text = client.get("/metrics").text
+    assert f'endometriosis_inference_rejected_total{{reason="{REJECT_QUEUE_FULL}"}} 2' in text
+    executor.shutdown()
+
+
+def test_client_timeout_header_drops_queued_requests(monkeypatch):
+    """X-Request-Timeout-Ms bounds how long a request may wait for the pool"""
+    executor = InferenceExecutor(concurrency=1, queue_depth=4)
+    monkeypatch.setattr(main, "INFERENCE", executor)
+    client = TestClient(main.app)
+    patient = make_patients(1, seed=42)[0].model_dump()
+
+    release, threads = occupy(executor)
+    try:
+        start = time.perf_counter()
+        response = client.post("/predict", json=patient, headers={main.REQUEST_TIMEOUT_HEADER: "100"})
+        assert response.status_code == 503
+        assert response.json()["reason"] == REJECT_DEADLINE
+        assert time.perf_counter() - start < 2
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+        executor.shutdown()
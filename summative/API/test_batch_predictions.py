@@ -0,0 +1,76 @@
+"""
+Tests for vectorized batch scoring in ModelManager
+"""
+
+import os
+
+import numpy as np
+
+from main import ModelManager, PatientData, run_batch_prediction, BatchPredictionRequest
+import main
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def make_patients(n, seed=0):
+    """Build n random but valid patients"""
+    rng = np.random.default_rng(seed)
+    return [
+        PatientData(
+            age=int(rng.integers(18, 101)),
+            menstrual_irregularity=int(rng.integers(0, 2)),
+            chronic_pain_level=float(np.round(rng.uniform(0, 10), 1)),
+            hormone_level_abnormality=int(rng.integers(0, 2)),
+            infertility=int(rng.integers(0, 2)),
+            bmi=float(np.round(rng.uniform(10, 60), 1)),
+        )
+        for _ in range(n)
+    ]
+
+
+def test_predict_batch_matches_single_predictions():
+    """Batch predictions should equal the per-patient path"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    patients = make_patients(200)
+
+    predictions, confidences = manager.predict_batch(patients)
+
+    for patient, prediction, confidence in zip(patients, predictions, confidences):
+        expected_prediction, expected_confidence = manager.predict(patient)
+        assert abs(prediction - expected_prediction) < 1e-12
+        assert confidence == expected_confidence
+
+
+def test_predict_batch_empty():
+    """An empty batch returns empty arrays"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    predictions, confidences = manager.predict_batch([])
+    assert len(predictions) == 0
+    assert len(confidences) == 0
+
+
+def test_predict_batch_endpoint_reports_per_row_errors(monkeypatch):
+    """If vectorized scoring fails, each row is reported on its own"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    patients = make_patients(3)
+
+    def broken_batch(batch):
+        raise RuntimeError("batch scoring failed")
+
+    original_predict = manager.predict
+
+    def flaky_predict(patient):
+        if patient is patients[1]:
+            raise ValueError("bad row")
+        return original_predict(patient)
+
+    monkeypatch.setattr(manager, 'predict_batch', broken_batch)
+    monkeypatch.setattr(manager, 'predict', flaky_predict)
+    monkeypatch.setattr(main, 'model_manager', manager)
+
+    response = run_batch_prediction(BatchPredictionRequest(patients=patients))
+
+    assert response.total_processed == 3
+    assert not response.success
+    assert [p["status"] for p in response.predictions] == ["success", "error", "success"]
+    assert response.predictions[1]["error"] == "bad row"
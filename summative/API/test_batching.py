@@ -0,0 +1,170 @@
+"""
+Tests for the adaptive micro-batcher
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from batching import BatcherClosedError, MicroBatcher
+from main import ModelManager
+from test_batch_predictions import make_patients
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def test_lone_request_is_not_delayed():
+    """At low load a single request is scored without waiting for a batch"""
+    batcher = MicroBatcher(lambda X: X.sum(axis=1).tolist(), max_batch_size=32, max_wait_ms=500)
+    try:
+        start = time.perf_counter()
+        assert batcher.submit((1.0, 2.0)) == 3.0
+        assert time.perf_counter() - start < 0.25
+    finally:
+        batcher.close()
+
+
+def test_concurrent_requests_are_batched():
+    """Concurrent submissions share batches and each gets its own result"""
+    calls = []
+
+    def score(X):
+        calls.append(len(X))
+        time.sleep(0.005)
+        return X[:, 0].tolist()
+
+    batcher = MicroBatcher(score, max_batch_size=16, max_wait_ms=5)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.submit((float(i), 0.0))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(64)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {i: float(i) for i in range(64)}
+    assert sum(calls) == 64
+    assert max(calls) > 1
+    assert max(calls) <= 16
+    assert batcher.stats()["batch_size"]["count"] == len(calls)
+
+
+def test_errors_propagate_to_callers():
+    """A failing batch raises in every waiting caller"""
+    def score(X):
+        raise ValueError("scoring failed")
+
+    batcher = MicroBatcher(score)
+    try:
+        with pytest.raises(ValueError, match="scoring failed"):
+            batcher.submit((1.0,))
+    finally:
+        batcher.close()
+
+
+def test_manager_micro_batching_matches_direct_path():
+    """Micro-batched predictions equal the direct single-row path"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    patients = make_patients(50, seed=3)
+    expected = [manager.predict(p) for p in patients]
+
+    manager.enable_micro_batching(max_batch_size=8, max_wait_ms=1)
+    results = [None] * len(patients)
+
+    def worker(i):
+        results[i] = manager.predict(patients[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(patients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.batcher.close()
+
+    for (a, conf_a), (b, conf_b) in zip(expected, results):
+        assert abs(a - b) < 1e-12
+        assert conf_a == conf_b
+
+
+def test_submit_after_close_raises():
+    """A closed batcher rejects new rows instead of blocking"""
+    batcher = MicroBatcher(lambda X: X[:, 0].tolist())
+    batcher.close()
+    with pytest.raises(BatcherClosedError):
+        batcher.submit((1.0,))
+
+
+def test_close_fails_queued_rows():
+    """Rows still waiting when the batcher closes fail with BatcherClosedError"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_score(X):
+        started.set()
+        release.wait()
+        return X[:, 0].tolist()
+
+    batcher = MicroBatcher(slow_score, max_batch_size=1)
+    outcomes = {}
+
+    def worker(i):
+        try:
+            outcomes[i] = batcher.submit((float(i),))
+        except BatcherClosedError as e:
+            outcomes[i] = e
+
+    first = threading.Thread(target=worker, args=(0,))
+    first.start()
+    started.wait()
+    queued = [threading.Thread(target=worker, args=(i,)) for i in range(1, 4)]
+    for thread in queued:
+        thread.start()
+    time.sleep(0.05)
+
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    time.sleep(0.05)
+    release.set()
+    closer.join(timeout=5)
+    for thread in [first] + queued:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+    assert outcomes[0] == 0.0
+    assert all(isinstance(outcomes[i], BatcherClosedError) for i in range(1, 4))
+
+
+def test_manager_survives_batcher_replacement():
+    """Re-enabling micro-batching while requests run never hangs or fails them"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    manager.enable_micro_batching(max_batch_size=4, max_wait_ms=1)
+    patients = make_patients(20, seed=6)
+    errors = []
+    stop = threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            for patient in patients:
+                try:
+                    manager.predict(patient)
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(10):
+        manager.enable_micro_batching(max_batch_size=4, max_wait_ms=1)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    manager.batcher.close()
+
+    assert errors == []
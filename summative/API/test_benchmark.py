@@ -0,0 +1,49 @@
+"""
+Tests for the load-testing benchmark harness
+"""
+
+import json
+
+import pytest
+
+from benchmark import compare, main, make_payloads, percentile_summary
+
+
+def test_percentiles_are_observed_values():
+    """Nearest-rank percentiles pick real samples and are reported in ms"""
+    summary = percentile_summary([i / 1000 for i in range(1, 1001)])
+
+    assert summary["p50"] == 500
+    assert summary["p99"] == 990
+    assert summary["p999"] == 999
+    assert summary["max"] == 1000
+    assert percentile_summary([])["p50"] is None
+
+
+def test_payloads_are_deterministic():
+    """The same seed produces the same request bodies"""
+    first = make_payloads(3, 5, "predict_batch", seed=7)
+    assert first == make_payloads(3, 5, "predict_batch", seed=7)
+    assert len(json.loads(first[0])["patients"]) == 5
+    assert "patients" not in json.loads(make_payloads(1, 5, "predict")[0])
+
+
+def test_in_process_run_writes_comparable_report(tmp_path):
+    """A short closed-loop run serves every request and writes a JSON report"""
+    output = tmp_path / "run.json"
+    report = main(["--endpoint", "predict", "predict_batch", "--concurrency", "2",
+                   "--batch-size", "10", "--duration", "0.5", "--warmup", "0.1",
+                   "--output", str(output)])
+
+    saved = json.loads(output.read_text())
+    assert saved["scenarios"] == report["scenarios"]
+    assert "commit" in saved["git"]
+    for scenario in saved["scenarios"]:
+        assert scenario["requests"] > 0
+        assert scenario["errors"] == 0
+        assert scenario["latency_ms"]["p50"] <= scenario["latency_ms"]["p999"]
+
+    batch = next(s for s in saved["scenarios"] if s["endpoint"] == "/predict_batch")
+    assert batch["rows_per_sec"] == pytest.approx(batch["throughput_rps"] * 10)
+    assert [row[0] for row in compare(saved, saved)] == [s["name"] for s in saved["scenarios"]]
+    assert all(change == 0 for row in compare(saved, saved) for change in row[1:])
@@ -0,0 +1,168 @@
+"""
+Tests for the memory-mappable model bundle
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from bundle import BUNDLE_FILE, BundleError, artifact_hash, convert, load_bundle
+from main import ModelManager
+from prediction import PredictionEngine
+from test_batch_predictions import make_patients
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(API_DIR, 'models')
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A copy of the model pickles with a freshly converted bundle"""
+    target = tmp_path / "models"
+    shutil.copytree(MODEL_DIR, target, ignore=shutil.ignore_patterns(BUNDLE_FILE))
+    convert(str(target))
+    return str(target)
+
+
+def test_bundle_reproduces_sklearn(model_dir):
+    """The bundle's scaler, model and kernel match the pickled sklearn objects"""
+    bundle = load_bundle(os.path.join(model_dir, BUNDLE_FILE), verify=True)
+    model = joblib.load(os.path.join(model_dir, 'best_model.pkl'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+
+    pickled = ModelManager(model_dir=MODEL_DIR)
+    raw = pickled.feature_matrix(make_patients(200, seed=11))
+    expected = model.predict(scaler.transform(pd.DataFrame(raw, columns=bundle.features)))
+
+    np.testing.assert_allclose(bundle.model.predict(bundle.scaler.transform(raw)), expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(bundle.kernel.predict(raw), expected, rtol=1e-12, atol=1e-12)
+    assert bundle.features == list(joblib.load(os.path.join(model_dir, 'features.pkl')))
+    assert bundle.model_version == artifact_hash(model_dir)
+    assert not bundle.arrays['kernel.weights'].flags.writeable
+
+
+def test_manager_prefers_current_bundle(model_dir):
+    """ModelManager serves from the bundle with the same version and predictions"""
+    from bundle import BundleLinearModel
+
+    manager = ModelManager(model_dir=model_dir)
+    pickled = ModelManager(model_dir=MODEL_DIR)
+
+    assert isinstance(manager.model, BundleLinearModel)
+    assert manager.model_version == pickled.model_version
+    for patient in make_patients(20, seed=12):
+        prediction, confidence = manager.predict(patient)
+        expected, expected_confidence = pickled.predict(patient)
+        assert abs(prediction - expected) < 1e-12
+        assert confidence == expected_confidence
+
+
+def test_stale_bundle_is_ignored(model_dir, capsys):
+    """A bundle converted from different pickles falls back to the pickles"""
+    joblib.dump({}, os.path.join(model_dir, 'label_encoders.pkl'), compress=3)
+
+    manager = ModelManager(model_dir=model_dir)
+
+    assert type(manager.model).__name__ == 'SGDRegressor'
+    assert "stale model bundle" in capsys.readouterr().out
+
+
+def test_corrupt_bundle_is_ignored(model_dir, capsys):
+    """A truncated bundle is reported and the pickles are used"""
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:200])
+
+    with pytest.raises(BundleError):
+        load_bundle(path)
+    manager = ModelManager(model_dir=model_dir)
+    assert type(manager.model).__name__ == 'SGDRegressor'
+    assert "Ignoring model bundle" in capsys.readouterr().out
+
+
+def test_tampered_bundle_fails_verification(model_dir):
+    """Changing any byte of the array payload is caught by the content hash"""
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    with open(path, 'r+b') as f:
+        f.seek(-9, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-9, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(BundleError, match="Content hash mismatch"):
+        load_bundle(path, verify=True)
+
+
+def test_bundle_only_directory_needs_no_sklearn(model_dir):
+    """With only the bundle present, scoring never imports sklearn or pandas"""
+    for filename in os.listdir(model_dir):
+        if filename != BUNDLE_FILE:
+            os.remove(os.path.join(model_dir, filename))
+
+    script = (
+        "import sys, numpy as np\n"
+        "from bundle import open_bundle\n"
+        f"bundle = open_bundle({model_dir!r})\n"
+        "print(bundle.kernel.predict(np.ones((2, len(bundle.features)))).shape)\n"
+        "print('sklearn' in sys.modules, 'pandas' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=API_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split("\n")[:2] == ["(2,)", "False False"]
+
+
+def test_prediction_engine_uses_bundle(model_dir):
+    """PredictionEngine loads the bundle and predicts like the pickles"""
+    engine = PredictionEngine(model_dir=model_dir, verbose=False)
+    pickled = PredictionEngine(model_dir=MODEL_DIR, verbose=False)
+    data = pd.DataFrame([patient_row(p) for p in make_patients(50, seed=13)])
+
+    assert engine.model.model_type == 'SGDRegressor'
+    np.testing.assert_allclose(engine.predict(data), pickled.predict(data), rtol=1e-12)
+
+
+def patient_row(patient):
+    """Map a PatientData object onto the training column names"""
+    return {
+        'Age': patient.age,
+        'Menstrual_Irregularity': patient.menstrual_irregularity,
+        'Chronic_Pain_Level': patient.chronic_pain_level,
+        'Hormone_Level_Abnormality': patient.hormone_level_abnormality,
+        'Infertility': patient.infertility,
+        'BMI': patient.bmi,
+    }
+
+
+def test_forest_bundle_round_trip(model_dir):
+    """A forest is stored as flat node arrays and predicts exactly like sklearn"""
+    from bundle import BundleTreeModel
+    from sklearn.ensemble import RandomForestRegressor
+
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    pickled = ModelManager(model_dir=MODEL_DIR)
+    raw = pickled.feature_matrix(make_patients(400, seed=14))
+    X = scaler.transform(pd.DataFrame(raw, columns=pickled.features))
+    forest = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=42, n_jobs=1)
+    forest.fit(X, X[:, 2] * 0.1 + X[:, 0] * 0.05)
+    joblib.dump(forest, os.path.join(model_dir, 'best_model.pkl'))
+
+    convert(model_dir)
+    bundle = load_bundle(os.path.join(model_dir, BUNDLE_FILE), verify=True)
+
+    assert isinstance(bundle.model, BundleTreeModel)
+    assert bundle.manifest['kernel_type'] == 'tree'
+    assert not bundle.arrays['kernel.threshold'].flags.writeable
+    np.testing.assert_array_equal(bundle.kernel.predict(raw), forest.predict(X))
+    np.testing.assert_array_equal(bundle.model.predict(bundle.scaler.transform(raw)), forest.predict(X))
+
+    manager = ModelManager(model_dir=model_dir)
+    assert manager.kernel.n_trees == 15
+    assert manager.predict_batch(make_patients(5, seed=15))[0].shape == (5,)
@@ -0,0 +1,142 @@
+"""
+Tests for the LRU prediction cache
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from cache import PredictionCache
+from main import ModelManager
+from test_batch_predictions import make_patients
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def test_lru_eviction_and_counters():
+    """The least recently used entry is evicted first"""
+    cache = PredictionCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_cache_is_thread_safe():
+    """Concurrent puts never exceed the size bound"""
+    cache = PredictionCache(max_size=64)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.put((offset, i % 100), i)
+            cache.get((offset, (i + 1) % 100))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 64
+    assert cache.stats()["hits"] + cache.stats()["misses"] == 8 * 2000
+
+
+def test_manager_cache_hits_return_same_prediction():
+    """Repeated profiles are served from the cache with identical results"""
+    manager = ModelManager(model_dir=MODEL_DIR, cache_size=16)
+    patient = make_patients(1)[0]
+
+    first = manager.predict(patient)
+    second = manager.predict(patient.model_copy())
+
+    assert first == second
+    assert manager.cache.stats()["hits"] == 1
+    assert manager.cache.stats()["misses"] == 1
+
+
+def test_manager_cache_invalidated_on_reload():
+    """Reloading artifacts drops cached predictions"""
+    manager = ModelManager(model_dir=MODEL_DIR, cache_size=16)
+    manager.predict(make_patients(1)[0])
+    assert len(manager.cache) == 1
+
+    manager._load_artifacts()
+
+    assert len(manager.cache) == 0
+
+
+def test_manager_without_cache():
+    """A cache size of 0 disables caching"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    assert manager.cache is None
+    manager.predict(make_patients(1)[0])
+
+
+def test_model_info_reports_empty_cache_stats(monkeypatch):
+    """Counters are reported even while the cache holds no entries"""
+    from fastapi.testclient import TestClient
+    import main
+
+    manager = ModelManager(model_dir=MODEL_DIR, cache_size=16)
+    monkeypatch.setattr(main, 'model_manager', manager)
+    client = TestClient(main.app)
+
+    stats = client.get("/model-info").json()["prediction_cache"]
+    assert stats["size"] == 0
+    assert stats["misses"] == 0
+
+
+def test_reload_never_caches_stale_predictions(monkeypatch):
+    """Predictions racing a reload are never stored under the wrong version"""
+    import main
+    from kernels import LinearKernel
+
+    manager = ModelManager(model_dir=MODEL_DIR, cache_size=4096)
+    n_features = len(manager.features)
+    kernels = {
+        "v-low": LinearKernel(np.zeros(n_features), 0.1),
+        "v-high": LinearKernel(np.zeros(n_features), 0.9),
+    }
+    versions = iter(["v-low", "v-high"] * 1000)
+    current = {}
+
+    def fake_hash(model_dir):
+        current["version"] = next(versions)
+        return current["version"]
+
+    monkeypatch.setattr(main, 'artifact_hash', fake_hash)
+    monkeypatch.setattr(main, 'compile_kernel', lambda model, scaler: kernels[current["version"]])
+    monkeypatch.setattr(main, 'open_bundle', lambda model_dir: None)
+    manager._load_artifacts()
+
+    patients = make_patients(30, seed=5)
+    stop = threading.Event()
+
+    def predict_loop():
+        while not stop.is_set():
+            for patient in patients:
+                manager.predict(patient)
+
+    threads = [threading.Thread(target=predict_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(40):
+        manager._load_artifacts()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    expected = {version: kernel.bias for version, kernel in kernels.items()}
+    for (version, _), (prediction, _) in list(manager.cache._entries.items()):
+        assert prediction == expected[version]
@@ -0,0 +1,102 @@
+"""
+Tests for column-wise validation of JSON batches (/predict_batch?validation=columns)
+"""
+
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+from columnar import json_rows_to_columns
+from test_batch_predictions import make_patients
+
+client = TestClient(main.app)
+
+
+def odd_rows():
+    """Rows that exercise every way a JSON value can be off"""
+    base = make_patients(1, seed=51)[0].model_dump()
+    variants = [
+        {"age": 12},
+        {"age": 30.0},
+        {"age": 30.5},
+        {"age": "31"},
+        {"age": True},
+        {"age": None},
+        {"age": 10 ** 30},
+        {"bmi": 61},
+        {"bmi": 9.5, "chronic_pain_level": -1},
+        {"infertility": 2},
+        {"extra_field": "ignored"},
+    ]
+    rows = [dict(base, **variant) for variant in variants]
+    missing = dict(base)
+    del missing["bmi"]
+    return rows + [missing, "not an object", []]
+
+
+def test_columns_mode_matches_model_mode_for_valid_batches():
+    """Valid batches get the same response either way"""
+    patients = [p.model_dump() for p in make_patients(300, seed=52)]
+
+    model = client.post("/predict_batch", json={"patients": patients})
+    columns = client.post("/predict_batch?validation=columns", json={"patients": patients})
+
+    assert columns.status_code == model.status_code == 200
+    assert columns.json() == model.json()
+    assert columns.headers["X-Model-Version"] == model.headers["X-Model-Version"]
+
+
+def test_columns_mode_reports_rows_like_model_validation():
+    """Invalid rows get the messages model validation gives them; the rest are scored"""
+    rows = odd_rows() + [p.model_dump() for p in make_patients(5, seed=53)]
+
+    response = client.post("/predict_batch?validation=columns", json={"patients": rows})
+    assert response.status_code == 200
+    body = response.json()
+
+    # Model mode rejects the whole batch, listing each error under body.patients.<row>
+    rejected = client.post("/predict_batch", json={"patients": rows})
+    assert rejected.status_code == 422
+    expected = {}
+    for error in rejected.json()["detail"]:
+        row, field = error["loc"][2], ".".join(str(part) for part in error["loc"][3:])
+        message = f"{field}: {error['msg']}" if field else error["msg"]
+        expected[row] = f"{expected[row]}; {message}" if row in expected else message
+
+    errors = {row: entry["error"] for row, entry in enumerate(body["predictions"]) if entry["status"] == "error"}
+    assert errors == expected
+    assert body["total_processed"] == len(rows)
+    assert not body["success"]
+
+    # Rows that only look odd (30.0, "31", extra fields) are accepted like the model accepts them
+    statuses = [entry["status"] for entry in body["predictions"]]
+    assert statuses[1] == statuses[3] == statuses[10] == "success"
+    single = client.post("/predict", json=rows[3]).json()
+    assert body["predictions"][3]["prediction"] == single["prediction"]
+
+
+def test_columns_mode_keeps_envelope_errors():
+    """A body without a patients list is still rejected with the usual 422"""
+    for payload in ({"patients": "nope"}, {}, []):
+        model = client.post("/predict_batch", json=payload)
+        columns = client.post("/predict_batch?validation=columns", json=payload)
+        assert columns.status_code == model.status_code == 422
+        assert columns.json() == model.json()
+
+    assert client.post("/predict_batch?validation=other", json={"patients": []}).status_code == 422
+
+
+def test_json_rows_to_columns_flags_irregular_values():
+    """Plain numbers are converted in bulk; everything else is flagged"""
+    features = main.model_manager.features
+    rows = odd_rows()
+
+    raw, irregular = json_rows_to_columns(rows, main.COLUMN_SPECS, features)
+
+    assert raw.shape == (len(rows), len(features))
+    assert irregular.tolist() == [False, False, False, True, True, True, False,
+                                  False, False, False, False, True, True, True]
+    age = features.index("Age")
+    assert raw[1, age] == 30.0 and raw[6, age] == 1e30 and np.isnan(raw[3, age])
@@ -0,0 +1,119 @@
+"""
+Tests for binary columnar (NumPy / Arrow) batch input and output
+"""
+
+import io
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from test_batch_predictions import make_patients
+
+client = TestClient(main.app)
+
+FIELDS = ['age', 'menstrual_irregularity', 'chronic_pain_level',
+          'hormone_level_abnormality', 'infertility', 'bmi']
+
+
+def patient_columns(patients):
+    """Turn PatientData objects into one NumPy array per field"""
+    return {field: np.array([getattr(p, field) for p in patients]) for field in FIELDS}
+
+
+def json_predictions(patients):
+    """Score the same patients through the JSON path"""
+    response = client.post("/predict_batch", json={"patients": [p.model_dump() for p in patients]})
+    return response.json()["predictions"]
+
+
+def test_npz_round_trip_with_invalid_rows():
+    """Valid rows match the JSON path; invalid rows get NaN, -1 and a message"""
+    patients = make_patients(50, seed=7)
+    columns = patient_columns(patients)
+    columns['age'] = columns['age'].astype(float)
+    columns['age'][3] = 12
+    columns['age'][4] = 30.5
+    columns['bmi'][4] = 75.0
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    response = client.post("/predict_batch", content=buffer.getvalue(),
+                           headers={"Content-Type": "application/x-npz"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-npz"
+
+    result = np.load(io.BytesIO(response.content))
+    assert result["error_rows"].tolist() == [3, 4]
+    assert result["error_messages"][0] == "age: Input should be greater than or equal to 18"
+    assert "fractional part" in result["error_messages"][1]
+    assert "bmi: Input should be less than or equal to 60.0" in result["error_messages"][1]
+    assert np.isnan(result["prediction"][[3, 4]]).all()
+    assert result["confidence"][[3, 4]].tolist() == [-1, -1]
+
+    valid = [i for i in range(50) if i not in (3, 4)]
+    expected = json_predictions([patients[i] for i in valid])
+    levels = result["confidence_levels"].tolist()
+    for row, entry in zip(valid, expected):
+        assert round(float(result["prediction"][row]), 4) == entry["prediction"]
+        assert levels[result["confidence"][row]] == entry["confidence"]
+
+
+def test_plain_npy_matrix_in_feature_order():
+    """A 2-D .npy array is read in model feature order"""
+    patients = make_patients(10, seed=8)
+    matrix = main.model_manager.feature_matrix(patients)
+
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    response = client.post("/predict_batch", content=buffer.getvalue(),
+                           headers={"Content-Type": "application/x-npy"})
+    assert response.status_code == 200
+
+    result = np.load(io.BytesIO(response.content))
+    expected = json_predictions(patients)
+    assert np.round(result["prediction"], 4).tolist() == [e["prediction"] for e in expected]
+
+
+def test_arrow_stream_round_trip():
+    """Arrow IPC input returns an Arrow IPC stream with nullable columns"""
+    pa = pytest.importorskip("pyarrow")
+    patients = make_patients(20, seed=9)
+    columns = patient_columns(patients)
+    columns['chronic_pain_level'][0] = 11.0
+    table = pa.table(columns)
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/predict_batch", content=sink.getvalue(),
+                           headers={"Content-Type": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+
+    result = pa.ipc.open_stream(response.content).read_all()
+    assert result.column("prediction")[0].as_py() is None
+    assert "less than or equal to 10.0" in result.column("error")[0].as_py()
+
+    expected = json_predictions(patients[1:])
+    predictions = result.column("prediction").to_pylist()[1:]
+    assert [round(p, 4) for p in predictions] == [e["prediction"] for e in expected]
+
+
+def test_missing_column_is_rejected():
+    """A payload without every feature column is a 400"""
+    buffer = io.BytesIO()
+    np.savez(buffer, age=np.array([30]))
+    response = client.post("/predict_batch", content=buffer.getvalue(),
+                           headers={"Content-Type": "application/x-npz"})
+    assert response.status_code == 400
+    assert "Missing required column" in response.json()["detail"]
+
+
+def test_json_validation_errors_unchanged():
+    """JSON bodies still get FastAPI's 422 error shape"""
+    response = client.post("/predict_batch", json={"patients": [{"age": 10}]})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail[0]["loc"] == ["body", "patients", 0, "age"]
+    assert detail[0]["msg"] == "Input should be greater than or equal to 18"
@@ -0,0 +1,110 @@
+"""
+Tests for in-batch deduplication of identical rows
+"""
+
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestRegressor
+
+import dedup
+import main
+from dedup import unique_rows, worth_deduplicating
+from kernels import LinearKernel
+from main import METRICS, ModelManager
+from prediction import PredictionEngine, score_file
+from test_batch_predictions import make_patients
+from test_kernels import fit_trees
+from test_prediction_cli import make_frame
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def repeated_rows(n, distinct, dtype=np.float64, seed=0):
+    """n rows drawn from a pool of `distinct` random rows"""
+    rng = np.random.default_rng(seed)
+    pool = np.round(rng.uniform(0, 100, (distinct, 6)), 1).astype(dtype)
+    return pool[rng.integers(0, distinct, n)]
+
+
+def forest_manager(tmp_path, monkeypatch, **options):
+    """A manager serving a small random forest from the pickles"""
+    monkeypatch.setattr(main, 'open_bundle', lambda model_dir: None)
+    forest, _, _ = fit_trees(RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0))
+    model_dir = tmp_path / "models"
+    shutil.copytree(MODEL_DIR, model_dir, ignore=shutil.ignore_patterns('model_bundle.npy'))
+    joblib.dump(forest, model_dir / 'best_model.pkl')
+    return ModelManager(model_dir=str(model_dir), **options), str(model_dir)
+
+
+def test_unique_rows_rebuilds_the_matrix():
+    """X[first][inverse] is X, and every distinct row appears once"""
+    for dtype in (np.float64, np.float32):
+        X = repeated_rows(5000, 37, dtype=dtype)
+        first, inverse = unique_rows(X)
+        assert len(first) == len(np.unique(X, axis=0)) == 37
+        np.testing.assert_array_equal(X[first][inverse], X)
+
+    first, inverse = unique_rows(np.empty((0, 6)))
+    assert len(first) == len(inverse) == 0
+
+
+def test_hash_collisions_fall_back_to_exact_grouping(monkeypatch):
+    """Rows sharing a hash are never merged"""
+    monkeypatch.setattr(dedup, '_row_hashes', lambda X: np.zeros(len(X), dtype=np.uint64))
+    X = repeated_rows(500, 9)
+    first, inverse = unique_rows(X)
+    assert len(first) == 9
+    np.testing.assert_array_equal(X[first][inverse], X)
+
+
+def test_only_expensive_models_are_deduplicated_by_default():
+    """Linear models are cheaper to score than to hash; forests are not"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    assert not worth_deduplicating(manager.model, LinearKernel(np.ones(6), 0.0))
+    assert not manager.active.dedup
+    assert worth_deduplicating(RandomForestRegressor(), None)
+    assert ModelManager(model_dir=MODEL_DIR, dedup="on").active.dedup
+
+
+def test_forest_predictions_are_unchanged(tmp_path, monkeypatch):
+    """Deduplicated batches score exactly like scoring every row, and the ratio is reported"""
+    manager, model_dir = forest_manager(tmp_path, monkeypatch)
+    assert manager.active.dedup
+    monkeypatch.setattr(main, 'model_manager', manager)
+    before = METRICS.dedup_totals()
+
+    patients = make_patients(20, seed=7) * 10
+    deduplicated = manager.predict_batch(patients)[0]
+    every_row = ModelManager(model_dir=model_dir, dedup="off").predict_batch(patients)[0]
+    np.testing.assert_array_equal(deduplicated, every_row)
+
+    client = TestClient(main.app)
+    info = client.get("/model-info").json()["deduplication"]
+    assert info["mode"] == "auto" and info["active"] is True
+    assert info["rows"] - before["rows"] == 200
+    assert info["unique_rows"] - before["unique_rows"] == 20
+    assert 'endometriosis_dedup_rows_total{endpoint="background"}' in client.get("/metrics").text
+
+
+def test_prediction_engine_deduplicates(tmp_path, monkeypatch):
+    """Offline scoring reports distinct rows and returns the same predictions"""
+    _, model_dir = forest_manager(tmp_path, monkeypatch)
+    data = pd.concat([make_frame(25, seed=3)] * 8, ignore_index=True)
+
+    engine = PredictionEngine(model_dir=model_dir, verbose=False)
+    assert engine.dedup
+    deduplicated = engine.predict(data)
+    assert engine.last_unique_rows == 25
+    engine.dedup = False
+    np.testing.assert_array_equal(deduplicated, engine.predict(data))
+
+    input_path = tmp_path / "input.csv"
+    data.to_csv(input_path, index=False)
+    stats = score_file(str(input_path), str(tmp_path / "output.csv"), model_dir=model_dir,
+                       chunk_size=100, workers=1)
+    assert (stats['rows'], stats['unique_rows'], stats['dedup_ratio']) == (200, 50, 4.0)
@@ -0,0 +1,61 @@
+"""
+Tests for the opt-in fast JSON response path
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import fast_json
+import main
+from test_batch_predictions import make_patients
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def responses(client, monkeypatch, fast):
+    """Send the same /predict and /predict_batch requests with the fast path on or off"""
+    monkeypatch.setattr(main, 'FAST_JSON_RESPONSES', fast)
+    patients = [p.model_dump() for p in make_patients(30, seed=41)]
+    return (
+        client.post("/predict", json=patients[0]),
+        client.post("/predict_batch", json={"patients": patients}),
+    )
+
+
+def test_fast_responses_match_validated_responses(client, monkeypatch):
+    """Bodies, status codes and headers are the same with and without the fast path"""
+    slow = responses(client, monkeypatch, False)
+    fast = responses(client, monkeypatch, True)
+
+    for before, after in zip(slow, fast):
+        assert after.status_code == before.status_code == 200
+        assert after.json() == before.json()
+        assert after.headers["content-type"] == "application/json"
+        assert after.headers["X-Model-Version"] == before.headers["X-Model-Version"]
+
+
+@pytest.mark.parametrize("encoder", [None, fast_json.orjson])
+def test_dumps_matches_starlette_encoding(encoder, monkeypatch):
+    """Both encoders produce compact JSON equal to what Starlette would send"""
+    monkeypatch.setattr(fast_json, 'orjson', encoder)
+    content = {"predictions": [{"patient_id": 1, "prediction": 0.1234, "confidence": "Low",
+                                "status": "success"}], "total_processed": 1, "success": True}
+
+    encoded = fast_json.dumps(content)
+    assert json.loads(encoded) == content
+    assert encoded == json.dumps(content, separators=(",", ":")).encode()
+
+
+def test_openapi_schema_is_unchanged(client):
+    """The documented response models stay in the schema"""
+    schema = client.get("/openapi.json").json()
+    for path in ("/predict", "/predict_batch"):
+        response_schema = schema["paths"][path]["post"]["responses"]["200"]["content"]["application/json"]
+        assert response_schema["schema"]["$ref"].endswith(
+            "PredictionResponse" if path == "/predict" else "BatchPredictionResponse"
+        )
@@ -0,0 +1,240 @@
+"""
+Tests for the asynchronous batch-job API
+"""
+
+import io
+import json
+import os
+import time
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from jobs import JobInputError, JobRunner, count_rows, iter_chunks, iter_json_patients
+from main import ModelManager
+from test_batch_predictions import make_patients
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """A job runner on a fresh directory; workers are driven by hand with run_once"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    monkeypatch.setattr(main, 'model_manager', manager)
+    manager.jobs = JobRunner(str(tmp_path / "jobs"), main.score_job_chunk, chunk_size=7,
+                             aliases=dict(main.FEATURE_FIELDS))
+    return manager.jobs
+
+
+def results_of(job_id):
+    """Download a job's results as a list of dicts"""
+    response = client.get(f"/jobs/{job_id}/results")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_job_matches_predict_stream(runner):
+    """A queued JSON batch is scored in chunks with the same results as /predict_stream"""
+    body = {"patients": [p.model_dump() for p in make_patients(20, seed=1)]}
+    body["patients"][3]["age"] = 12
+
+    response = client.post("/jobs", json=body)
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["location"] == job["status_url"] == f"/jobs/{job['job_id']}"
+    assert job["status"] == "queued" and job["total_rows"] == 20 and job["progress"] == 0
+
+    assert client.get(f"/jobs/{job['job_id']}/results").status_code == 409
+    assert runner.run_once("test-worker")
+
+    status = client.get(f"/jobs/{job['job_id']}").json()
+    assert status["status"] == "succeeded"
+    assert status["rows_done"] == 20 and status["progress"] == 1.0
+    assert status["model_versions"] == [main.model_manager.model_version]
+
+    results = results_of(job["job_id"])
+    assert len(os.listdir(runner.results_dir(job["job_id"]))) == 3
+    streamed = client.post("/predict_stream", content="\n".join(json.dumps(p) for p in body["patients"]),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert results == [json.loads(line) for line in streamed.text.splitlines()]
+    assert "age" in results[3]["error"]
+    assert not os.path.exists(runner.input_path(job["job_id"], "json"))
+
+
+def test_ndjson_and_csv_inputs(runner):
+    """NDJSON lines and CSV rows named by field or training column are accepted"""
+    patients = make_patients(9, seed=2)
+    ndjson = "\n".join(p.model_dump_json() for p in patients) + "\n\n"
+    columns = list(main.FEATURE_FIELDS)
+    csv_text = ",".join(columns) + "\n" + "\n".join(
+        ",".join(str(getattr(p, main.FEATURE_FIELDS[c])) for c in columns) for p in patients
+    ) + "\n200,1,5,0,0,25\n"
+
+    ndjson_job = client.post("/jobs", content=ndjson, headers={"Content-Type": "application/x-ndjson"}).json()
+    csv_job = client.post("/jobs", content=csv_text, headers={"Content-Type": "text/csv; charset=utf-8"}).json()
+    assert (ndjson_job["total_rows"], csv_job["total_rows"]) == (9, 10)
+    while runner.run_once("test-worker"):
+        pass
+
+    from_ndjson = results_of(ndjson_job["job_id"])
+    from_csv = results_of(csv_job["job_id"])
+    assert [r["prediction"] for r in from_csv[:9]] == [r["prediction"] for r in from_ndjson]
+    assert from_csv[9]["status"] == "error" and from_csv[9]["patient_id"] == 10
+
+
+def test_rejected_inputs(runner):
+    """Unsupported types, malformed bodies and oversized uploads are refused up front"""
+    assert client.post("/jobs", content=b"x", headers={"Content-Type": "text/plain"}).status_code == 415
+    assert client.post("/jobs", json={"rows": []}).status_code == 400
+    runner.max_input_bytes = 10
+    assert client.post("/jobs", json={"patients": []}).status_code == 413
+    assert os.listdir(os.path.join(runner.directory, "inputs")) == []
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_json_input_is_read_incrementally():
+    """JSON patients are decoded one at a time, even when values straddle read blocks"""
+    patients = [p.model_dump() for p in make_patients(50, seed=7)]
+    body = json.dumps({"model": {"note": "ignored", "n": [1, 2.5]}, "patients": patients, "version": 12345},
+                      indent=2).encode()
+
+    for block_size in (1, 7, 1 << 16):
+        assert list(iter_json_patients(io.BytesIO(body), block_size=block_size)) == patients
+    assert list(iter_json_patients(io.BytesIO(b'\xef\xbb\xbf{"patients": []}'))) == []
+
+    for malformed in (b'[]', b'{"rows": []}', b'{"patients": {}}', b'{"patients": [{"age": 1}',
+                      b'{"patients": [1 2]}', b'{"patients": []} x', b'{"patients": [], "patients": []}'):
+        with pytest.raises(JobInputError):
+            list(iter_json_patients(io.BytesIO(malformed), block_size=4))
+
+
+def test_json_input_memory_does_not_grow_with_job_size(tmp_path):
+    """Counting and chunking a large JSON input holds only a read block and one chunk"""
+    path = tmp_path / "large.json"
+    path.write_text(json.dumps({"patients": [p.model_dump() for p in make_patients(500)] * 100}))
+
+    tracemalloc.start()
+    try:
+        assert count_rows(str(path), "json") == 50_000
+        counting_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        assert sum(len(chunk) for chunk in iter_chunks(str(path), "json", 100)) == 50_000
+        chunking_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # json.load of the same file peaks at several times its size
+    assert max(counting_peak, chunking_peak) < path.stat().st_size / 10
+
+
+def test_stopped_job_resumes_after_restart(runner):
+    """A job interrupted between chunks is resumed by a new runner without rescoring finished chunks"""
+    job = runner.submit(_spooled(runner, make_patients(20, seed=3)), "json")
+    calls = []
+
+    def stop_after_first_chunk(chunk):
+        calls.append(chunk[0][0])
+        runner._stop.set()
+        return main.score_job_chunk(chunk)
+
+    runner.score_fn = stop_after_first_chunk
+    runner.run_once("first-process")
+    assert runner.status(job["job_id"])["status"] == "queued"
+    assert runner.status(job["job_id"])["rows_done"] == 7
+
+    restarted = JobRunner(runner.directory, lambda chunk: calls.append(chunk[0][0]) or main.score_job_chunk(chunk),
+                          chunk_size=7)
+    assert restarted.run_once("second-process")
+    assert calls == [1, 8, 15]
+    assert [r["patient_id"] for r in results_of_runner(restarted, job["job_id"])] == list(range(1, 21))
+
+
+def test_abandoned_job_is_taken_over_once_its_lease_expires(runner):
+    """A running job whose worker stopped sending heartbeats is claimed by another worker"""
+    job = runner.submit(_spooled(runner, make_patients(10, seed=4)), "json")
+    assert runner.store.claim("crashed-worker", lease=60)["id"] == job["job_id"]
+
+    runner.lease = 60
+    assert not runner.run_once("live-worker")
+    runner.lease = 0
+    assert runner.run_once("live-worker")
+    assert runner.status(job["job_id"])["status"] == "succeeded"
+
+
+def test_finished_jobs_expire(runner):
+    """Results are deleted with the job once the TTL has passed"""
+    runner.ttl = 0
+    job = runner.submit(_spooled(runner, make_patients(3, seed=5)), "json")
+    runner.run_once("test-worker")
+    time.sleep(0.01)
+
+    assert client.get(f"/jobs/{job['job_id']}").status_code == 404
+    assert runner.expire() == 1
+    assert not os.path.exists(runner.results_dir(job["job_id"]))
+
+
+def test_delete_cancels_a_job(runner):
+    """DELETE removes a queued job and its input"""
+    job = client.post("/jobs", json={"patients": [p.model_dump() for p in make_patients(3)]}).json()
+
+    assert client.delete(f"/jobs/{job['job_id']}").json()["status"] == "deleted"
+    assert client.get(f"/jobs/{job['job_id']}").status_code == 404
+    assert not runner.run_once("test-worker")
+    assert os.listdir(os.path.join(runner.directory, "inputs")) == []
+
+
+def test_background_workers_and_reporting(runner):
+    """Started workers pick up new jobs; counts show in /model-info and /metrics"""
+    runner.poll_interval = 0.05
+    runner.start()
+    try:
+        job = client.post("/jobs", json={"patients": [p.model_dump() for p in make_patients(30)]}).json()
+        deadline = time.monotonic() + 10
+        while client.get(f"/jobs/{job['job_id']}").json()["status"] != "succeeded":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+    finally:
+        runner.stop()
+
+    assert client.get("/model-info").json()["batch_jobs"]["succeeded"] == 1
+    assert 'endometriosis_batch_jobs{status="succeeded"} 1' in client.get("/metrics").text
+
+
+def test_jobs_disabled(monkeypatch):
+    """Without BATCH_JOBS the endpoints answer 404"""
+    monkeypatch.setattr(main, 'model_manager', ModelManager(model_dir=MODEL_DIR))
+    assert client.post("/jobs", json={"patients": []}).status_code == 404
+
+
+def _spooled(runner, patients):
+    """Write a JSON batch where POST /jobs would spool it"""
+    path = os.path.join(runner.directory, "inputs", f"upload-{len(os.listdir(os.path.join(runner.directory, 'inputs')))}")
+    with open(path, "w") as f:
+        json.dump({"patients": [p.model_dump() for p in patients]}, f)
+    return path
+
+
+def results_of_runner(runner, job_id):
+    """Read a job's results straight from a runner"""
+    return [json.loads(line) for part in runner.iter_results(job_id) for line in part.splitlines()]
+
+
+def test_failing_job_reports_its_error(runner):
+    """An exception while scoring fails the job with its message instead of killing the worker"""
+    job = runner.submit(_spooled(runner, make_patients(3, seed=6)), "json")
+
+    def broken(chunk):
+        raise RuntimeError("Model is not loaded")
+
+    runner.score_fn = broken
+    assert runner.run_once("test-worker")
+
+    status = client.get(f"/jobs/{job['job_id']}").json()
+    assert status["status"] == "failed" and status["error"] == "Model is not loaded"
+    assert client.get(f"/jobs/{job['job_id']}/results").status_code == 409
@@ -0,0 +1,199 @@
+"""
+Tests for the compiled inference kernels
+"""
+
+import os
+
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+import main
+from kernels import LinearKernel, TreeEnsembleKernel, compile_kernel, reduced_precision
+from main import ModelManager
+from test_batch_predictions import make_patients
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def scaled(scaler, raw):
+    """Standardize raw API features with the pickled scaler, as the notebook does"""
+    return scaler.transform(pd.DataFrame(raw, columns=scaler.feature_names_in_))
+
+
+def fit_trees(model, seed=0):
+    """Fit a tree model on standardized features of random patients"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
+    raw = manager.feature_matrix(make_patients(600, seed=seed))
+    y = 0.05 * raw[:, 2] + 0.002 * raw[:, 0] + np.random.default_rng(seed).normal(0, 0.1, len(raw))
+    model.fit(scaled(scaler, raw), y)
+    return model, scaler, manager
+
+
+def test_linear_kernel_matches_sklearn_path():
+    """The fused kernel should reproduce scaler.transform + model.predict"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    assert isinstance(manager.kernel, LinearKernel)
+
+    patients = make_patients(500, seed=1)
+    for patient in patients[:50]:
+        fused = manager.kernel.predict_one(manager.feature_values(patient))
+        expected = manager.model.predict(scaled(manager.scaler, manager.feature_matrix([patient])))[0]
+        assert abs(fused - expected) < 1e-12
+
+    raw = manager.feature_matrix(patients)
+    fused = manager.score_matrix(raw)
+    kernel = manager.kernel
+    manager.kernel = None
+    expected = manager.score_matrix(raw)
+    manager.kernel = kernel
+    np.testing.assert_allclose(fused, expected, rtol=0, atol=1e-12)
+
+
+def test_compile_kernel_falls_back_for_unsupported_models():
+    """Models that can't be fused are left to the sklearn path"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(100, 6))
+    y = rng.normal(size=100)
+    scaler = StandardScaler().fit(X)
+    neighbors = KNeighborsRegressor(n_neighbors=3).fit(scaler.transform(X), y)
+
+    assert compile_kernel(neighbors, scaler) is None
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeRegressor(random_state=42, max_depth=10, min_samples_split=5, min_samples_leaf=2),
+    RandomForestRegressor(n_estimators=20, random_state=42, max_depth=10, min_samples_split=5,
+                          min_samples_leaf=2, n_jobs=1),
+])
+def test_tree_kernel_is_bit_exact(model):
+    """Flattened trees and forests reproduce sklearn's predictions exactly"""
+    model, scaler, manager = fit_trees(model)
+    kernel = compile_kernel(model, scaler)
+    assert isinstance(kernel, TreeEnsembleKernel)
+    assert kernel.threshold.dtype == np.float32 and kernel.left.dtype == np.int32
+
+    raw = manager.feature_matrix(make_patients(3000, seed=3))
+    expected = model.predict(scaled(scaler, raw))
+    np.testing.assert_array_equal(kernel.predict(raw), expected)
+    assert kernel.predict_one(raw[0]) == expected[0]
+
+
+def test_manager_serves_forest_through_tree_kernel(tmp_path, monkeypatch):
+    """Switching best_model.pkl to a forest is picked up transparently"""
+    monkeypatch.setattr(main, 'open_bundle', lambda model_dir: None)
+    forest, _, pickled = fit_trees(RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0))
+    model_dir = tmp_path / "models"
+    shutil.copytree(MODEL_DIR, model_dir, ignore=shutil.ignore_patterns('model_bundle.npy'))
+    joblib.dump(forest, model_dir / 'best_model.pkl')
+
+    manager = ModelManager(model_dir=str(model_dir))
+    assert isinstance(manager.kernel, TreeEnsembleKernel)
+
+    patients = make_patients(50, seed=4)
+    with_kernel = manager.predict_batch(patients)[0]
+    single = [manager.predict(patient)[0] for patient in patients]
+    manager.kernel = None
+    without_kernel = manager.predict_batch(patients)[0]
+
+    np.testing.assert_array_equal(with_kernel, without_kernel)
+    np.testing.assert_array_equal(single, with_kernel)
+
+
+def test_manager_without_kernel_uses_sklearn():
+    """Predictions are unchanged when the kernel is disabled"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    patients = make_patients(20, seed=2)
+    with_kernel = [manager.predict(p) for p in patients]
+
+    manager.kernel = None
+    without_kernel = [manager.predict(p) for p in patients]
+
+    for (a, conf_a), (b, conf_b) in zip(with_kernel, without_kernel):
+        assert abs(a - b) < 1e-12
+        assert conf_a == conf_b
+
+
+def test_kernel_compile_error_falls_back_to_sklearn(monkeypatch, capsys):
+    """A failing kernel compile leaves the new model on the sklearn path"""
+    manager = ModelManager(model_dir=MODEL_DIR)
+    assert manager.kernel is not None
+
+    def broken_compile(model, scaler):
+        raise ValueError("shape mismatch")
+
+    monkeypatch.setattr('main.compile_kernel', broken_compile)
+    monkeypatch.setattr('main.open_bundle', lambda model_dir: None)
+    manager._load_artifacts()
+
+    assert manager.kernel is None
+    assert manager.model is not None
+    output = capsys.readouterr().out
+    assert "Could not compile fused kernel" in output
+    assert "Could not load model artifacts" not in output
+    manager.predict(make_patients(1)[0])
+
+
+def test_float32_manager_scores_within_tolerance():
+    """float32 mode builds float32 matrices and stays within the checked drift of float64"""
+    exact = ModelManager(model_dir=MODEL_DIR)
+    reduced = ModelManager(model_dir=MODEL_DIR, inference_dtype="float32")
+    assert reduced.kernel.dtype == np.float32 and reduced.kernel.weights.dtype == np.float32
+    assert 0 < reduced.active.precision_drift <= reduced.precision_tolerance
+
+    patients = make_patients(2000, seed=5)
+    raw = reduced.feature_matrix(patients)
+    assert raw.dtype == np.float32
+
+    predictions = reduced.score_matrix(raw)
+    assert predictions.dtype == np.float64
+    np.testing.assert_allclose(predictions, exact.score_matrix(exact.feature_matrix(patients)),
+                               rtol=0, atol=reduced.precision_tolerance)
+    single = reduced.predict(patients[0])[0]
+    assert abs(single - exact.predict(patients[0])[0]) <= reduced.precision_tolerance
+
+
+def test_float32_tree_kernel_drift_is_measured():
+    """Forests convert only their scaler parameters and report the drift"""
+    model, scaler, _ = fit_trees(RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0))
+    kernel = compile_kernel(model, scaler)
+
+    reduced, drift = reduced_precision(kernel, scaler, tolerance=1.0)
+
+    assert reduced.mean.dtype == np.float32
+    assert reduced.threshold is kernel.threshold
+    assert 0 <= drift <= 1.0
+
+
+def test_float32_falls_back_when_drift_exceeds_tolerance(capsys):
+    """A model that drifts more than allowed keeps serving in float64"""
+    manager = ModelManager(model_dir=MODEL_DIR, inference_dtype="float32", precision_tolerance=0.0)
+
+    assert manager.kernel.dtype == np.float64
+    assert manager.active.precision_drift > 0
+    assert "scoring in float64" in capsys.readouterr().out
+
+
+def test_precision_is_reported(monkeypatch):
+    """/model-info and /metrics show the active precision and measured drift"""
+    from fastapi.testclient import TestClient
+
+    manager = ModelManager(model_dir=MODEL_DIR, inference_dtype="float32")
+    monkeypatch.setattr(main, 'model_manager', manager)
+    client = TestClient(main.app)
+
+    precision = client.get("/model-info").json()["inference_precision"]
+    assert precision["requested"] == precision["dtype"] == "float32"
+    assert precision["drift"] == manager.active.precision_drift
+
+    metrics = client.get("/metrics").text
+    assert 'endometriosis_inference_dtype_info{dtype="float32"} 1' in metrics
+    assert 'endometriosis_inference_precision_drift{dtype="float32"}' in metrics
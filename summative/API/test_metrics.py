@@ -0,0 +1,108 @@
+"""
+Tests for the metrics primitives and the /metrics endpoint
+"""
+
+import re
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import ApiMetrics, Counter, Histogram
+from test_batch_predictions import make_patients
+
+
+def sample(text, name, labels=""):
+    """Return the value of one exposition line, or None if it is missing"""
+    pattern = rf"^{re.escape(name)}{re.escape('{' + labels + '}') if labels else ''} (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_sharded_histogram_counts_every_thread():
+    """Observations from many threads all land in the merged snapshot"""
+    histogram = Histogram([1, 10])
+    counter = Counter()
+
+    def work():
+        for value in range(20):
+            histogram.observe(value)
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == counter.value == 160
+    assert snapshot["buckets"] == {1: 16, 10: 88, "+Inf": 160}
+    assert snapshot["sum"] == 8 * sum(range(20))
+
+
+def test_render_outside_request_uses_background_label():
+    """Stages recorded off a request are attributed to the background endpoint"""
+    metrics = ApiMetrics(endpoints=("/predict",), stages=("kernel",))
+    metrics.observe_stage("kernel", 2e-6)
+    metrics.count_rows("abc", 3)
+
+    text = metrics.render("abc")
+
+    assert sample(text, "endometriosis_stage_duration_seconds_count",
+                  'endpoint="background",stage="kernel"') == 1
+    assert sample(text, "endometriosis_rows_scored_total", 'version="abc"') == 3
+    assert sample(text, "endometriosis_model_info", 'version="abc"') == 1
+
+
+def test_reset_forgets_recorded_values():
+    """reset() zeroes histograms and counters recorded by any thread"""
+    metrics = ApiMetrics(endpoints=("/predict",), stages=("kernel",))
+    metrics.observe_stage("kernel", 2e-6)
+    metrics.count_rows("abc", 3)
+    metrics.count_response("/predict", 200)
+    thread = threading.Thread(target=metrics.observe_batch, args=(5,))
+    thread.start()
+    thread.join()
+
+    metrics.reset()
+    text = metrics.render("abc")
+
+    assert sample(text, "endometriosis_stage_duration_seconds_count",
+                  'endpoint="background",stage="kernel"') is None
+    assert sample(text, "endometriosis_rows_scored_total", 'version="abc"') is None
+    assert sample(text, "endometriosis_responses_total", 'endpoint="/predict",status="200"') is None
+    assert metrics.batch_rows["background"].snapshot()["count"] == 0
+
+
+def test_metrics_endpoint_reports_requests_and_stages():
+    """Requests show up as latency, stage, status and row series"""
+    client = TestClient(main.app)
+    patients = [p.model_dump() for p in make_patients(4, seed=31)]
+    before = client.get("/metrics").text
+    version = main.model_manager.model_version
+
+    assert client.post("/predict", json=patients[0]).status_code == 200
+    assert client.post("/predict_batch", json={"patients": patients}).status_code == 200
+    assert client.post("/predict", json={"age": 30}).status_code == 422
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    def grew(name, labels, by):
+        old = sample(before, name, labels) or 0
+        return sample(text, name, labels) - old == by
+
+    assert grew("endometriosis_request_duration_seconds_count", 'endpoint="/predict"', 2)
+    assert grew("endometriosis_responses_total", 'endpoint="/predict",status="200"', 1)
+    assert grew("endometriosis_responses_total", 'endpoint="/predict",status="422"', 1)
+    assert grew("endometriosis_stage_duration_seconds_count", 'endpoint="/predict",stage="validate"', 1)
+    assert grew("endometriosis_stage_duration_seconds_count", 'endpoint="/predict_batch",stage="serialize"', 1)
+    assert grew("endometriosis_batch_rows_count", 'endpoint="/predict_batch"', 1)
+    assert sample(text, "endometriosis_stage_duration_seconds_count",
+                  'endpoint="/predict_batch",stage="features"') >= 1
+    assert sample(text, "endometriosis_requests_in_flight", 'endpoint="/predict"') == 0
+    assert sample(text, "endometriosis_model_info", f'version="{version}"') == 1
+    assert sample(text, "endometriosis_rows_scored_total", f'version="{version}"') >= 4
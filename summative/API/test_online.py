@@ -0,0 +1,176 @@
+"""
+Tests for online learning from confirmed outcomes
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import ModelManager
+from online import CHECKPOINT_FILE, OnlineLearner
+from test_batch_predictions import make_patients
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(API_DIR, 'models')
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A private copy of the model pickles that checkpoints can be written next to"""
+    target = tmp_path / "models"
+    shutil.copytree(MODEL_DIR, target, ignore=shutil.ignore_patterns('model_bundle.npy'))
+    return str(target)
+
+
+def learner_for(manager, **options):
+    """An OnlineLearner wired to a manager, without its background thread"""
+    return OnlineLearner(lambda: manager.active, manager.publish_online, lambda: manager.model_dir, **options)
+
+
+def outcomes(manager, rows, seed, target_fn):
+    """Raw feature rows and targets computed from each row's feature dict"""
+    patients = make_patients(rows, seed=seed)
+    raw = manager.feature_matrix(patients)
+    features = dict(zip(manager.features, raw.T))
+    return raw, target_fn(features)
+
+
+def pain_diagnosis(features):
+    """A relationship the shipped model doesn't know: high pain means a diagnosis"""
+    return (features['Chronic_Pain_Level'] > 5).astype(float)
+
+
+def test_update_publishes_a_better_model(model_dir):
+    """Outcomes are learned on a copy and swapped in as a new version"""
+    manager = ModelManager(model_dir=model_dir, cache_size=16)
+    learner = learner_for(manager, batch_size=32)
+    base = manager.active
+    patient = make_patients(1, seed=5)[0]
+    manager.predict(patient)
+
+    raw, targets = outcomes(manager, 400, seed=1, target_fn=pain_diagnosis)
+    assert learner.submit(raw, targets) == {"accepted": 400, "held_out": 80, "pending": 320}
+
+    result = learner.update()
+
+    assert result["status"] == "published"
+    assert result["holdout_mse_after"] < result["holdout_mse_before"]
+    assert manager.model_version == result["model_version"] != base.version
+    assert manager.active.origin_version == base.version
+    assert manager.kernel is not None
+    assert manager.cache.stats()["size"] == 0
+    assert base.model.coef_.tolist() != manager.model.coef_.tolist()
+    assert learner.stats()["trained"] == 320
+    assert learner.update()["status"] == "waiting"
+
+
+def test_update_that_worsens_holdout_is_rejected(model_dir):
+    """Training rows that contradict the held-out outcomes never reach the served model"""
+    manager = ModelManager(model_dir=model_dir)
+    learner = learner_for(manager, batch_size=32)
+    version = manager.model_version
+
+    raw, _ = outcomes(manager, 400, seed=2, target_fn=pain_diagnosis)
+    served = np.clip(manager.score_matrix(raw), 0.0, 1.0)
+    # Every fifth row (the held-out ones) agrees with the served model; the rest don't
+    targets = np.where(np.arange(1, 401) % 5 == 0, served, 1.0 - np.round(served))
+    learner.submit(raw, targets)
+
+    result = learner.update()
+
+    assert result["status"] == "rejected"
+    assert result["holdout_mse_after"] > result["holdout_mse_before"]
+    assert manager.model_version == version
+    assert learner.stats()["rejected_rows"] == 320
+
+
+def test_update_waits_for_enough_held_out_outcomes(model_dir):
+    """Without a held-out set to check against, nothing is applied"""
+    manager = ModelManager(model_dir=model_dir)
+    learner = learner_for(manager, min_holdout=20)
+    raw, targets = outcomes(manager, 50, seed=3, target_fn=pain_diagnosis)
+    learner.submit(raw, targets)
+
+    assert learner.update()["status"] == "waiting"
+    assert learner.stats()["pending"] == 40
+
+
+def test_stale_update_is_not_published(model_dir):
+    """An update trained on a model that was replaced meanwhile is discarded"""
+    manager = ModelManager(model_dir=model_dir)
+    base = manager.active
+    manager.kernel = None
+
+    assert manager.publish_online(base, base.model, "feedfeedfeed") is None
+    assert manager.model_version == base.version
+
+
+def test_checkpoint_is_restored_on_restart(model_dir):
+    """A restart on the same artifacts resumes from the online checkpoint"""
+    manager = ModelManager(model_dir=model_dir)
+    learner = learner_for(manager)
+    raw, targets = outcomes(manager, 400, seed=4, target_fn=pain_diagnosis)
+    learner.submit(raw, targets)
+    version = learner.update()["model_version"]
+
+    assert learner.checkpoint()
+    assert not learner.checkpoint()
+    assert os.path.exists(os.path.join(model_dir, CHECKPOINT_FILE))
+
+    restarted = ModelManager(model_dir=model_dir)
+    assert learner_for(restarted).restore()
+    assert restarted.model_version == version
+    assert restarted.reload()["status"] == "unchanged"
+
+
+def test_api_restores_checkpoint_at_import(model_dir):
+    """Importing main with ONLINE_LEARNING=1 serves the checkpointed model"""
+    manager = ModelManager(model_dir=model_dir)
+    learner = learner_for(manager)
+    raw, targets = outcomes(manager, 400, seed=5, target_fn=pain_diagnosis)
+    learner.submit(raw, targets)
+    version = learner.update()["model_version"]
+    assert learner.checkpoint()
+
+    script = (
+        "import json\n"
+        "from fastapi.testclient import TestClient\n"
+        "import main\n"
+        "print(json.dumps(TestClient(main.app).get('/model-info').json()))\n"
+    )
+    env = {**os.environ, "ONLINE_LEARNING": "1", "PYTHONPATH": API_DIR}
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(model_dir), env=env,
+                            capture_output=True, text=True, check=True)
+    info = json.loads(result.stdout.strip().splitlines()[-1])
+    assert info["model_loaded"] is True
+    assert info["model_version"] == version
+    assert info["online_learning"] is not None
+
+
+def test_feedback_endpoint(model_dir, monkeypatch):
+    """Outcomes are accepted with the admin token once online learning is on"""
+    manager = ModelManager(model_dir=model_dir)
+    monkeypatch.setattr(main, 'model_manager', manager)
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+    client = TestClient(main.app)
+    headers = {"Authorization": "Bearer secret"}
+    outcome = {**make_patients(1, seed=6)[0].model_dump(), "diagnosis": 1}
+
+    assert client.post("/feedback", json={"outcomes": [outcome]}, headers=headers).status_code == 404
+
+    manager.learner = learner_for(manager)
+    assert client.post("/feedback", json={"outcomes": [outcome]}).status_code == 401
+    assert client.post("/feedback", json={"outcomes": [{**outcome, "diagnosis": 2}]},
+                       headers=headers).status_code == 422
+
+    response = client.post("/feedback", json={"outcomes": [outcome] * 5}, headers=headers)
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 5, "held_out": 1, "pending": 4, "model_version": manager.model_version}
+    assert client.get("/model-info").json()["online_learning"]["received"] == 5
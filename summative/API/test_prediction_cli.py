@@ -0,0 +1,86 @@
+"""
+Tests for chunked, multi-process CSV scoring in prediction.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction import PredictionEngine, score_file
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+def make_frame(n, seed=0):
+    """Build n random patients with an extra id column"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'patient_id': np.arange(n),
+        'Age': rng.integers(18, 101, n),
+        'Menstrual_Irregularity': rng.integers(0, 2, n),
+        'Chronic_Pain_Level': np.round(rng.uniform(0, 10, n), 1),
+        'Hormone_Level_Abnormality': rng.integers(0, 2, n),
+        'Infertility': rng.integers(0, 2, n),
+        'BMI': np.round(rng.uniform(10, 60, n), 1),
+    })
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_chunked_csv_matches_whole_frame(tmp_path, workers):
+    """Chunked scoring keeps input order and equals scoring the whole frame"""
+    data = make_frame(1000)
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    data.to_csv(input_path, index=False)
+
+    stats = score_file(str(input_path), str(output_path), model_dir=MODEL_DIR,
+                       chunk_size=128, workers=workers)
+    assert stats['rows'] == 1000
+
+    result = pd.read_csv(output_path)
+    expected = PredictionEngine(model_dir=MODEL_DIR, verbose=False).predict(data)
+    assert list(result.columns) == list(data.columns) + ['predictions']
+    assert result['patient_id'].tolist() == list(range(1000))
+    np.testing.assert_allclose(result['predictions'], expected)
+
+
+def test_parquet_output(tmp_path):
+    """Parquet output is chosen from the file extension"""
+    pytest.importorskip("pyarrow")
+    data = make_frame(300, seed=1)
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.parquet"
+    data.to_csv(input_path, index=False)
+
+    score_file(str(input_path), str(output_path), model_dir=MODEL_DIR, chunk_size=100, workers=1)
+
+    result = pd.read_parquet(output_path)
+    expected = PredictionEngine(model_dir=MODEL_DIR, verbose=False).predict(data)
+    np.testing.assert_allclose(result['predictions'], expected)
+
+
+def test_preprocess_does_not_modify_input():
+    """Preprocessing only works on the feature projection, not the caller's frame"""
+    data = make_frame(5)
+    before = data.copy()
+    PredictionEngine(model_dir=MODEL_DIR, verbose=False).preprocess_input(data)
+    pd.testing.assert_frame_equal(data, before)
+
+
+def test_float32_engine_stays_within_tolerance(tmp_path):
+    """float32 file scoring uses the converted kernel and stays within the checked drift"""
+    data = make_frame(500, seed=2)
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    data.to_csv(input_path, index=False)
+
+    engine = PredictionEngine(model_dir=MODEL_DIR, verbose=False, dtype='float32')
+    assert engine.kernel.dtype == np.float32
+    assert engine.precision_drift <= 1e-5
+
+    score_file(str(input_path), str(output_path), model_dir=MODEL_DIR, chunk_size=100, workers=1, dtype='float32')
+
+    expected = PredictionEngine(model_dir=MODEL_DIR, verbose=False).predict(data)
+    np.testing.assert_allclose(pd.read_csv(output_path)['predictions'], expected, rtol=0, atol=1e-5)
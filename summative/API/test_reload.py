@@ -0,0 +1,139 @@
+"""
+Tests for hot model reload and the model directory watcher
+"""
+
+import os
+import shutil
+import time
+
+import joblib
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import ModelManager, ModelReloadError
+from test_batch_predictions import make_patients
+from watcher import ArtifactWatcher
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A private copy of the model pickles that tests can overwrite"""
+    target = tmp_path / "models"
+    shutil.copytree(MODEL_DIR, target, ignore=shutil.ignore_patterns('model_bundle.npy'))
+    return str(target)
+
+
+def shift_scaler(model_dir, offset=1.0):
+    """Write a new scaler so the artifacts get a new version and new predictions"""
+    path = os.path.join(model_dir, 'scaler.pkl')
+    scaler = joblib.load(path)
+    scaler.mean_ = scaler.mean_ + offset
+    joblib.dump(scaler, path)
+
+
+def test_reload_swaps_in_new_version(model_dir):
+    """A changed artifact set is loaded, smoke tested and published"""
+    manager = ModelManager(model_dir=model_dir, cache_size=64)
+    patient = make_patients(1, seed=21)[0]
+    old_version = manager.model_version
+    old_prediction, _ = manager.predict(patient)
+
+    assert manager.reload()["status"] == "unchanged"
+
+    shift_scaler(model_dir)
+    result = manager.reload()
+
+    assert result["status"] == "reloaded"
+    assert result["previous_version"] == old_version
+    assert result["model_version"] == manager.model_version != old_version
+    assert manager.predict(patient)[0] != old_prediction
+    assert manager.cache.stats()["size"] == 1
+
+
+def test_failed_reload_keeps_serving_old_version(model_dir):
+    """Artifacts that fail the smoke test are never published"""
+    manager = ModelManager(model_dir=model_dir)
+    version = manager.model_version
+    joblib.dump(['Age', 'BMI'], os.path.join(model_dir, 'features.pkl'))
+
+    with pytest.raises(ModelReloadError, match="don't match the API inputs"):
+        manager.reload()
+
+    assert manager.model_version == version
+    manager.predict(make_patients(1)[0])
+
+
+def test_pinned_requests_finish_on_old_version(model_dir):
+    """A request pinned before a reload keeps scoring with its own version"""
+    manager = ModelManager(model_dir=model_dir)
+    patients = make_patients(5, seed=22)
+    old_predictions = manager.predict_batch(patients)[0]
+
+    with manager.pinned() as state:
+        shift_scaler(model_dir)
+        manager.reload()
+        assert manager.model_version == state.version
+        assert (manager.predict_batch(patients)[0] == old_predictions).all()
+        assert abs(manager.predict(patients[0])[0] - old_predictions[0]) < 1e-12
+
+    assert manager.model_version != state.version
+    assert (manager.predict_batch(patients)[0] != old_predictions).any()
+
+
+def test_admin_reload_endpoint(model_dir, monkeypatch):
+    """The reload endpoint is token guarded and reports versions everywhere"""
+    manager = ModelManager(model_dir=model_dir)
+    monkeypatch.setattr(main, 'model_manager', manager)
+    client = TestClient(main.app)
+    patient = make_patients(1, seed=23)[0].model_dump()
+
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', '')
+    assert client.post("/admin/reload").status_code == 404
+
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+    assert client.post("/admin/reload", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    old_version = manager.model_version
+    assert client.post("/predict", json=patient).headers["X-Model-Version"] == old_version
+
+    shift_scaler(model_dir)
+    response = client.post("/admin/reload", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "reloaded"
+    assert body["previous_version"] == old_version
+
+    new_version = body["model_version"]
+    assert client.get("/health").json()["model_version"] == new_version
+    assert client.post("/predict", json=patient).headers["X-Model-Version"] == new_version
+    batch = client.post("/predict_batch", json={"patients": [patient]})
+    assert batch.headers["X-Model-Version"] == new_version
+    stream = client.post("/predict_stream", content=make_patients(1, seed=23)[0].model_dump_json())
+    assert stream.headers["X-Model-Version"] == new_version
+
+
+def test_watcher_fires_once_files_settle(tmp_path):
+    """A change is reported once, after the files stop changing"""
+    path = tmp_path / "scaler.pkl"
+    path.write_bytes(b"v1")
+    fired = []
+
+    watcher = ArtifactWatcher(lambda: str(tmp_path), ["scaler.pkl", "missing.pkl"],
+                              lambda: fired.append(path.read_bytes()), interval=0.02)
+    watcher.start()
+    try:
+        time.sleep(0.1)
+        assert fired == []
+        path.write_bytes(b"version 2")
+
+        deadline = time.monotonic() + 5
+        while not fired and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+    finally:
+        watcher.stop()
+
+    assert fired == [b"version 2"]
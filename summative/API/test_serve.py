@@ -0,0 +1,94 @@
+"""
+Tests for the pre-fork multi-worker server
+"""
+
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main
+from serve import asgi_request, warm_up, worker_memory
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_warm_up_leaves_cache_counters_alone():
+    """Warmup scores through the app but doesn't count as cache traffic"""
+    before = main.model_manager.cache.stats()
+    warm_up(main.app, main.model_manager, rounds=11)
+    after = main.model_manager.cache.stats()
+
+    assert (after["hits"], after["misses"]) == (before["hits"], before["misses"])
+    assert asgi_request(main.app, "GET", "/health") == 200
+
+
+def test_warm_up_leaves_no_metrics_behind():
+    """Request, stage, row and admission metrics are zero after warmup"""
+    warm_up(main.app, main.model_manager, rounds=11)
+
+    assert all(h.snapshot()["count"] == 0 for h in main.METRICS.request_seconds.values())
+    assert all(h.snapshot()["count"] == 0 for stages in main.METRICS.stage_seconds.values()
+               for h in stages.values())
+    assert main.METRICS.rows_scored == {}
+    assert main.INFERENCE.stats()["queue_wait"]["count"] == 0
+
+
+def test_worker_memory_reads_proc():
+    """The memory breakdown is consistent where /proc is available"""
+    memory = worker_memory(os.getpid())
+    if memory is None:
+        pytest.skip("/proc/<pid>/smaps_rollup is not available")
+    assert 0 < memory["pss_mb"] <= memory["rss_mb"]
+    assert memory["private_mb"] <= memory["rss_mb"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork mode needs fork()")
+def test_prefork_workers_serve_and_stop_cleanly():
+    """Two workers serve from the shared socket and exit on SIGTERM"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "2", "--host", "127.0.0.1",
+         "--port", str(port), "--warmup", "2", "--log-level", "warning"],
+        cwd=API_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                connection.request("GET", "/health")
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.2)
+        assert response.status == 200
+        assert b'"model_loaded":true' in body
+
+        # Warmup requests must not show up in a fresh worker's metrics
+        connection.request("GET", "/metrics")
+        metrics = connection.getresponse().read().decode()
+        assert 'endometriosis_request_duration_seconds_count{endpoint="/predict"} 0' in metrics
+        assert 'endometriosis_request_duration_seconds_count{endpoint="/predict_batch"} 0' in metrics
+        assert "endometriosis_rows_scored_total{" not in metrics
+        assert "endometriosis_stage_duration_seconds_count{" not in metrics
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output, _ = server.communicate(timeout=30)
+
+    assert server.returncode == 0
+    assert "2/2 workers warmed up" in output
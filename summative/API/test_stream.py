@@ -0,0 +1,77 @@
+"""
+Tests for the streaming NDJSON prediction endpoint
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+from test_batch_predictions import make_patients
+
+client = TestClient(main.app)
+
+
+def test_stream_matches_batch_and_reports_bad_lines(monkeypatch):
+    """Streamed results equal /predict_batch and invalid lines are reported inline"""
+    monkeypatch.setattr(main, 'STREAM_CHUNK_SIZE', 7)
+    patients = make_patients(20, seed=4)
+
+    lines = [patient.model_dump_json() for patient in patients]
+    lines.insert(5, '{"age": 12, "menstrual_irregularity": 1}')
+    lines.insert(9, 'not json')
+    body = "\n".join(lines) + "\n\n"
+
+    response = client.post(
+        "/predict_stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["patient_id"] for r in results] == list(range(1, 23))
+
+    errors = [r for r in results if r["status"] == "error"]
+    assert [r["patient_id"] for r in errors] == [6, 10]
+    assert "age: Input should be greater than or equal to 18" in errors[0]["error"]
+
+    batch = client.post("/predict_batch", json={"patients": [p.model_dump() for p in patients]}).json()
+    streamed = [r for r in results if r["status"] == "success"]
+    assert [r["prediction"] for r in streamed] == [p["prediction"] for p in batch["predictions"]]
+    assert [r["confidence"] for r in streamed] == [p["confidence"] for p in batch["predictions"]]
+
+
+def test_stream_empty_body():
+    """An empty body produces an empty stream"""
+    response = client.post("/predict_stream", content=b"")
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_oversized_line_is_reported_not_buffered(monkeypatch):
+    """A line over the length cap becomes an inline error and later lines still score"""
+    monkeypatch.setattr(main, 'STREAM_MAX_LINE_BYTES', 256)
+    patient = make_patients(1, seed=5)[0].model_dump_json()
+    body = patient + "\n" + ("x" * 5000) + "\n" + patient + "\n"
+
+    response = client.post("/predict_stream", content=body)
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [r["status"] for r in results] == ["success", "error", "success"]
+    assert "maximum length" in results[1]["error"]
+
+
+def test_iter_lines_handles_split_chunks():
+    """Lines split across chunks are reassembled; over-long ones yield None"""
+    import asyncio
+
+    async def chunks():
+        for part in [b"ab", b"c\nde", b"f\n", b"0123456789", b"0123\nlast"]:
+            yield part
+
+    async def collect():
+        return [line async for line in main.iter_lines(chunks(), max_line_bytes=8)]
+
+    assert asyncio.run(collect()) == [b"abc", b"def", None, b"last"]
@@ -0,0 +1,73 @@
+"""
+Model directory watcher for the Endometriosis Prediction API.
+
+Polls the model artifact files and calls back once they have changed and
+then stayed the same for a full interval, so a reload never picks up a
+half-copied set of files.
+"""
+
+import os
+import threading
+
+
+class ArtifactWatcher:
+    """Poll a set of files and report settled changes on a daemon thread."""
+
+    def __init__(self, directory_fn, filenames: list, on_change, interval: float = 5.0):
+        """
+        Args:
+            directory_fn: Callable returning the directory to watch (it may change after a reload)
+            filenames: Files to watch inside the directory
+            on_change: Called with no arguments after the files changed and settled
+            interval: Seconds between polls
+        """
+        self.directory_fn = directory_fn
+        self.filenames = list(filenames)
+        self.on_change = on_change
+        self.interval = interval
+        self.changes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def signature(self) -> tuple:
+        """Return (name, mtime_ns, size) for every watched file, None for missing files."""
+        directory = self.directory_fn()
+        entries = []
+        for filename in self.filenames:
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except OSError:
+                entries.append((filename, None))
+            else:
+                entries.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def start(self):
+        """Start polling in the background."""
+        self._thread = threading.Thread(target=self._run, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        """Poll until stopped; fire on_change once a new signature is seen twice in a row."""
+        seen = self.signature()
+        pending = None
+        while not self._stop.wait(self.interval):
+            current = self.signature()
+            if current == seen:
+                pending = None
+            elif current != pending:
+                # Changed since the last poll: wait for writers to finish
+                pending = current
+            else:
+                seen, pending = current, None
+                self.changes += 1
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"⚠ Warning: Model watcher callback failed: {e}")
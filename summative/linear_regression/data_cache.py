@@ -0,0 +1,230 @@
+"""
+Content-addressed local cache for the training data.
+
+Three kinds of entries are kept under one cache directory:
+
+- raw/<sha256>.csv: copies of dataset files, named by their content hash,
+  plus sources.json recording which hash each source (e.g. the Kaggle
+  dataset id) last resolved to, so training works offline once warmed.
+- processed/<key>/: the train/test arrays as .npy files (loaded memory-
+  mapped), the fitted scaler and encoders, and meta.json. The key hashes
+  the dataset hash together with the preprocessing config, so a changed
+  file or a changed config simply misses and is rebuilt.
+- results/<key>.json: small computed results, such as the metrics of one
+  cross-validation fold, keyed by whatever produced them.
+
+Entries are written to a temporary name and renamed into place, so an
+interrupted run never leaves a half-written entry behind.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "endometriosis-training"
+)
+
+# Bytes read at a time when hashing a file
+HASH_CHUNK = 1 << 20
+
+
+def config_key(dataset_hash: str, config: dict) -> str:
+    """
+    Key for a processed entry.
+
+    Args:
+        dataset_hash: SHA-256 of the raw dataset file
+        config: JSON-serializable preprocessing settings
+
+    Returns:
+        str: 16 hex characters
+    """
+    payload = json.dumps({"dataset": dataset_hash, "config": config}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class DataCache:
+    """Raw dataset copies and preprocessed arrays, addressed by content."""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        """
+        Args:
+            root: Cache directory (created on first write)
+        """
+        self.root = root
+        self.raw_dir = os.path.join(root, "raw")
+        self.processed_dir = os.path.join(root, "processed")
+        self.results_dir = os.path.join(root, "results")
+
+    def file_hash(self, path: str) -> str:
+        """
+        SHA-256 of a file, remembered by (path, size, mtime) so unchanged files aren't re-read.
+
+        Args:
+            path: File to hash
+
+        Returns:
+            str: Hex digest
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        index = self._read_json("hashes.json")
+        known = index.get(path)
+        if known is not None and known[:2] == signature:
+            return known[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        index[path] = signature + [digest.hexdigest()]
+        self._write_json("hashes.json", index)
+        return digest.hexdigest()
+
+    def store_raw(self, path: str, source: str = None) -> tuple:
+        """
+        Copy a dataset file into the cache (once per content) and remember its source.
+
+        Args:
+            path: Dataset file
+            source: Name the file was fetched under, for offline lookups
+
+        Returns:
+            tuple: (sha256, path of the cached copy)
+        """
+        sha = self.file_hash(path)
+        cached = os.path.join(self.raw_dir, f"{sha}{os.path.splitext(path)[1]}")
+        if not os.path.exists(cached):
+            os.makedirs(self.raw_dir, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, cached)
+
+        if source is not None:
+            sources = self._read_json("sources.json")
+            if sources.get(source) != os.path.basename(cached):
+                sources[source] = os.path.basename(cached)
+                self._write_json("sources.json", sources)
+        return sha, cached
+
+    def raw_for_source(self, source: str):
+        """
+        Cached copy of the file a source last resolved to.
+
+        Args:
+            source: Name passed to store_raw
+
+        Returns:
+            str: Path of the cached file, or None if the source was never stored
+        """
+        name = self._read_json("sources.json").get(source)
+        if name is None:
+            return None
+        path = os.path.join(self.raw_dir, name)
+        return path if os.path.exists(path) else None
+
+    def load(self, key: str):
+        """
+        Load a processed entry.
+
+        Args:
+            key: config_key of the entry
+
+        Returns:
+            dict: "arrays" (read-only memory maps), "objects" (unpickled) and "meta",
+            or None if the entry doesn't exist
+        """
+        directory = os.path.join(self.processed_dir, key)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                  for name in meta["arrays"]}
+        objects = {name: joblib.load(os.path.join(directory, f"{name}.pkl"))
+                   for name in meta["objects"]}
+        return {"arrays": arrays, "objects": objects, "meta": meta}
+
+    def save(self, key: str, arrays: dict, objects: dict, meta: dict) -> str:
+        """
+        Write a processed entry, replacing nothing if another run wrote it first.
+
+        Args:
+            key: config_key of the entry
+            arrays: {name: np.ndarray} stored as .npy
+            objects: {name: object} stored with joblib
+            meta: JSON-serializable details (array and object names are added)
+
+        Returns:
+            str: Entry directory
+        """
+        os.makedirs(self.processed_dir, exist_ok=True)
+        directory = os.path.join(self.processed_dir, key)
+        tmp = tempfile.mkdtemp(prefix=f"{key}.", dir=self.processed_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+            for name, value in objects.items():
+                joblib.dump(value, os.path.join(tmp, f"{name}.pkl"))
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump({**meta, "arrays": list(arrays), "objects": list(objects)}, f, indent=2)
+            os.rename(tmp, directory)
+        except OSError:
+            # Another run published the same key first; its content is identical
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+        return directory
+
+    def load_result(self, key: str):
+        """
+        Read a stored result.
+
+        Args:
+            key: Key the result was saved under
+
+        Returns:
+            dict: The result, or None if it was never saved
+        """
+        try:
+            with open(os.path.join(self.results_dir, f"{key}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_result(self, key: str, result: dict):
+        """
+        Store a JSON-serializable result under a key.
+
+        Args:
+            key: Content hash of whatever produced the result
+            result: Result to store
+        """
+        self._write_json(os.path.join("results", f"{key}.json"), result)
+
+    def _read_json(self, name: str) -> dict:
+        """Read one of the cache's index files, empty if missing or unreadable."""
+        try:
+            with open(os.path.join(self.root, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, name: str, data: dict):
+        """Replace one of the cache's JSON files atomically."""
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
@@ -0,0 +1,323 @@
+"""
+Cross-validated model selection for the endometriosis regression models.
+
+The notebook (and train.py) picks the best model from a single 80/20
+split. With test R² this low, that comparison is mostly noise. This
+harness runs k-fold cross-validation for every candidate instead. The
+(candidate, fold) fits run in a process pool, and the StandardScaler is
+fitted on each fold's training rows only. Every fold's metrics are
+cached by a hash of the estimator's configuration, the processed data
+and the fold layout, so re-running after adding a candidate (or
+changing one's hyperparameters) only fits the new folds.
+
+Every candidate is then refitted on the notebook's 80/20 split and
+benchmarked for serving cost. train.select_model picks one by mean
+cross-validated R² under the cost policy (see serving_cost.py), and it is
+saved with the usual artifact set. model_summary.txt also carries the
+cost table and the cross-validation table (each candidate's mean ±
+standard deviation across folds).
+
+Usage:
+    python evaluate.py [--data PATH] [--output models] [--folds K] [--jobs N]
+                       [--candidates NAME ...] [--cache-dir DIR | --no-cache] [--offline]
+                       [--latency-slo-ms MS] [--batch-slo-ms MS] [--max-model-mb MB]
+                       [--r2-tolerance R2] [--allow-slo-breach]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+
+from data_cache import DEFAULT_CACHE_DIR, DataCache
+from serving_cost import CostPolicy, NoEligibleModel, add_policy_arguments, cost_table, policy_from_args
+from train import (CANDIDATES, DEFAULT_OUTPUT, RANDOM_STATE, build_model, fit_candidates, fit_model,
+                   preprocess, resolve_dataset, select_model, split_and_scale, write_artifacts)
+
+DEFAULT_FOLDS = 5
+
+# Estimator parameters that change how fast a fit runs but not its result
+EXECUTION_PARAMS = ("n_jobs", "verbose")
+
+
+def model_config(estimator) -> dict:
+    """
+    The estimator's class and hyperparameters, as hashed into fold keys.
+
+    Args:
+        estimator: Unfitted sklearn estimator
+
+    Returns:
+        dict: class (qualified name) and params (JSON-safe, EXECUTION_PARAMS left out)
+    """
+    params = {name: value for name, value in estimator.get_params(deep=False).items()
+              if name not in EXECUTION_PARAMS}
+    return {
+        "class": f"{type(estimator).__module__}.{type(estimator).__qualname__}",
+        "params": json.loads(json.dumps(params, sort_keys=True, default=repr)),
+    }
+
+
+def data_digest(X: np.ndarray, y: np.ndarray) -> str:
+    """SHA-256 of the processed feature matrix and targets."""
+    digest = hashlib.sha256()
+    for array in (X, y):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def fold_key(config: dict, digest: str, n_splits: int, fold: int) -> str:
+    """
+    Cache key of one fold's metrics.
+
+    Args:
+        config: model_config of the candidate
+        digest: data_digest of the data
+        n_splits: Number of folds
+        fold: Fold index
+
+    Returns:
+        str: 16 hex characters
+    """
+    payload = json.dumps({"config": config, "data": digest, "folds": n_splits, "fold": fold,
+                          "shuffle_seed": RANDOM_STATE}, sort_keys=True)
+    return "cv-" + hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def fit_fold(estimator, X: np.ndarray, y: np.ndarray, train_rows: np.ndarray, test_rows: np.ndarray) -> dict:
+    """
+    Scale, fit and score one fold (runs in a pool worker).
+
+    The estimator is trained as train.py trains it (train.fit_model).
+
+    Args:
+        estimator: Unfitted estimator (cloned before fitting)
+        X, y: Processed, unscaled data
+        train_rows, test_rows: Row indices of the fold
+
+    Returns:
+        dict: Train/test R², MSE and MAE, and fit seconds
+    """
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train_rows])
+    X_test = scaler.transform(X[test_rows])
+    model = fit_model(clone(estimator), X_train, y[train_rows])
+
+    train_pred = model.predict(X_train)
+    test_pred = model.predict(X_test)
+    return {
+        "train_r2": r2_score(y[train_rows], train_pred),
+        "test_r2": r2_score(y[test_rows], test_pred),
+        "train_mse": mean_squared_error(y[train_rows], train_pred),
+        "test_mse": mean_squared_error(y[test_rows], test_pred),
+        "train_mae": mean_absolute_error(y[train_rows], train_pred),
+        "test_mae": mean_absolute_error(y[test_rows], test_pred),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def cross_validate(X: np.ndarray, y: np.ndarray, candidates: dict, n_splits: int = DEFAULT_FOLDS,
+                   jobs: int = None, cache: DataCache = None) -> dict:
+    """
+    K-fold cross-validation of every candidate, in parallel and cached per fold.
+
+    Folds missing from the cache are fitted in a process pool, slowest
+    candidates first. Every estimator is fitted single-threaded there, so
+    the pool's `jobs` processes share the cores.
+
+    Args:
+        X, y: Processed, unscaled data
+        candidates: {name: unfitted estimator}, in display order
+        n_splits: Number of folds (shuffled with RANDOM_STATE)
+        jobs: Processes to use (default: all cores)
+        cache: Cache for fold metrics (None computes everything)
+
+    Returns:
+        dict: {name: {"folds": [fold metrics], "mean": {...}, "std": {...},
+        "computed": folds fitted now, "cached": folds read from the cache}}
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    jobs = jobs or os.cpu_count() or 1
+    folds = list(KFold(n_splits=n_splits, shuffle=True, random_state=RANDOM_STATE).split(X))
+    digest = data_digest(X, y)
+
+    metrics = {name: [None] * n_splits for name in candidates}
+    pending = []
+    for name, estimator in candidates.items():
+        config = model_config(estimator)
+        for fold in range(n_splits):
+            key = fold_key(config, digest, n_splits, fold)
+            metrics[name][fold] = cache.load_result(key) if cache is not None else None
+            if metrics[name][fold] is None:
+                pending.append((name, fold, key))
+
+    estimators = {name: _single_threaded(estimator) for name, estimator in candidates.items()}
+    if jobs == 1 or len(pending) <= 1:
+        fitted = [fit_fold(estimators[name], X, y, *folds[fold]) for name, fold, _ in pending]
+    else:
+        # Ensembles take far longer than single models; start their folds first
+        order = sorted(range(len(pending)),
+                       key=lambda i: "n_estimators" not in estimators[pending[i][0]].get_params(deep=False))
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = {i: pool.submit(fit_fold, estimators[pending[i][0]], X, y, *folds[pending[i][1]])
+                       for i in order}
+            fitted = [futures[i].result() for i in range(len(pending))]
+
+    for (name, fold, key), result in zip(pending, fitted):
+        metrics[name][fold] = result
+        if cache is not None:
+            cache.save_result(key, result)
+
+    computed = {name: sum(1 for entry in pending if entry[0] == name) for name in candidates}
+    results = {}
+    for name, fold_metrics in metrics.items():
+        table = pd.DataFrame(fold_metrics)
+        results[name] = {
+            "folds": fold_metrics,
+            "mean": table.mean().to_dict(),
+            "std": table.std(ddof=1).fillna(0.0).to_dict(),
+            "computed": computed[name],
+            "cached": n_splits - computed[name],
+        }
+    return results
+
+
+def comparison_table(results: dict, n_splits: int) -> str:
+    """
+    Format the cross-validation results for model_summary.txt.
+
+    Args:
+        results: Output of cross_validate
+        n_splits: Number of folds
+
+    Returns:
+        str: Heading, one row per candidate (best first) and a note when the ranking is within noise
+    """
+    ranked = sorted(results, key=lambda name: results[name]["mean"]["test_r2"], reverse=True)
+    lines = [
+        "CROSS-VALIDATION",
+        "================",
+        f"{n_splits}-fold, shuffled with random_state={RANDOM_STATE}; mean ± std across folds",
+        "",
+        f"{'Model':<24} {'Test R²':>17} {'Test MSE':>17} {'Train R²':>9} {'Fit s':>7}",
+    ]
+    for name in ranked:
+        mean, std = results[name]["mean"], results[name]["std"]
+        lines.append(f"{name:<24} {mean['test_r2']:>8.4f} ± {std['test_r2']:<6.4f} "
+                     f"{mean['test_mse']:>8.4f} ± {std['test_mse']:<6.4f} "
+                     f"{mean['train_r2']:>9.4f} {mean['seconds']:>7.2f}")
+
+    if len(ranked) > 1:
+        best, runner_up = results[ranked[0]], results[ranked[1]]
+        if best["mean"]["test_r2"] - runner_up["mean"]["test_r2"] < best["std"]["test_r2"]:
+            lines += ["", f"Note: {ranked[0]} leads {ranked[1]} by less than one standard deviation; "
+                          "the ranking may be noise."]
+    return "\n".join(lines) + "\n"
+
+
+def evaluate(data: str = None, output_dir: str = DEFAULT_OUTPUT, candidates=CANDIDATES,
+             n_splits: int = DEFAULT_FOLDS, jobs: int = None, cache_dir: str = None,
+             offline: bool = False, policy: CostPolicy = None) -> dict:
+    """
+    Cross-validate the candidates, then refit, benchmark, select and save.
+
+    Args:
+        data: CSV file or directory (None downloads with kagglehub)
+        output_dir: Directory for the artifacts
+        candidates: Names from train.CANDIDATES
+        n_splits: Number of folds
+        jobs: Processes to use (default: all cores)
+        cache_dir: Cache for the dataset and fold metrics (None disables caching)
+        offline: Use the cached download instead of calling kagglehub
+        policy: Serving budgets and R² tolerance for selection (default: CostPolicy())
+
+    Returns:
+        dict: best (name), results (cross_validate output), table, selection
+        (the cost decision), refit (selected fit_candidate result on the
+        80/20 split), paths and seconds
+
+    Raises:
+        NoEligibleModel: If every candidate breaks a serving budget and breaches aren't allowed
+    """
+    start = time.perf_counter()
+    cache = DataCache(cache_dir) if cache_dir else None
+    processed, target_col, label_encoders = preprocess(pd.read_csv(resolve_dataset(data, cache, offline)))
+    X = processed.drop(columns=[target_col]).to_numpy(dtype=np.float64)
+    y = processed[target_col].to_numpy(dtype=np.float64)
+
+    results = cross_validate(X, y, {name: build_model(name) for name in candidates}, n_splits, jobs, cache)
+    table = comparison_table(results, n_splits)
+
+    split = split_and_scale(processed, target_col)
+    fitted = fit_candidates(split, jobs, names=list(results))
+    refit, selection = select_model(fitted, split["X_test"], policy,
+                                    r2={name: result["mean"]["test_r2"] for name, result in results.items()})
+    paths = write_artifacts(output_dir, refit, split, label_encoders, target_col, len(processed),
+                            sections=[cost_table(selection, r2_label="CV R²"), table], selection=selection)
+    return {"best": refit["name"], "results": results, "table": table, "selection": selection, "refit": refit,
+            "paths": paths, "seconds": time.perf_counter() - start}
+
+
+def _single_threaded(estimator):
+    """Copy of the estimator with n_jobs=1, if it has that parameter."""
+    if "n_jobs" in estimator.get_params(deep=False):
+        return clone(estimator).set_params(n_jobs=1)
+    return estimator
+
+
+def main(argv=None):
+    """
+    Cross-validate the candidates from the command line.
+
+    Usage:
+        python evaluate.py [--data PATH] [--output DIR] [--folds K] [--jobs N]
+                           [--candidates NAME ...] [--cache-dir DIR | --no-cache] [--offline]
+                           [--latency-slo-ms MS] [--batch-slo-ms MS] [--max-model-mb MB]
+                           [--r2-tolerance R2] [--allow-slo-breach]
+    """
+    parser = argparse.ArgumentParser(description="Cross-validate and select the endometriosis models")
+    parser.add_argument('--data', default=None,
+                        help="Dataset CSV or directory (default: download with kagglehub)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory for the model artifacts")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help="Number of folds")
+    parser.add_argument('--jobs', type=int, default=None, help="Processes to use (default: CPU count)")
+    parser.add_argument('--candidates', nargs='+', choices=CANDIDATES, default=list(CANDIDATES),
+                        metavar='NAME', help="Candidates to compare (default: all)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Cache for the dataset and fold metrics (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every fold")
+    parser.add_argument('--offline', action='store_true',
+                        help="Use the cached download instead of calling kagglehub")
+    add_policy_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        run = evaluate(args.data, args.output, args.candidates, args.folds, args.jobs,
+                       None if args.no_cache else args.cache_dir, args.offline, policy_from_args(args))
+    except NoEligibleModel as e:
+        raise SystemExit(f"{e}. Relax the budgets, or pass --allow-slo-breach to ship anyway.")
+
+    print(run["table"])
+    print(cost_table(run["selection"], r2_label="CV R²"))
+    computed = sum(result["computed"] for result in run["results"].values())
+    cached = sum(result["cached"] for result in run["results"].values())
+    print(f"✓ Selected model: {run['best']} (mean test R² {run['results'][run['best']]['mean']['test_r2']:.4f})")
+    print(f"✓ Artifacts written to {os.path.dirname(run['paths']['model']) or '.'}")
+    print(f"ℹ {computed} fold(s) fitted, {cached} read from the cache; {run['seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
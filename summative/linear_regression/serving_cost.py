@@ -0,0 +1,317 @@
+"""
+Serving-cost benchmarks and cost-aware model selection.
+
+Picking the model with the highest test R² alone can promote a 100-tree
+forest over the linear model for a negligible gain, and the forest costs
+far more to serve: milliseconds per row instead of microseconds, and
+megabytes of trees held by every API worker. Before selection, each
+fitted candidate is benchmarked:
+
+- single-row predict latency (p50/p99),
+- predict time for a 10k-row batch,
+- pickled size,
+- resident memory added by loading the pickle, measured in a fresh
+  interpreter as anonymous RSS (heap and arrays; shared library pages
+  are left out). Linux only; None elsewhere.
+
+A CostPolicy then applies the serving budgets (SLOs) and the
+accuracy-vs-cost trade-off. A candidate over any budget is excluded.
+Among the rest, the cheapest one within r2_tolerance of the best R² wins.
+If no candidate meets the budgets, selection fails unless the breach is
+explicitly allowed.
+"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+# Budget for single-row p99 predict latency; the 100-tree forest measures ~6.5 ms on one core
+DEFAULT_LATENCY_SLO_MS = 10.0
+
+# A cheaper model within this much test R² of the best one is preferred
+DEFAULT_R2_TOLERANCE = 0.01
+
+# Rows in the batch benchmark
+BATCH_ROWS = 10_000
+
+# Machine-readable record of the selection, written next to the artifacts
+MANIFEST_FILE = "model_selection.json"
+
+# Run in one fresh interpreter: import the models' modules, then load each
+# pickle in a forked child so every delta counts that model alone. RssAnon
+# leaves out library pages the child faults back in after the fork.
+_RSS_SCRIPT = """
+import importlib, io, os, sys
+import joblib, numpy
+
+def rss():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) * 1024
+
+paths, modules = sys.argv[1::2], sys.argv[2::2]
+for module in modules:
+    importlib.import_module(module)
+# Pay joblib's lazy imports once, before the children measure anything
+buffer = io.BytesIO()
+joblib.dump(numpy.zeros(1), buffer)
+buffer.seek(0)
+joblib.load(buffer)
+for path in paths:
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid == 0:
+        before = rss()
+        model = joblib.load(path)
+        print(rss() - before, flush=True)
+        os._exit(0)
+    os.waitpid(pid, 0)
+"""
+
+
+class NoEligibleModel(RuntimeError):
+    """Raised when every candidate breaks a serving budget and no breach was allowed."""
+
+
+def loaded_rss_bytes(models: list) -> list:
+    """
+    Anonymous resident memory added by loading each model's pickle in a fresh interpreter.
+
+    Args:
+        models: Fitted estimators
+
+    Returns:
+        list: Bytes per model, or None where /proc and fork aren't available
+    """
+    if not os.path.exists('/proc/self/status') or not hasattr(os, 'fork'):
+        return [None] * len(models)
+    with tempfile.TemporaryDirectory() as directory:
+        args = []
+        for i, model in enumerate(models):
+            path = os.path.join(directory, f'model{i}.pkl')
+            joblib.dump(model, path)
+            args += [path, type(model).__module__]
+        completed = subprocess.run([sys.executable, '-c', _RSS_SCRIPT, *args], capture_output=True, text=True)
+
+    deltas = completed.stdout.split()
+    if completed.returncode != 0 or len(deltas) != len(models):
+        return [None] * len(models)
+    return [max(int(delta), 0) for delta in deltas]
+
+
+def measure(model, X: np.ndarray, repeats: int = 200, batch_repeats: int = 5, rss: bool = True) -> dict:
+    """
+    Benchmark how expensive a fitted model is to serve.
+
+    Args:
+        model: Fitted estimator
+        X: Scaled rows to predict on (recycled up to BATCH_ROWS for the batch benchmark)
+        repeats: Single-row predictions timed
+        batch_repeats: Batch predictions timed (the median is reported)
+        rss: Also measure loaded memory in a subprocess (benchmarking several
+            models, pass False and use loaded_rss_bytes once for all of them)
+
+    Returns:
+        dict: single_row_p50_ms, single_row_p99_ms, batch_rows, batch_ms,
+        pickle_bytes and rss_bytes
+    """
+    X = np.asarray(X, dtype=np.float64)
+    batch = np.resize(X, (BATCH_ROWS, X.shape[1]))
+    model.predict(X[:1])
+
+    single = []
+    for i in range(repeats):
+        row = X[i % len(X)][None, :]
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+
+    batched = []
+    for _ in range(batch_repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        batched.append(time.perf_counter() - start)
+
+    return {
+        "single_row_p50_ms": float(np.percentile(single, 50) * 1e3),
+        "single_row_p99_ms": float(np.percentile(single, 99) * 1e3),
+        "batch_rows": BATCH_ROWS,
+        "batch_ms": float(np.median(batched) * 1e3),
+        "pickle_bytes": len(pickle.dumps(model)),
+        "rss_bytes": loaded_rss_bytes([model])[0] if rss else None,
+    }
+
+
+class CostPolicy:
+    """Serving budgets and the accuracy-vs-cost trade-off used to pick a model."""
+
+    def __init__(self, latency_slo_ms: float = DEFAULT_LATENCY_SLO_MS, batch_slo_ms: float = None,
+                 max_model_mb: float = None, r2_tolerance: float = DEFAULT_R2_TOLERANCE,
+                 allow_slo_breach: bool = False):
+        """
+        Args:
+            latency_slo_ms: Budget for single-row p99 latency (None: no budget)
+            batch_slo_ms: Budget for predicting BATCH_ROWS rows (None: no budget)
+            max_model_mb: Budget for the larger of pickled size and loaded RSS (None: no budget)
+            r2_tolerance: Test R² a cheaper model may give up against the best one
+            allow_slo_breach: Pick from all candidates when none meets the budgets
+        """
+        self.latency_slo_ms = latency_slo_ms
+        self.batch_slo_ms = batch_slo_ms
+        self.max_model_mb = max_model_mb
+        self.r2_tolerance = r2_tolerance
+        self.allow_slo_breach = allow_slo_breach
+
+    def to_dict(self) -> dict:
+        """Return the policy settings, as recorded in the manifest."""
+        return {
+            "latency_slo_ms": self.latency_slo_ms,
+            "batch_slo_ms": self.batch_slo_ms,
+            "max_model_mb": self.max_model_mb,
+            "r2_tolerance": self.r2_tolerance,
+            "allow_slo_breach": self.allow_slo_breach,
+        }
+
+    def violations(self, cost: dict) -> list:
+        """
+        Budgets a candidate breaks.
+
+        Args:
+            cost: Output of measure
+
+        Returns:
+            list: One readable line per broken budget
+        """
+        broken = []
+        if self.latency_slo_ms is not None and cost["single_row_p99_ms"] > self.latency_slo_ms:
+            broken.append(f"single-row p99 {cost['single_row_p99_ms']:.2f} ms > {self.latency_slo_ms:g} ms")
+        if self.batch_slo_ms is not None and cost["batch_ms"] > self.batch_slo_ms:
+            broken.append(f"{cost['batch_rows']}-row batch {cost['batch_ms']:.1f} ms > {self.batch_slo_ms:g} ms")
+        if self.max_model_mb is not None:
+            size_mb = max(cost["pickle_bytes"], cost["rss_bytes"] or 0) / 1e6
+            if size_mb > self.max_model_mb:
+                broken.append(f"model size {size_mb:.1f} MB > {self.max_model_mb:g} MB")
+        return broken
+
+    def select(self, candidates: list) -> dict:
+        """
+        Pick the model to ship.
+
+        Args:
+            candidates: Dicts with name, r2 (the accuracy to compare) and cost (measure output)
+
+        Returns:
+            dict: selected (name), reason, policy and candidates (each with its
+            violations and whether it was eligible)
+
+        Raises:
+            NoEligibleModel: If every candidate breaks a budget and breaches aren't allowed
+        """
+        entries = [{**candidate, "violations": self.violations(candidate["cost"])} for candidate in candidates]
+        eligible = [entry for entry in entries if not entry["violations"]]
+        breach = not eligible
+        if breach:
+            if not self.allow_slo_breach:
+                details = "; ".join(f"{entry['name']}: {', '.join(entry['violations'])}" for entry in entries)
+                raise NoEligibleModel(f"Every candidate breaks a serving budget ({details})")
+            eligible = entries
+
+        best = max(eligible, key=lambda entry: entry["r2"])
+        close = [entry for entry in eligible if entry["r2"] >= best["r2"] - self.r2_tolerance]
+        # Cheapest to serve first: latency, then memory; candidate order breaks exact ties
+        selected = min(close, key=lambda entry: (entry["cost"]["single_row_p99_ms"], entry["cost"]["pickle_bytes"]))
+
+        if breach:
+            reason = "every candidate breaks a serving budget; breach explicitly allowed"
+        elif selected is best:
+            reason = "highest R² within the serving budgets"
+        else:
+            reason = (f"within {self.r2_tolerance:g} R² of {best['name']} ({best['r2']:.4f}) "
+                      f"and cheaper to serve")
+
+        for entry in entries:
+            entry["eligible"] = breach or not entry["violations"]
+        return {"selected": selected["name"], "reason": reason, "policy": self.to_dict(), "candidates": entries}
+
+
+def add_policy_arguments(parser):
+    """Add the CostPolicy options to a training CLI's argument parser."""
+    parser.add_argument('--latency-slo-ms', type=float, default=DEFAULT_LATENCY_SLO_MS,
+                        help=f"Single-row p99 predict budget (default: {DEFAULT_LATENCY_SLO_MS:g}; 0 disables)")
+    parser.add_argument('--batch-slo-ms', type=float, default=None,
+                        help=f"Budget for predicting {BATCH_ROWS} rows (default: none)")
+    parser.add_argument('--max-model-mb', type=float, default=None,
+                        help="Budget for pickled size and loaded memory (default: none)")
+    parser.add_argument('--r2-tolerance', type=float, default=DEFAULT_R2_TOLERANCE,
+                        help=f"R² a cheaper model may give up to be preferred (default: {DEFAULT_R2_TOLERANCE:g})")
+    parser.add_argument('--allow-slo-breach', action='store_true',
+                        help="Ship the best model even if every candidate breaks a budget")
+
+
+def policy_from_args(args) -> CostPolicy:
+    """Build the CostPolicy from options added by add_policy_arguments."""
+    return CostPolicy(latency_slo_ms=args.latency_slo_ms or None, batch_slo_ms=args.batch_slo_ms,
+                      max_model_mb=args.max_model_mb, r2_tolerance=args.r2_tolerance,
+                      allow_slo_breach=args.allow_slo_breach)
+
+
+def cost_table(decision: dict, r2_label: str = "Test R²") -> str:
+    """
+    Format a selection decision for model_summary.txt.
+
+    Args:
+        decision: Output of CostPolicy.select
+        r2_label: What the r2 column holds
+
+    Returns:
+        str: Heading, policy, one row per candidate and the reason for the choice
+    """
+    policy = decision["policy"]
+    budgets = [f"single-row p99 <= {policy['latency_slo_ms']:g} ms" if policy["latency_slo_ms"] is not None else None,
+               f"{BATCH_ROWS}-row batch <= {policy['batch_slo_ms']:g} ms" if policy["batch_slo_ms"] is not None else None,
+               f"size <= {policy['max_model_mb']:g} MB" if policy["max_model_mb"] is not None else None]
+    lines = [
+        "SERVING COST",
+        "============",
+        f"Budgets: {', '.join(b for b in budgets if b) or 'none'}; R² tolerance {policy['r2_tolerance']:g}",
+        "",
+        f"{'Model':<24} {r2_label:>9} {'p50 ms':>8} {'p99 ms':>8} {'Batch ms':>9} {'Pickle MB':>10} {'RSS MB':>7}  Status",
+    ]
+    for entry in decision["candidates"]:
+        cost = entry["cost"]
+        rss = f"{cost['rss_bytes'] / 1e6:>7.2f}" if cost["rss_bytes"] is not None else f"{'n/a':>7}"
+        if entry["name"] == decision["selected"]:
+            status = "selected"
+        elif entry["violations"]:
+            status = "over budget: " + ", ".join(entry["violations"])
+        else:
+            status = ""
+        lines.append(f"{entry['name']:<24} {entry['r2']:>9.4f} {cost['single_row_p50_ms']:>8.3f} "
+                     f"{cost['single_row_p99_ms']:>8.3f} {cost['batch_ms']:>9.2f} "
+                     f"{cost['pickle_bytes'] / 1e6:>10.2f} {rss}  {status}".rstrip())
+    lines += ["", f"Selected {decision['selected']}: {decision['reason']}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_manifest(path: str, decision: dict, **details):
+    """
+    Write the selection decision as JSON.
+
+    Args:
+        path: File to write
+        decision: Output of CostPolicy.select
+        **details: Extra top-level fields (e.g. the R² source)
+    """
+    manifest = {**details, **decision, "written_at": time.time()}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,393 @@
+"""
+Vectorized hyperparameter sweep for the SGD linear regression.
+
+The notebook trains one SGDRegressor and re-scores the whole train and
+test sets after every epoch. Tuning the learning-rate schedule, penalty
+and alpha that way means one serial run per configuration. This module
+fits K configurations at once: their weights form one matrix, and every
+mini-batch updates all of them with a pair of matrix products.
+
+Losses are tracked without re-scoring any rows. The Gram statistics
+(X^T X, X^T y, y·y) of the training and validation sets are computed
+once, and the MSE of all K weight vectors is then an O(K * n_features²)
+expression per epoch, however many rows there are. Each configuration
+stops on its own when its validation loss stops improving, and keeps its
+best weights. The winner is exported as a plain fitted SGDRegressor, so
+it can replace best_model.pkl (and keeps working with partial_fit).
+
+Usage:
+    python sgd_sweep.py [--data PATH] [--output models] [--epochs N] [--batch-size N]
+                        [--cache-dir DIR | --no-cache] [--offline]
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from data_cache import DEFAULT_CACHE_DIR, DataCache
+from train import DEFAULT_OUTPUT, RANDOM_STATE, prepare_data, resolve_dataset, write_artifacts
+
+# l1_ratio implied by each penalty (elasticnet uses SGDRegressor's default mix)
+PENALTIES = {"l2": 0.0, "l1": 1.0, "elasticnet": 0.15}
+
+# Schedules in SGDRegressor's terms; 'optimal' ignores eta0
+LEARNING_RATES = ("constant", "optimal", "invscaling")
+
+# Power of the 'invscaling' schedule (SGDRegressor's default)
+POWER_T = 0.25
+
+# Validation MSE, relative to the all-zero starting weights, treated as divergence
+DIVERGENCE_RATIO = 1e3
+
+
+def default_grid() -> list:
+    """
+    The sweep run by the CLI: 105 configurations.
+
+    Every penalty and alpha is combined with the 'optimal' schedule and with
+    the 'constant' and 'invscaling' schedules at three step sizes.
+
+    Returns:
+        list: Configuration dicts (learning_rate, eta0, penalty, alpha)
+    """
+    schedules = [("optimal", 0.01)] + [
+        (rate, eta0) for rate in ("constant", "invscaling") for eta0 in (0.001, 0.01, 0.1)
+    ]
+    return [
+        {"learning_rate": rate, "eta0": eta0, "penalty": penalty, "alpha": alpha}
+        for penalty, alpha, (rate, eta0) in itertools.product(
+            PENALTIES, (1e-5, 1e-4, 1e-3, 1e-2, 1e-1), schedules
+        )
+    ]
+
+
+def describe(config: dict) -> str:
+    """Short label for a configuration, e.g. 'invscaling eta0=0.01, l2 alpha=0.0001'."""
+    rate = config["learning_rate"]
+    if rate != "optimal":
+        rate += f" eta0={config['eta0']:g}"
+    return f"{rate}, {config['penalty']} alpha={config['alpha']:g}"
+
+
+def with_intercept(X: np.ndarray) -> np.ndarray:
+    """Append a column of ones so the intercept is the last weight."""
+    X = np.asarray(X, dtype=np.float64)
+    return np.hstack([X, np.ones((len(X), 1))])
+
+
+def gram_stats(X: np.ndarray, y: np.ndarray) -> tuple:
+    """
+    Sufficient statistics for the squared error of any linear model on (X, y).
+
+    Args:
+        X: Features with the intercept column (with_intercept)
+        y: Targets
+
+    Returns:
+        tuple: (n, X^T X, X^T y, y·y)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    return len(y), X.T @ X, X.T @ y, y @ y
+
+
+def batch_mse(stats: tuple, weights: np.ndarray) -> np.ndarray:
+    """
+    MSE of K linear models from gram_stats, without touching the rows.
+
+    Expands sum((X w - y)²) = w^T X^T X w - 2 w^T X^T y + y·y.
+
+    Args:
+        stats: Output of gram_stats
+        weights: One column per model, intercept last: shape (n_features + 1, K)
+
+    Returns:
+        np.ndarray: MSE per model, shape (K,)
+    """
+    n, gram, xy, yy = stats
+    sse = np.einsum('dk,de,ek->k', weights, gram, weights) - 2 * (xy @ weights) + yy
+    # Rounding can push a near-perfect fit slightly below zero
+    return np.maximum(sse, 0.0) / n
+
+
+def learning_schedule(configs: list):
+    """
+    Vectorized learning rates for a list of configurations.
+
+    'optimal' uses SGDRegressor's 1 / (alpha * (t0 + t)) with its t0
+    heuristic. t counts mini-batch updates rather than samples.
+
+    Args:
+        configs: Configuration dicts
+
+    Returns:
+        Callable taking the update number t (from 1) and returning the step size per configuration
+    """
+    rates = [config["learning_rate"] for config in configs]
+    unknown = set(rates) - set(LEARNING_RATES)
+    if unknown:
+        raise ValueError(f"Unsupported learning_rate: {', '.join(sorted(unknown))}")
+
+    rates = np.array(rates)
+    eta0 = np.array([config["eta0"] for config in configs], dtype=np.float64)
+    alpha = np.array([config["alpha"] for config in configs], dtype=np.float64)
+    t0 = np.sqrt(np.sqrt(alpha)) / alpha
+    constant = rates == "constant"
+    invscaling = rates == "invscaling"
+
+    def step_sizes(t: int) -> np.ndarray:
+        return np.where(constant, eta0,
+                        np.where(invscaling, eta0 / t ** POWER_T, 1.0 / (alpha * (t0 + t))))
+
+    return step_sizes
+
+
+def sweep(X_train, y_train, X_val, y_val, configs: list, epochs: int = 50, batch_size: int = 256,
+          tol: float = 1e-4, n_iter_no_change: int = 5, random_state: int = RANDOM_STATE) -> dict:
+    """
+    Fit every configuration at once on shared mini-batches.
+
+    The weights are one (n_features + 1, K) matrix with the intercept as
+    the last row. Each update takes the squared-error gradient of the batch
+    for every column in two matrix products, applies each configuration's
+    L2 term, and soft-thresholds for its L1 term (the intercept is never
+    penalized). A configuration stops when its validation MSE hasn't
+    improved by tol for n_iter_no_change epochs, or when it diverges
+    (non-finite weights, or a validation MSE DIVERGENCE_RATIO times that of
+    the all-zero starting weights), and keeps its best-epoch weights. Stopped columns are dropped from the
+    matrix at the next epoch, so they cost nothing from then on.
+
+    Args:
+        X_train, y_train: Scaled training data
+        X_val, y_val: Scaled validation data for early stopping and selection
+        configs: Configuration dicts (learning_rate, eta0, penalty, alpha)
+        epochs: Maximum passes over the training data
+        batch_size: Rows per update
+        tol: Improvement in validation MSE that resets the patience counter
+        n_iter_no_change: Epochs without improvement before a configuration stops
+        random_state: Seed for the batch order
+
+    Returns:
+        dict: coef (K, n_features) and intercept (K,) at each best epoch,
+        val_mse and best_epoch per configuration, epochs run, diverged flags,
+        history (train and val MSE per epoch, NaN once stopped) and updates
+    """
+    X_train = with_intercept(X_train)
+    y_train = np.asarray(y_train, dtype=np.float64)
+    n_rows, n_weights = X_train.shape
+    k = len(configs)
+
+    alpha = np.array([c["alpha"] for c in configs], dtype=np.float64)
+    l1_ratio = np.array([PENALTIES[c["penalty"]] for c in configs])
+    # Penalty per weight; the intercept row stays unpenalized
+    l2 = np.zeros((n_weights, k))
+    l2[:-1] = alpha * (1.0 - l1_ratio)
+    l1 = alpha * l1_ratio
+
+    train_stats = gram_stats(X_train, y_train)
+    val_stats = gram_stats(with_intercept(X_val), y_val)
+    diverging_mse = DIVERGENCE_RATIO * batch_mse(val_stats, np.zeros((n_weights, 1)))[0]
+
+    weights = np.zeros((n_weights, k))
+    best = weights.copy()
+    best_val = np.full(k, np.inf)
+    best_epoch = np.zeros(k, dtype=int)
+    epochs_run = np.zeros(k, dtype=int)
+    no_change = np.zeros(k, dtype=int)
+    active = np.ones(k, dtype=bool)
+    diverged = np.zeros(k, dtype=bool)
+    history = {"train": np.full((epochs, k), np.nan), "val": np.full((epochs, k), np.nan)}
+
+    rng = np.random.default_rng(random_state)
+    t = 0
+    with np.errstate(over='ignore', invalid='ignore'):
+        for epoch in range(epochs):
+            # Work on a contiguous matrix of the configurations still training
+            columns = np.flatnonzero(active)
+            step_sizes = learning_schedule([configs[i] for i in columns])
+            current = weights[:, columns]
+            current_l2 = l2[:, columns]
+            current_l1 = l1[columns]
+            uses_l1 = bool(current_l1.any())
+
+            # One gather per epoch; every batch is then a view
+            order = rng.permutation(n_rows)
+            X_epoch = X_train[order]
+            y_epoch = y_train[order][:, None]
+            for start in range(0, n_rows, batch_size):
+                X_batch = X_epoch[start:start + batch_size]
+                t += 1
+                eta = step_sizes(t)
+                residual = X_batch @ current
+                residual -= y_epoch[start:start + batch_size]
+                gradient = X_batch.T @ residual
+                gradient *= 1.0 / len(X_batch)
+                gradient += current_l2 * current
+                current -= eta * gradient
+                if uses_l1:
+                    shrink = eta * current_l1
+                    current[:-1] = np.sign(current[:-1]) * np.maximum(np.abs(current[:-1]) - shrink, 0.0)
+            weights[:, columns] = current
+
+            train_mse = batch_mse(train_stats, current)
+            val_mse = batch_mse(val_stats, current)
+            history["train"][epoch, columns] = train_mse
+            history["val"][epoch, columns] = val_mse
+            epochs_run[columns] += 1
+
+            blown = ~(np.isfinite(val_mse) & np.isfinite(current).all(axis=0)) | (val_mse > diverging_mse)
+            improved = ~blown & (val_mse < best_val[columns])
+            better = columns[improved]
+            best[:, better] = current[:, improved]
+            best_epoch[better] = epoch + 1
+            significant = improved & (val_mse < best_val[columns] - tol)
+            no_change[columns] = np.where(significant, 0, no_change[columns] + 1)
+            best_val[better] = val_mse[improved]
+
+            diverged[columns[blown]] = True
+            active[columns] = ~blown & (no_change[columns] < n_iter_no_change)
+            if not active.any():
+                break
+
+    return {
+        "configs": configs,
+        "coef": best[:-1].T.copy(),
+        "intercept": best[-1].copy(),
+        "val_mse": best_val,
+        "best_epoch": best_epoch,
+        "epochs": epochs_run,
+        "diverged": diverged,
+        "history": {name: values[:int(epochs_run.max())] for name, values in history.items()},
+        "updates": t,
+    }
+
+
+def to_estimator(config: dict, coef: np.ndarray, intercept: float, epochs: int, updates: int) -> SGDRegressor:
+    """
+    Wrap swept weights in a fitted SGDRegressor with the same hyperparameters.
+
+    The result predicts, pickles and partial_fits like one trained by the
+    notebook, so it can be saved as best_model.pkl.
+
+    Args:
+        config: Configuration the weights were trained with
+        coef: Weights, shape (n_features,)
+        intercept: Intercept
+        epochs: Epochs the configuration ran (n_iter_)
+        updates: Mini-batch updates made (t_)
+
+    Returns:
+        SGDRegressor: Fitted model
+    """
+    model = SGDRegressor(loss='squared_error', penalty=config["penalty"], alpha=config["alpha"],
+                         l1_ratio=PENALTIES["elasticnet"], learning_rate=config["learning_rate"],
+                         eta0=config["eta0"], power_t=POWER_T, max_iter=max(epochs, 1),
+                         random_state=RANDOM_STATE)
+    model.coef_ = np.array(coef, dtype=np.float64)
+    model.intercept_ = np.array([intercept], dtype=np.float64)
+    model.n_features_in_ = len(model.coef_)
+    model.n_iter_ = int(epochs)
+    model.t_ = float(updates + 1)
+    return model
+
+
+def evaluate(name: str, model, X_train, y_train, X_test, y_test) -> dict:
+    """Metrics for an exported model, in the form train.write_artifacts expects."""
+    train_pred = model.predict(X_train)
+    test_pred = model.predict(X_test)
+    return {
+        "name": name,
+        "model": model,
+        "train_r2": r2_score(y_train, train_pred),
+        "test_r2": r2_score(y_test, test_pred),
+        "train_mse": mean_squared_error(y_train, train_pred),
+        "test_mse": mean_squared_error(y_test, test_pred),
+        "train_mae": mean_absolute_error(y_train, train_pred),
+        "test_mae": mean_absolute_error(y_test, test_pred),
+    }
+
+
+def run_sweep(split: dict, configs: list = None, validation_fraction: float = 0.1, **options) -> dict:
+    """
+    Sweep configurations on a train/test split and pick the winner.
+
+    A validation set is carved out of the training rows, so the test set
+    stays untouched until the winner is scored.
+
+    Args:
+        split: Output of train.split_and_scale (or train.prepare_data's "split")
+        configs: Configurations to try (default: default_grid())
+        validation_fraction: Share of the training rows used for validation
+        **options: Passed to sweep (epochs, batch_size, tol, ...)
+
+    Returns:
+        dict: best (evaluate result plus config), index of the winner and the sweep output
+    """
+    configs = configs or default_grid()
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        split["X_train"], split["y_train"], test_size=validation_fraction, random_state=RANDOM_STATE
+    )
+    swept = sweep(X_fit, y_fit, X_val, y_val, configs, **options)
+
+    # Lowest validation MSE wins; ties go to the earlier configuration
+    index = int(np.argmin(np.where(swept["diverged"], np.inf, swept["val_mse"])))
+    config = configs[index]
+    model = to_estimator(config, swept["coef"][index], swept["intercept"][index],
+                         swept["epochs"][index], swept["updates"])
+    best = evaluate(f"Linear Regression (SGD sweep: {describe(config)})", model,
+                    split["X_train"], split["y_train"], split["X_test"], split["y_test"])
+    best["config"] = config
+    return {"best": best, "index": index, "sweep": swept}
+
+
+def main(argv=None):
+    """
+    Run the default sweep from the command line and save the winner.
+
+    Usage:
+        python sgd_sweep.py [--data PATH] [--output DIR] [--epochs N] [--batch-size N]
+                            [--cache-dir DIR | --no-cache] [--offline]
+    """
+    parser = argparse.ArgumentParser(description="Sweep SGD linear regression hyperparameters")
+    parser.add_argument('--data', default=None,
+                        help="Dataset CSV or directory (default: download with kagglehub)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory for the model artifacts")
+    parser.add_argument('--epochs', type=int, default=50, help="Maximum epochs per configuration")
+    parser.add_argument('--batch-size', type=int, default=256, help="Rows per update")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Cache for the dataset and preprocessed arrays (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="Always read and preprocess the CSV")
+    parser.add_argument('--offline', action='store_true',
+                        help="Train from the cached download instead of calling kagglehub")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else DataCache(args.cache_dir)
+    prepared = prepare_data(resolve_dataset(args.data, cache, args.offline), cache)
+
+    start = time.perf_counter()
+    result = run_sweep(prepared["split"], epochs=args.epochs, batch_size=args.batch_size)
+    seconds = time.perf_counter() - start
+
+    swept = result["sweep"]
+    order = np.argsort(np.where(swept["diverged"], np.inf, swept["val_mse"]))
+    print(f"{'Configuration':<48} {'Val MSE':>10} {'Epochs':>7}")
+    for index in order[:10]:
+        print(f"{describe(swept['configs'][index]):<48} {swept['val_mse'][index]:>10.4f} "
+              f"{swept['epochs'][index]:>7}")
+
+    best = result["best"]
+    paths = write_artifacts(args.output, best, prepared["split"], prepared["label_encoders"],
+                            prepared["target_col"], prepared["total_samples"])
+    print(f"✓ Best configuration: {describe(best['config'])} (test R² {best['test_r2']:.4f})")
+    print(f"✓ Artifacts written to {os.path.dirname(paths['model']) or '.'}")
+    print(f"ℹ Swept {len(swept['configs'])} configurations in {seconds:.2f}s "
+          f"({int(swept['diverged'].sum())} diverged)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Tests for the content-addressed training data cache
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import train
+from data_cache import DataCache
+from test_train import make_dataset
+
+
+def test_warm_run_loads_cached_arrays(tmp_path):
+    """A second run skips pandas, maps the arrays from disk and trains the same model"""
+    csv = tmp_path / "data.csv"
+    make_dataset().to_csv(csv, index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    cold = train.train(str(csv), str(tmp_path / "cold"), jobs=1, cache_dir=cache_dir)
+    warm = train.train(str(csv), str(tmp_path / "warm"), jobs=1, cache_dir=cache_dir)
+
+    assert cold["cache"]["hit"] is False
+    assert warm["cache"] == {"key": cold["cache"]["key"], "hit": True}
+    assert warm["timings"]["preprocess"] == 0.0
+    # Memory-mapped and in-memory arrays may take different BLAS paths (last-ulp differences)
+    for a, b in zip(cold["results"], warm["results"]):
+        assert a["test_r2"] == pytest.approx(b["test_r2"], rel=1e-9)
+
+    entry = DataCache(cache_dir).load(warm["cache"]["key"])
+    assert isinstance(entry["arrays"]["X_train"], np.memmap)
+    assert entry["arrays"]["X_train"].shape == (320, 6)
+    assert entry["meta"]["target_col"] == "Diagnosis"
+    assert list(entry["objects"]) == ["scaler", "label_encoders"]
+
+
+def test_changed_source_or_config_misses(tmp_path, monkeypatch):
+    """Editing the CSV or the preprocessing config builds a new entry"""
+    csv = tmp_path / "data.csv"
+    make_dataset(seed=0).to_csv(csv, index=False)
+    cache = DataCache(str(tmp_path / "cache"))
+
+    first = train.prepare_data(str(csv), cache)
+    make_dataset(seed=1).to_csv(csv, index=False)
+    edited = train.prepare_data(str(csv), cache)
+    monkeypatch.setattr(train, "PREPROCESS_VERSION", train.PREPROCESS_VERSION + 1)
+    reconfigured = train.prepare_data(str(csv), cache)
+
+    assert not edited["cache_hit"] and not reconfigured["cache_hit"]
+    assert len({first["cache_key"], edited["cache_key"], reconfigured["cache_key"]}) == 3
+    assert train.prepare_data(str(csv), cache)["cache_hit"]
+
+
+def test_download_is_reused_offline(tmp_path, monkeypatch):
+    """Once downloaded, the dataset is available without kagglehub or the network"""
+    download = tmp_path / "download"
+    download.mkdir()
+    make_dataset().to_csv(download / "endometriosis.csv", index=False)
+    cache = DataCache(str(tmp_path / "cache"))
+
+    kagglehub = types.SimpleNamespace(dataset_download=lambda name: str(download))
+    monkeypatch.setitem(sys.modules, "kagglehub", kagglehub)
+    path = train.resolve_dataset(None, cache)
+    assert path.startswith(cache.raw_dir)
+
+    (download / "endometriosis.csv").unlink()
+    assert train.resolve_dataset(None, cache, offline=True) == path
+
+    def unreachable(name):
+        raise ConnectionError("no network")
+    kagglehub.dataset_download = unreachable
+    assert train.resolve_dataset(None, cache) == path
+
+    with pytest.raises(ConnectionError):
+        train.resolve_dataset(None, DataCache(str(tmp_path / "empty")))
+    with pytest.raises(SystemExit):
+        train.resolve_dataset(None, DataCache(str(tmp_path / "empty")), offline=True)
@@ -0,0 +1,89 @@
+"""
+Tests for the cross-validation harness
+"""
+
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from data_cache import DataCache
+from evaluate import cross_validate, evaluate, model_config
+from serving_cost import CostPolicy
+from test_train import make_dataset
+from train import build_model
+
+FAST = ("Linear Regression (GD)", "Decision Tree")
+
+
+def dataset(rows=600, seed=0):
+    """Unscaled feature matrix and targets of the synthetic dataset"""
+    df = make_dataset(rows=rows, seed=seed)
+    return df.drop(columns=['Diagnosis']).to_numpy(dtype=float), df['Diagnosis'].to_numpy(dtype=float)
+
+
+def test_adding_a_candidate_only_fits_its_folds(tmp_path):
+    """Cached folds are reused and give the same numbers as fitting again"""
+    X, y = dataset()
+    cache = DataCache(str(tmp_path / "cache"))
+
+    first = cross_validate(X, y, {"Linear Regression (GD)": build_model("Linear Regression (GD)")},
+                           n_splits=4, jobs=1, cache=cache)
+    second = cross_validate(X, y, {name: build_model(name) for name in FAST}, n_splits=4, jobs=1, cache=cache)
+    fresh = cross_validate(X, y, {name: build_model(name) for name in FAST}, n_splits=4, jobs=1)
+
+    assert first["Linear Regression (GD)"]["computed"] == 4
+    assert (second["Linear Regression (GD)"]["computed"], second["Linear Regression (GD)"]["cached"]) == (0, 4)
+    assert second["Decision Tree"]["computed"] == 4
+    for name in FAST:
+        assert second[name]["mean"]["test_r2"] == pytest.approx(fresh[name]["mean"]["test_r2"], rel=1e-12)
+        assert len(second[name]["folds"]) == 4
+
+
+def test_fold_keys_follow_hyperparameters_not_threads(tmp_path):
+    """A changed hyperparameter is new work; a different n_jobs is not"""
+    X, y = dataset()
+    cache = DataCache(str(tmp_path / "cache"))
+    cross_validate(X, y, {"Forest": build_model("Random Forest", n_jobs=1)}, n_splits=3, jobs=1, cache=cache)
+
+    rethreaded = cross_validate(X, y, {"Forest": build_model("Random Forest", n_jobs=4)},
+                                n_splits=3, jobs=1, cache=cache)
+    deeper = cross_validate(X, y, {"Tree": DecisionTreeRegressor(max_depth=3)}, n_splits=3, jobs=1, cache=cache)
+    shallower = cross_validate(X, y, {"Tree": DecisionTreeRegressor(max_depth=2)}, n_splits=3, jobs=1, cache=cache)
+
+    assert rethreaded["Forest"]["cached"] == 3
+    assert deeper["Tree"]["computed"] == shallower["Tree"]["computed"] == 3
+    assert model_config(build_model("Random Forest", n_jobs=4)) == model_config(build_model("Random Forest"))
+
+
+def test_process_pool_matches_serial():
+    """Fitting folds in a pool gives the serial metrics"""
+    X, y = dataset()
+    candidates = {name: build_model(name) for name in FAST}
+
+    serial = cross_validate(X, y, candidates, n_splits=3, jobs=1)
+    parallel = cross_validate(X, y, candidates, n_splits=3, jobs=2)
+
+    for name in FAST:
+        np.testing.assert_allclose([fold["test_mse"] for fold in parallel[name]["folds"]],
+                                   [fold["test_mse"] for fold in serial[name]["folds"]], rtol=1e-12)
+
+
+def test_best_by_mean_is_saved_with_the_table(tmp_path):
+    """With no cost trade-off, the best mean R² is refitted and both tables reach model_summary.txt"""
+    csv = tmp_path / "data.csv"
+    make_dataset(rows=600).to_csv(csv, index=False)
+
+    run = evaluate(str(csv), str(tmp_path / "models"), candidates=FAST, n_splits=3, jobs=1,
+                   cache_dir=str(tmp_path / "cache"), policy=CostPolicy(latency_slo_ms=None, r2_tolerance=0.0))
+
+    means = {name: result["mean"]["test_r2"] for name, result in run["results"].items()}
+    assert run["best"] == max(means, key=means.get)
+    assert run["refit"]["name"] == run["best"]
+    summary = open(run["paths"]["summary"], encoding='utf-8').read()
+    assert f"Model Name: {run['best']}" in summary
+    assert "CROSS-VALIDATION" in summary
+    assert "SERVING COST" in summary and "CV R²" in summary
+    assert run["selection"]["selected"] == run["best"]
+    assert "3-fold" in summary
+    for name in FAST:
+        assert name in run["table"]
@@ -0,0 +1,109 @@
+"""
+Tests for serving-cost benchmarks and cost-aware selection
+"""
+
+import json
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from serving_cost import MANIFEST_FILE, CostPolicy, NoEligibleModel, cost_table, loaded_rss_bytes, measure
+from test_train import make_dataset
+from train import main, train
+
+
+def cost(p99_ms, pickle_bytes=1000, batch_ms=1.0, rss_bytes=None):
+    """A measure() result with the given numbers"""
+    return {"single_row_p50_ms": p99_ms / 2, "single_row_p99_ms": p99_ms, "batch_rows": 10000,
+            "batch_ms": batch_ms, "pickle_bytes": pickle_bytes, "rss_bytes": rss_bytes}
+
+
+CANDIDATES = [
+    {"name": "Linear", "r2": 0.070, "cost": cost(0.05, pickle_bytes=800)},
+    {"name": "Tree", "r2": 0.075, "cost": cost(0.07, pickle_bytes=60_000)},
+    {"name": "Forest", "r2": 0.078, "cost": cost(6.0, pickle_bytes=5_000_000, rss_bytes=9_000_000)},
+]
+
+
+def test_cheaper_model_within_tolerance_wins():
+    """A negligible R² gain doesn't buy a costlier model"""
+    decision = CostPolicy(latency_slo_ms=None, r2_tolerance=0.01).select(CANDIDATES)
+
+    assert decision["selected"] == "Linear"
+    assert "within 0.01 R² of Forest" in decision["reason"]
+    assert CostPolicy(latency_slo_ms=None, r2_tolerance=0.0).select(CANDIDATES)["selected"] == "Forest"
+
+
+def test_budgets_exclude_candidates():
+    """Candidates over a budget are never picked, and the table says why"""
+    decision = CostPolicy(latency_slo_ms=1.0, r2_tolerance=0.0).select(CANDIDATES)
+
+    assert decision["selected"] == "Tree"
+    forest = decision["candidates"][2]
+    assert not forest["eligible"]
+    assert forest["violations"] == ["single-row p99 6.00 ms > 1 ms"]
+    assert "over budget: single-row p99 6.00 ms > 1 ms" in cost_table(decision)
+
+    sized = CostPolicy(latency_slo_ms=None, max_model_mb=8, r2_tolerance=0.0).select(CANDIDATES)
+    assert sized["candidates"][2]["violations"] == ["model size 9.0 MB > 8 MB"]
+
+
+def test_breaking_every_budget_needs_an_explicit_decision():
+    """Without allow_slo_breach, nothing is shipped when no candidate fits"""
+    with pytest.raises(NoEligibleModel, match="Forest: single-row p99"):
+        CostPolicy(latency_slo_ms=0.01).select(CANDIDATES)
+
+    decision = CostPolicy(latency_slo_ms=0.01, r2_tolerance=0.0, allow_slo_breach=True).select(CANDIDATES)
+    assert decision["selected"] == "Forest"
+    assert "breach explicitly allowed" in decision["reason"]
+
+
+def test_measure_reports_latency_size_and_memory():
+    """The benchmark covers single rows, a 10k batch, the pickle and loaded memory"""
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(500, 6)), rng.normal(size=500)
+    small = LinearRegression().fit(X, y)
+    large = RandomForestRegressor(n_estimators=50, random_state=0).fit(X, y)
+
+    result = measure(small, X, repeats=20, batch_repeats=2, rss=False)
+
+    assert result["batch_rows"] == 10000
+    assert 0 < result["single_row_p50_ms"] <= result["single_row_p99_ms"]
+    assert result["rss_bytes"] is None
+    small_rss, large_rss = loaded_rss_bytes([small, large])
+    assert large_rss > small_rss
+    assert measure(large, X, repeats=5, batch_repeats=1, rss=False)["pickle_bytes"] > result["pickle_bytes"]
+
+
+def test_training_records_the_decision(tmp_path):
+    """The summary and the JSON manifest carry the costs; the forest is saved single-threaded"""
+    csv = tmp_path / "data.csv"
+    make_dataset().to_csv(csv, index=False)
+
+    run = train(str(csv), str(tmp_path / "models"), jobs=2,
+                policy=CostPolicy(latency_slo_ms=None, r2_tolerance=0.0))
+
+    manifest = json.load(open(tmp_path / "models" / MANIFEST_FILE, encoding='utf-8'))
+    assert manifest["selected"] == run["best"]["name"] == run["selection"]["selected"]
+    assert manifest["metrics"]["test_r2"] == run["best"]["test_r2"]
+    assert [entry["name"] for entry in manifest["candidates"]] == [r["name"] for r in run["results"]]
+    assert manifest["policy"]["r2_tolerance"] == 0.0
+    summary = open(run["paths"]["summary"], encoding='utf-8').read()
+    assert "SERVING COST" in summary and "p99 ms" in summary
+    forest = next(r for r in run["results"] if r["name"] == "Random Forest")
+    assert forest["model"].n_jobs == 1
+
+
+def test_cli_refuses_to_ship_over_budget(tmp_path):
+    """An impossible budget stops the CLI unless the breach is explicit"""
+    csv = tmp_path / "data.csv"
+    make_dataset(rows=200).to_csv(csv, index=False)
+    args = ["--data", str(csv), "--output", str(tmp_path / "models"), "--jobs", "1", "--no-cache",
+            "--latency-slo-ms", "0.000001"]
+
+    with pytest.raises(SystemExit, match="--allow-slo-breach"):
+        main(args)
+    main(args + ["--allow-slo-breach"])
+    assert (tmp_path / "models" / "best_model.pkl").exists()
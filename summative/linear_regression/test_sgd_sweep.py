@@ -0,0 +1,104 @@
+"""
+Tests for the vectorized SGD sweep
+"""
+
+import os
+import pickle
+
+import joblib
+import numpy as np
+
+from sgd_sweep import batch_mse, default_grid, gram_stats, main, run_sweep, sweep, with_intercept
+from test_train import make_dataset
+from train import preprocess, split_and_scale
+
+
+def scaled_split(rows=2000, seed=0):
+    """A scaled train/test split of the synthetic dataset"""
+    return split_and_scale(*preprocess(make_dataset(rows=rows, seed=seed))[:2])
+
+
+def test_gram_mse_matches_scoring_the_rows():
+    """The loss from precomputed statistics equals the MSE of actual predictions"""
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(500, 6)), rng.normal(size=500)
+    weights = rng.normal(size=(7, 4))
+
+    expected = ((with_intercept(X) @ weights - y[:, None]) ** 2).mean(axis=0)
+
+    np.testing.assert_allclose(batch_mse(gram_stats(with_intercept(X), y), weights), expected, rtol=1e-10)
+
+
+def test_configurations_train_as_if_alone():
+    """Sweeping configurations together gives each the weights of its own run"""
+    split = scaled_split()
+    X_fit, X_val = split["X_train"][:1400], split["X_train"][1400:]
+    y_fit, y_val = split["y_train"][:1400], split["y_train"][1400:]
+    configs = [
+        {"learning_rate": "constant", "eta0": 0.01, "penalty": "l2", "alpha": 1e-4},
+        {"learning_rate": "invscaling", "eta0": 0.1, "penalty": "l1", "alpha": 1e-3},
+        {"learning_rate": "optimal", "eta0": 0.01, "penalty": "elasticnet", "alpha": 1e-2},
+    ]
+
+    together = sweep(X_fit, y_fit, X_val, y_val, configs, epochs=8)
+
+    for k, config in enumerate(configs):
+        alone = sweep(X_fit, y_fit, X_val, y_val, [config], epochs=8)
+        np.testing.assert_allclose(together["coef"][k], alone["coef"][0], rtol=1e-9, atol=1e-12)
+        assert np.isclose(together["intercept"][k], alone["intercept"][0], rtol=1e-9)
+        assert together["epochs"][k] == alone["epochs"][0]
+
+
+def test_early_stopping_and_divergence_are_per_configuration():
+    """A diverging configuration is flagged without disturbing the others"""
+    split = scaled_split()
+    configs = [
+        {"learning_rate": "constant", "eta0": 50.0, "penalty": "l2", "alpha": 1e-4},
+        {"learning_rate": "constant", "eta0": 0.1, "penalty": "l2", "alpha": 1e-4},
+    ]
+
+    result = sweep(split["X_train"][:1400], split["y_train"][:1400],
+                   split["X_train"][1400:], split["y_train"][1400:], configs, epochs=200)
+
+    assert result["diverged"].tolist() == [True, False]
+    assert np.isfinite(result["coef"]).all()
+    assert result["epochs"][1] < 200
+    assert result["best_epoch"][1] <= result["epochs"][1]
+    assert np.isnan(result["history"]["val"][result["epochs"][0]:, 0]).all()
+
+
+def test_winner_exports_as_a_fitted_sgd_regressor():
+    """The selected weights predict, pickle and keep training like a notebook model"""
+    split = scaled_split()
+
+    result = run_sweep(split, epochs=20)
+
+    best = result["best"]
+    model = best["model"]
+    swept = result["sweep"]
+    assert best["config"] == default_grid()[result["index"]]
+    assert not swept["diverged"][result["index"]]
+    assert swept["val_mse"][result["index"]] == np.min(swept["val_mse"][~swept["diverged"]])
+    np.testing.assert_allclose(model.predict(split["X_test"]),
+                               split["X_test"] @ model.coef_ + model.intercept_[0])
+    assert best["test_r2"] > 0.2
+
+    restored = pickle.loads(pickle.dumps(model))
+    restored.partial_fit(split["X_train"][:32], split["y_train"][:32])
+    assert restored.coef_.tolist() != model.coef_.tolist()
+
+
+def test_cli_saves_the_winner(tmp_path, capsys):
+    """The CLI writes the notebook's artifact set for the best configuration"""
+    csv = tmp_path / "data.csv"
+    make_dataset(rows=1000).to_csv(csv, index=False)
+
+    main(["--data", str(csv), "--output", str(tmp_path / "models"), "--epochs", "10", "--no-cache"])
+
+    output = capsys.readouterr().out
+    assert f"Swept {len(default_grid())} configurations" in output
+    model = joblib.load(tmp_path / "models" / "best_model.pkl")
+    assert model.coef_.shape == (6,)
+    summary = open(tmp_path / "models" / "model_summary.txt", encoding='utf-8').read()
+    assert "Model Name: Linear Regression (SGD sweep: " in summary
+    assert os.path.exists(tmp_path / "models" / "scaler.pkl")
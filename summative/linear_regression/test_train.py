@@ -0,0 +1,97 @@
+"""
+Tests for the training CLI
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from train import CANDIDATES, main, preprocess, split_and_scale, train
+
+
+def make_dataset(rows=400, seed=0):
+    """Random data with the columns of the Kaggle dataset, target last"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Age': rng.integers(18, 60, rows),
+        'Menstrual_Irregularity': rng.integers(0, 2, rows),
+        'Chronic_Pain_Level': rng.uniform(0, 10, rows).round(1),
+        'Hormone_Level_Abnormality': rng.integers(0, 2, rows),
+        'Infertility': rng.integers(0, 2, rows),
+        'BMI': rng.uniform(15, 40, rows).round(1),
+    })
+    score = 0.3 * df['Menstrual_Irregularity'] + 0.05 * df['Chronic_Pain_Level'] + rng.normal(0, 0.2, rows)
+    df['Diagnosis'] = (score > 0.5).astype(int)
+    return df
+
+
+def test_preprocess_imputes_and_encodes():
+    """Median for numeric gaps, mode for text gaps, text label-encoded, target is last numeric"""
+    df = pd.DataFrame({
+        'Age': [20.0, np.nan, 40.0, 30.0],
+        'Region': ['north', None, 'south', 'south'],
+        'Diagnosis': [0, 1, np.nan, 1],
+    })
+
+    processed, target_col, encoders = preprocess(df)
+
+    assert target_col == 'Diagnosis'
+    assert len(processed) == 3
+    assert processed['Age'].tolist() == [20.0, 25.0, 30.0]
+    assert list(encoders) == ['Region']
+    # The gap's row is filled with the mode of the remaining 'north' / 'south' tie
+    assert encoders['Region'].inverse_transform(processed['Region']).tolist() == ['north', 'north', 'south']
+
+
+def test_parallel_training_matches_serial(tmp_path):
+    """Fitting in a process pool selects and saves the same model as a serial run"""
+    csv = tmp_path / "endometriosis.csv"
+    make_dataset().to_csv(csv, index=False)
+
+    serial = train(str(csv), str(tmp_path / "serial"), jobs=1)
+    parallel = train(str(tmp_path), str(tmp_path / "parallel"), jobs=2)
+
+    assert [r["name"] for r in parallel["results"]] == list(CANDIDATES)
+    # A forest predicting with several threads may sum its trees in another order
+    for a, b in zip(serial["results"], parallel["results"]):
+        assert a["test_r2"] == pytest.approx(b["test_r2"], rel=1e-12)
+        assert a["train_mse"] == pytest.approx(b["train_mse"], rel=1e-12)
+    assert parallel["best"]["name"] == serial["best"]["name"]
+    assert len(parallel["results"][0]["losses"]["test"]) == 10
+
+    data = split_and_scale(*preprocess(make_dataset())[:2])
+    serial_model = joblib.load(serial["paths"]["model"])
+    parallel_model = joblib.load(parallel["paths"]["model"])
+    np.testing.assert_allclose(serial_model.predict(data["X_test"]), parallel_model.predict(data["X_test"]), rtol=1e-12)
+
+    assert joblib.load(parallel["paths"]["features"]) == list(make_dataset().columns[:-1])
+    assert joblib.load(parallel["paths"]["label_encoders"]) == {}
+    summary = open(parallel["paths"]["summary"], encoding='utf-8').read()
+    assert f"Model Name: {parallel['best']['name']}" in summary
+    assert "- Training samples: 320" in summary
+    assert "- Target variable: Diagnosis" in summary
+
+
+def test_cli_reports_wall_clock(tmp_path, capsys):
+    """The CLI prints every candidate and the time the retrain took"""
+    csv = tmp_path / "data.csv"
+    make_dataset(rows=200).to_csv(csv, index=False)
+
+    main(["--data", str(csv), "--output", str(tmp_path / "models"), "--jobs", "1",
+          "--cache-dir", str(tmp_path / "cache")])
+
+    output = capsys.readouterr().out
+    for name in CANDIDATES:
+        assert name in output
+    assert "Wall clock" in output
+    assert "Data cache miss, stored" in output
+    assert os.path.exists(tmp_path / "models" / "best_model.pkl")
+
+
+def test_missing_dataset_directory_fails(tmp_path):
+    """A directory without a CSV is reported instead of silently training on nothing"""
+    with pytest.raises(FileNotFoundError):
+        train(str(tmp_path), str(tmp_path / "models"), jobs=1)
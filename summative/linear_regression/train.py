@@ -0,0 +1,548 @@
+"""
+Training CLI for the endometriosis regression models.
+
+Reproduces the pipeline of multivariate.ipynb without the plots: median /
+mode imputation, LabelEncoder for categorical columns, an 80/20 split,
+StandardScaler, then the SGD, Decision Tree and Random Forest candidates
+with the notebook's hyperparameters. The candidates are fitted in parallel
+in a process pool and benchmarked for serving cost. The best test R² within
+the serving budgets is selected, preferring a cheaper model when it is
+nearly as accurate (see serving_cost.py). The same artifact set as the
+notebook is written (best_model.pkl, scaler.pkl, features.pkl,
+label_encoders.pkl and model_summary.txt), plus model_selection.json.
+
+Usage:
+    python train.py [--data PATH] [--output models] [--jobs N]
+                    [--cache-dir DIR | --no-cache] [--offline]
+                    [--latency-slo-ms MS] [--batch-slo-ms MS] [--max-model-mb MB]
+                    [--r2-tolerance R2] [--allow-slo-breach]
+
+Without --data the dataset is fetched with kagglehub. Both the raw CSV and
+the preprocessed train/test arrays are kept in a content-addressed cache
+(see data_cache.py), so repeat runs skip pandas entirely and --offline
+trains from the last downloaded copy without touching the network.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from data_cache import DEFAULT_CACHE_DIR, DataCache, config_key
+from serving_cost import (MANIFEST_FILE, CostPolicy, NoEligibleModel, add_policy_arguments, cost_table,
+                          loaded_rss_bytes, measure, policy_from_args, write_manifest)
+
+KAGGLE_DATASET = "michaelanietie/endometriosis-dataset"
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+
+# Bump whenever preprocess() or split_and_scale() changes, so cached arrays are rebuilt
+PREPROCESS_VERSION = 1
+
+# Epochs of partial_fit the notebook runs for the SGD model (it tracks a loss curve)
+SGD_EPOCHS = 10
+
+# Candidate names in the notebook's order; ties on test R² go to the earlier one
+CANDIDATES = ("Linear Regression (GD)", "Decision Tree", "Random Forest")
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+def resolve_dataset(data: str = None, cache: DataCache = None, offline: bool = False) -> str:
+    """
+    Find the dataset CSV, downloading it with kagglehub if no path is given.
+
+    A download is copied into the cache; when kagglehub is missing, the
+    download fails or offline is set, the last cached copy is used instead.
+
+    Args:
+        data: CSV file, or directory holding one; None downloads it with kagglehub
+        cache: Cache for the downloaded file (None disables the offline fallback)
+        offline: Use the cached download without trying kagglehub
+
+    Returns:
+        str: Path of the CSV file
+    """
+    downloaded = data is None
+    if downloaded:
+        cached = cache.raw_for_source(KAGGLE_DATASET) if cache is not None else None
+        if offline:
+            if cached is None:
+                raise SystemExit("No cached copy of the dataset yet; run once online or pass --data")
+            return cached
+        try:
+            import kagglehub
+            data = kagglehub.dataset_download(KAGGLE_DATASET)
+        except Exception as e:
+            if cached is None:
+                if isinstance(e, ImportError):
+                    raise SystemExit("kagglehub is not installed; pass --data with a local copy of the CSV")
+                raise
+            print(f"⚠ Warning: Dataset download failed ({e}); using the cached copy")
+            return cached
+
+    if os.path.isdir(data):
+        csv_files = sorted(f for f in os.listdir(data) if f.endswith('.csv'))
+        if not csv_files:
+            raise FileNotFoundError(f"No CSV files found in {data}")
+        data = os.path.join(data, csv_files[0])
+
+    # Only downloads are copied; a local file stays where the caller keeps it
+    if downloaded and cache is not None:
+        data = cache.store_raw(data, source=KAGGLE_DATASET)[1]
+    return data
+
+
+def load_dataset(data: str = None) -> pd.DataFrame:
+    """
+    Load the endometriosis dataset.
+
+    Args:
+        data: CSV file, or directory holding one; None downloads it with kagglehub
+
+    Returns:
+        pd.DataFrame: Raw dataset
+    """
+    return pd.read_csv(resolve_dataset(data))
+
+
+def preprocess(df: pd.DataFrame) -> tuple:
+    """
+    Impute, encode and pick the target exactly as the notebook does.
+
+    The target is the last numeric column. Rows without a target are
+    dropped; other missing values get the column median (float64/int64
+    columns) or mode (anything else). Object columns except the target are
+    label-encoded.
+
+    Args:
+        df: Raw dataset
+
+    Returns:
+        tuple: (processed DataFrame, target column name, {column: LabelEncoder})
+    """
+    df = df.copy()
+
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    target_col = numeric_cols[-1] if numeric_cols else None
+    if target_col is None:
+        raise ValueError("The dataset has no numeric column to use as the target")
+    df = df.dropna(subset=[target_col])
+
+    for col in df.columns:
+        if df[col].isnull().sum() > 0:
+            if df[col].dtype in ['float64', 'int64']:
+                df[col] = df[col].fillna(df[col].median())
+            else:
+                df[col] = df[col].fillna(df[col].mode()[0])
+
+    # 'string' also selects text columns on pandas 3, where they're no longer object dtype
+    label_encoders = {}
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if col != target_col:
+            encoder = LabelEncoder()
+            df[col] = encoder.fit_transform(df[col].astype(str))
+            label_encoders[col] = encoder
+
+    return df, target_col, label_encoders
+
+
+def split_and_scale(df: pd.DataFrame, target_col: str) -> dict:
+    """
+    Split 80/20 with the notebook's seed and standardize on the training set.
+
+    Args:
+        df: Processed dataset
+        target_col: Target column name
+
+    Returns:
+        dict: features, scaler, X_train/X_test (scaled arrays) and y_train/y_test
+    """
+    X = df.drop(columns=[target_col])
+    y = df[target_col]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+
+    scaler = StandardScaler()
+    return {
+        "features": X.columns.tolist(),
+        "scaler": scaler,
+        "X_train": scaler.fit_transform(X_train),
+        "X_test": scaler.transform(X_test),
+        "y_train": y_train.to_numpy(),
+        "y_test": y_test.to_numpy(),
+    }
+
+
+def preprocess_config() -> dict:
+    """Settings that change the preprocessed arrays, hashed into their cache key."""
+    return {"preprocess_version": PREPROCESS_VERSION, "test_size": TEST_SIZE,
+            "random_state": RANDOM_STATE, "pandas": pd.__version__, "sklearn": sklearn.__version__}
+
+
+def prepare_data(path: str, cache: DataCache = None) -> dict:
+    """
+    Preprocess, split and scale a dataset file, reusing cached arrays when possible.
+
+    Args:
+        path: Dataset CSV
+        cache: Cache to read and fill (None always runs pandas)
+
+    Returns:
+        dict: split (output of split_and_scale), target_col, label_encoders,
+        total_samples, and cache_key / cache_hit (None / False without a cache)
+    """
+    key = config_key(cache.file_hash(path), preprocess_config()) if cache is not None else None
+    entry = cache.load(key) if cache is not None else None
+    if entry is not None:
+        meta = entry["meta"]
+        split = {"features": meta["features"], "scaler": entry["objects"]["scaler"], **entry["arrays"]}
+        return {"split": split, "target_col": meta["target_col"],
+                "label_encoders": entry["objects"]["label_encoders"],
+                "total_samples": meta["total_samples"], "cache_key": key, "cache_hit": True}
+
+    processed, target_col, label_encoders = preprocess(pd.read_csv(path))
+    split = split_and_scale(processed, target_col)
+    if cache is not None:
+        arrays = {name: split[name] for name in ("X_train", "X_test", "y_train", "y_test")}
+        cache.save(key, arrays,
+                   {"scaler": split["scaler"], "label_encoders": label_encoders},
+                   {"features": split["features"], "target_col": target_col,
+                    "total_samples": len(processed), "source": os.path.abspath(path),
+                    "config": preprocess_config()})
+    return {"split": split, "target_col": target_col, "label_encoders": label_encoders,
+            "total_samples": len(processed), "cache_key": key, "cache_hit": False}
+
+
+def build_model(name: str, n_jobs: int = 1):
+    """
+    Create one unfitted candidate with the notebook's hyperparameters.
+
+    Args:
+        name: One of CANDIDATES
+        n_jobs: Threads for the Random Forest (its trees don't depend on this)
+
+    Returns:
+        The sklearn estimator
+    """
+    if name == "Linear Regression (GD)":
+        return SGDRegressor(max_iter=1000, random_state=RANDOM_STATE, loss='squared_error',
+                            learning_rate='optimal', eta0=0.01, verbose=0)
+    if name == "Decision Tree":
+        return DecisionTreeRegressor(random_state=RANDOM_STATE, max_depth=10, min_samples_split=5,
+                                     min_samples_leaf=2)
+    if name == "Random Forest":
+        return RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE, max_depth=10,
+                                     min_samples_split=5, min_samples_leaf=2, n_jobs=n_jobs)
+    raise ValueError(f"Unknown candidate: {name}")
+
+
+def fit_model(model, X_train, y_train, on_epoch=None):
+    """
+    Fit an estimator the way the notebook does.
+
+    SGD models get SGD_EPOCHS calls to partial_fit; anything else is fitted once.
+
+    Args:
+        model: Unfitted estimator
+        X_train, y_train: Scaled training data
+        on_epoch: Called with the model after each SGD epoch
+
+    Returns:
+        The fitted estimator
+    """
+    if isinstance(model, SGDRegressor):
+        for _ in range(SGD_EPOCHS):
+            model.partial_fit(X_train, y_train)
+            if on_epoch is not None:
+                on_epoch(model)
+    else:
+        model.fit(X_train, y_train)
+    return model
+
+
+def fit_candidate(name: str, X_train, y_train, X_test, y_test, n_jobs: int = 1) -> dict:
+    """
+    Fit and evaluate one candidate (runs in a pool worker).
+
+    The SGD model is trained with SGD_EPOCHS calls to partial_fit, recording
+    the train and test MSE after each one, as in the notebook.
+
+    Args:
+        name: One of CANDIDATES
+        X_train, y_train: Scaled training data
+        X_test, y_test: Scaled test data
+        n_jobs: Threads for the Random Forest
+
+    Returns:
+        dict: name, fitted model, train/test R², MSE and MAE, loss curves and fit seconds
+    """
+    start = time.perf_counter()
+    losses = {"train": [], "test": []}
+
+    def record_losses(model):
+        losses["train"].append(mean_squared_error(y_train, model.predict(X_train)))
+        losses["test"].append(mean_squared_error(y_test, model.predict(X_test)))
+
+    model = fit_model(build_model(name, n_jobs), X_train, y_train, on_epoch=record_losses)
+    # Serve single-threaded: the API brings its own concurrency, and starting
+    # threads costs a single-row predict several times the prediction itself
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+
+    train_pred = model.predict(X_train)
+    test_pred = model.predict(X_test)
+    return {
+        "name": name,
+        "model": model,
+        "train_r2": r2_score(y_train, train_pred),
+        "test_r2": r2_score(y_test, test_pred),
+        "train_mse": mean_squared_error(y_train, train_pred),
+        "test_mse": mean_squared_error(y_test, test_pred),
+        "train_mae": mean_absolute_error(y_train, train_pred),
+        "test_mae": mean_absolute_error(y_test, test_pred),
+        "losses": losses,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def fit_candidates(data: dict, jobs: int = None, names=CANDIDATES) -> list:
+    """
+    Fit every candidate, in parallel when more than one core is available.
+
+    One process per candidate runs at a time, up to `jobs`. The Random
+    Forest, by far the slowest, also gets `jobs` threads, so once the quick
+    candidates are done it has every core to itself.
+
+    Args:
+        data: Output of split_and_scale
+        jobs: Cores to use (default: all)
+        names: Candidates to fit
+
+    Returns:
+        list: fit_candidate results in the order of names
+    """
+    jobs = jobs or os.cpu_count() or 1
+    arrays = (data["X_train"], data["y_train"], data["X_test"], data["y_test"])
+
+    if jobs == 1 or len(names) == 1:
+        return [fit_candidate(name, *arrays, n_jobs=jobs) for name in names]
+
+    # Start the slowest candidate first so it isn't queued behind the others
+    order = sorted(names, key=lambda name: name != "Random Forest")
+    with ProcessPoolExecutor(max_workers=min(jobs, len(names))) as pool:
+        futures = {name: pool.submit(fit_candidate, name, *arrays, n_jobs=jobs) for name in order}
+        return [futures[name].result() for name in names]
+
+
+def select_model(results: list, X: np.ndarray, policy: CostPolicy = None, r2: dict = None) -> tuple:
+    """
+    Benchmark every fitted candidate and pick one with the cost policy.
+
+    Args:
+        results: fit_candidate results
+        X: Scaled rows to benchmark predictions on
+        policy: Serving budgets and R² tolerance (default: CostPolicy())
+        r2: {name: R²} to compare instead of each result's test R² (e.g. cross-validated)
+
+    Returns:
+        tuple: (selected fit_candidate result, CostPolicy.select decision)
+
+    Raises:
+        NoEligibleModel: If every candidate breaks a budget and breaches aren't allowed
+    """
+    policy = policy or CostPolicy()
+    costs = [measure(result["model"], X, rss=False) for result in results]
+    for cost, rss in zip(costs, loaded_rss_bytes([result["model"] for result in results])):
+        cost["rss_bytes"] = rss
+    decision = policy.select([
+        {"name": result["name"], "r2": result["test_r2"] if r2 is None else r2[result["name"]], "cost": cost}
+        for result, cost in zip(results, costs)
+    ])
+    return next(result for result in results if result["name"] == decision["selected"]), decision
+
+
+def write_artifacts(output_dir: str, best: dict, data: dict, label_encoders: dict,
+                    target_col: str, total_samples: int, sections=(), selection: dict = None) -> dict:
+    """
+    Write the notebook's artifact set and model_summary.txt.
+
+    Args:
+        output_dir: Directory to write into (created if missing)
+        best: Selected fit_candidate result
+        data: Output of split_and_scale
+        label_encoders: Encoders from preprocess
+        target_col: Target column name
+        total_samples: Rows in the processed dataset
+        sections: Extra text blocks appended to the summary (cost and cross-validation tables)
+        selection: CostPolicy.select decision, written to model_selection.json
+
+    Returns:
+        dict: Path of every written file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        "model": os.path.join(output_dir, 'best_model.pkl'),
+        "scaler": os.path.join(output_dir, 'scaler.pkl'),
+        "features": os.path.join(output_dir, 'features.pkl'),
+        "label_encoders": os.path.join(output_dir, 'label_encoders.pkl'),
+        "summary": os.path.join(output_dir, 'model_summary.txt'),
+    }
+
+    joblib.dump(best["model"], paths["model"])
+    joblib.dump(data["scaler"], paths["scaler"])
+    joblib.dump(data["features"], paths["features"])
+    joblib.dump(label_encoders, paths["label_encoders"])
+
+    summary = f"""
+BEST MODEL SUMMARY
+==================
+Model Name: {best['name']}
+Test R² Score: {best['test_r2']:.4f}
+Test MSE: {best['test_mse']:.4f}
+Train R² Score: {best['train_r2']:.4f}
+Train MSE: {best['train_mse']:.4f}
+
+Dataset Information:
+- Total samples: {total_samples}
+- Training samples: {len(data['y_train'])}
+- Testing samples: {len(data['y_test'])}
+- Number of features: {len(data['features'])}
+- Target variable: {target_col}
+
+Model Path: {paths['model']}
+Scaler Path: {paths['scaler']}
+Features Path: {paths['features']}
+Label Encoders Path: {paths['label_encoders']}
+"""
+    for section in sections:
+        summary += f"\n{section}"
+    with open(paths["summary"], 'w', encoding='utf-8') as f:
+        f.write(summary)
+
+    if selection is not None:
+        paths["selection"] = os.path.join(output_dir, MANIFEST_FILE)
+        write_manifest(paths["selection"], selection, model_path=paths["model"],
+                       metrics={key: best[key] for key in ("test_r2", "test_mse", "train_r2", "train_mse")})
+
+    return paths
+
+
+def train(data: str = None, output_dir: str = DEFAULT_OUTPUT, jobs: int = None,
+          cache_dir: str = None, offline: bool = False, policy: CostPolicy = None) -> dict:
+    """
+    Run the whole pipeline: load, preprocess, fit in parallel, select and save.
+
+    Args:
+        data: CSV file or directory (None downloads with kagglehub)
+        output_dir: Directory for the artifacts
+        jobs: Cores to use (default: all)
+        cache_dir: Data cache directory (None disables caching)
+        offline: Train from the cached download instead of calling kagglehub
+        policy: Serving budgets and R² tolerance for selection (default: CostPolicy())
+
+    Returns:
+        dict: best (selected result), results (all candidates), selection
+        (the cost decision), paths, cache (key and hit) and timings in
+        seconds (load, preprocess, fit, benchmark, save, total); on a cache
+        hit, load covers reading the cached arrays and preprocess is zero
+
+    Raises:
+        NoEligibleModel: If every candidate breaks a serving budget and breaches aren't allowed
+    """
+    timings = {}
+    start = time.perf_counter()
+    cache = DataCache(cache_dir) if cache_dir else None
+
+    path = resolve_dataset(data, cache, offline)
+    timings["load"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    prepared = prepare_data(path, cache)
+    split = prepared["split"]
+    if prepared["cache_hit"]:
+        timings["load"] += time.perf_counter() - mark
+        timings["preprocess"] = 0.0
+    else:
+        timings["preprocess"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    results = fit_candidates(split, jobs)
+    timings["fit"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    best, selection = select_model(results, split["X_test"], policy)
+    timings["benchmark"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    paths = write_artifacts(output_dir, best, split, prepared["label_encoders"],
+                            prepared["target_col"], prepared["total_samples"],
+                            sections=[cost_table(selection)], selection=selection)
+    timings["save"] = time.perf_counter() - mark
+    timings["total"] = time.perf_counter() - start
+
+    return {"best": best, "results": results, "selection": selection, "paths": paths, "timings": timings,
+            "cache": {"key": prepared["cache_key"], "hit": prepared["cache_hit"]}}
+
+
+def main(argv=None):
+    """
+    Retrain the models from the command line.
+
+    Usage:
+        python train.py [--data PATH] [--output DIR] [--jobs N] [--cache-dir DIR | --no-cache] [--offline]
+                        [--latency-slo-ms MS] [--batch-slo-ms MS] [--max-model-mb MB]
+                        [--r2-tolerance R2] [--allow-slo-breach]
+    """
+    parser = argparse.ArgumentParser(description="Train the endometriosis regression models")
+    parser.add_argument('--data', default=None,
+                        help="Dataset CSV or directory (default: download with kagglehub)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory for the model artifacts")
+    parser.add_argument('--jobs', type=int, default=None, help="Cores to use (default: CPU count)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Cache for the dataset and preprocessed arrays (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="Always read and preprocess the CSV")
+    parser.add_argument('--offline', action='store_true',
+                        help="Train from the cached download instead of calling kagglehub")
+    add_policy_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        run = train(args.data, args.output, args.jobs, None if args.no_cache else args.cache_dir, args.offline,
+                    policy_from_args(args))
+    except NoEligibleModel as e:
+        raise SystemExit(f"{e}. Relax the budgets, or pass --allow-slo-breach to ship anyway.")
+
+    print(f"{'Model':<24} {'Train R²':>9} {'Test R²':>9} {'Train MSE':>10} {'Test MSE':>10} {'Fit s':>7}")
+    for result in run["results"]:
+        print(f"{result['name']:<24} {result['train_r2']:>9.4f} {result['test_r2']:>9.4f} "
+              f"{result['train_mse']:>10.4f} {result['test_mse']:>10.4f} {result['seconds']:>7.2f}")
+
+    print()
+    print(cost_table(run["selection"]))
+
+    timings = run["timings"]
+    print(f"✓ Selected model: {run['best']['name']} (test R² {run['best']['test_r2']:.4f})")
+    print(f"✓ Artifacts written to {os.path.dirname(run['paths']['model']) or '.'}")
+    if run["cache"]["key"] is not None:
+        state = "hit" if run["cache"]["hit"] else "miss, stored"
+        print(f"ℹ Data cache {state} ({run['cache']['key']} in {args.cache_dir})")
+    print(f"ℹ Wall clock {timings['total']:.2f}s on {args.jobs or os.cpu_count()} core(s): "
+          f"load {timings['load']:.2f}s, preprocess {timings['preprocess']:.2f}s, "
+          f"fit {timings['fit']:.2f}s, benchmark {timings['benchmark']:.2f}s, save {timings['save']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()